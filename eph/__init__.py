@@ -2,4 +2,5 @@
 *retrieve*, *represent* and *manipulate* ephemerides."""
 
 from .interface import JplReq, JplRes
+from .client import Client
 from .shortcuts import *
@@ -0,0 +1,228 @@
+"""
+Defines `asyncio`_ counterparts of :class:`eph.interface.JplReq` and of the
+shortcut functions in :mod:`eph.shortcuts`.
+
+Http requests are performed natively with `aiohttp`_ if it is installed,
+otherwise they are run in an executor. Parsing, which is CPU-bound, is always
+offloaded to an executor so that the event loop stays responsive.
+
+.. _`asyncio`: https://docs.python.org/3/library/asyncio.html
+.. _`aiohttp`: https://docs.aiohttp.org/
+"""
+
+import asyncio
+import functools
+from datetime import datetime
+
+import requests
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .interface import JplReq, JplRes, make_response
+from .horizons import MAX_ROWS
+from .shortcuts import _dates, _reqs, _concat, _merge, _check_layout
+from .throttle import get_throttle
+
+MAX_CONCURRENCY = 8
+
+
+class AsyncJplReq(JplReq):
+    """A request to Jpl Horizons service to be performed asynchronously."""
+
+    async def query(self, session=None, cache=None):
+        """
+        Performs the query to the Jpl Horizons service without blocking the
+        event loop.
+
+        Args:
+            session: an `aiohttp.ClientSession` to be used to perform the
+                request. A new session is opened if None. Ignored if the
+                request has a :attr:`transport`.
+            cache (:class:`eph.cache.ResponseCache`): the cache to look up
+                the response in (see :meth:`JplReq.query`).
+
+        Http requests are limited by the throttle shared by the process, if
+        one is installed (see :func:`eph.throttle.set_throttle`).
+
+        Returns:
+            :class:`JplRes`: the response from Jpl Horizons service.
+
+        Raises:
+            :class:`ConnectionError`
+        """
+        url = self.url()
+        key, tables = None, None
+        if cache is not None:
+            key, tables = cache.key(self.response_key()), cache.tables
+            text = cache.get(key)
+            if text is not None:
+                return JplRes(make_response(text, url=url),
+                              cache=tables,
+                              key=key)
+
+        async def send():
+            if self.transport is not None:
+                return await self.transport.aget(url)
+            if aiohttp is not None:
+                return await fetch(url, session=session)
+            loop = asyncio.get_event_loop()
+            try:
+                return await loop.run_in_executor(
+                    None, functools.partial(requests.get, url))
+            except requests.exceptions.ConnectionError as e:
+                raise ConnectionError(e.__str__())
+
+        throttle = get_throttle()
+        if throttle is not None:
+            http_response = await throttle.acall(send)
+        else:
+            http_response = await send()
+
+        if cache is not None and http_response.ok:
+            text = http_response.text
+            if '$$SOE' in text:
+                cache.set(key, text)
+
+        return JplRes(http_response, cache=tables, key=key)
+
+
+async def fetch(url, session=None):
+    """
+    Performs an http GET request with `aiohttp`_.
+
+    Args:
+        url (str): the url to be requested.
+        session: the `aiohttp.ClientSession` to be used. A new session is
+            opened (and closed) if None.
+
+    Returns:
+        the http response as a `requests`_ response object.
+
+    Raises:
+        :class:`ConnectionError`
+
+    .. _`aiohttp`: https://docs.aiohttp.org/
+    .. _`requests`: http://docs.python-requests.org/en/master/
+    """
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession()
+    try:
+        async with session.get(url) as response:
+            text = await response.text()
+            status = response.status
+    except aiohttp.ClientError as e:
+        raise ConnectionError(e.__str__())
+    finally:
+        if own_session:
+            await session.close()
+    http_response = make_response(text, url=url)
+    http_response.status_code = status
+    return http_response
+
+
+async def get(objs,
+              dates=datetime.now(),
+              cache=None,
+              max_concurrency=MAX_CONCURRENCY,
+              session=None,
+              executor=None,
+              max_rows=MAX_ROWS,
+              layout='wide',
+              **kwargs):
+    """
+    Asynchronous counterpart of :func:`eph.shortcuts.get`.
+
+    Args:
+      objs: The celestial objects to be targeted.
+      dates: start and stop (optional) time.
+      cache: a :class:`eph.cache.ResponseCache` to look up responses in.
+      max_concurrency: the maximum number of requests performed at the same
+        time.
+      session: an `aiohttp.ClientSession` shared by requests.
+      executor: the executor where responses are parsed (the default
+        executor of the event loop if None).
+      max_rows: the maximum number of rows of each request (see
+        :meth:`JplReq.split`).
+      layout: 'wide' or 'long' (see :func:`eph.shortcuts.get`).
+
+    Returns:
+      :class:`astropy.table.Qtable`: The data structure containing ephemeris data.
+    """
+    _check_layout(layout)
+    start, stop = _dates(dates)
+    objs, reqs = _reqs(objs, start, stop, cls=AsyncJplReq, **kwargs)
+    windows = [req.split(max_rows) for req in reqs]
+    semaphore = asyncio.Semaphore(max_concurrency)
+    loop = asyncio.get_event_loop()
+
+    async def fetch_table(req):
+        async with semaphore:
+            res = await req.query(session=session, cache=cache)
+        return await loop.run_in_executor(executor, res.parse)
+
+    tables = await asyncio.gather(*[
+        fetch_table(window) for req_windows in windows
+        for window in req_windows
+    ])
+    tables = _concat(tables, [len(req_windows) for req_windows in windows])
+    return _merge(objs, tables, dates, layout)
+
+
+async def vec(objs, dates=datetime.now(), center='@0', **kwargs):
+    """Asynchronous counterpart of :func:`eph.shortcuts.vec`."""
+    kwargs.update({
+        'CENTER': center,
+        'TABLE_TYPE': 'V',
+        'VEC_LABELS': False,
+    })
+    return await get(objs, dates=dates, **kwargs)
+
+
+async def pos(objs, dates=datetime.now(), **kwargs):
+    """Asynchronous counterpart of :func:`eph.shortcuts.pos`."""
+    kwargs.update({
+        'VEC_TABLE': 1,
+    })
+    return await vec(objs, dates=dates, **kwargs)
+
+
+async def vel(objs, dates=datetime.now(), **kwargs):
+    """Asynchronous counterpart of :func:`eph.shortcuts.vel`."""
+    kwargs.update({
+        'VEC_TABLE': 5,
+    })
+    return await vec(objs, dates=dates, **kwargs)
+
+
+async def elem(objs, dates=datetime.now(), **kwargs):
+    """Asynchronous counterpart of :func:`eph.shortcuts.elem`."""
+    kwargs.update({
+        'CENTER': '@0',
+        'TABLE_TYPE': 'E',
+    })
+    return await get(objs, dates=dates, **kwargs)
+
+
+async def obs(objs, dates=datetime.now(), **kwargs):
+    """Asynchronous counterpart of :func:`eph.shortcuts.obs`."""
+    kwargs.update({
+        'CENTER': 'coord',
+        'COORD_TYPE': 'GEODETIC',
+        'TABLE_TYPE': 'O',
+    })
+    return await get(objs, dates=dates, **kwargs)
+
+
+async def radec(objs, dates=datetime.now(), **kwargs):
+    """Asynchronous counterpart of :func:`eph.shortcuts.radec`."""
+    kwargs.update({'QUANTITIES': '1'})
+    return await obs(objs, dates=dates, **kwargs)
+
+
+async def altaz(objs, site_coord='0,0,0', dates=datetime.now(), **kwargs):
+    """Asynchronous counterpart of :func:`eph.shortcuts.altaz`."""
+    kwargs.update({'QUANTITIES': '4'})
+    return await obs(objs, site_coord=site_coord, dates=dates, **kwargs)
@@ -0,0 +1,282 @@
+"""
+Defines tools to fetch the ephemerides of large numbers of targets (e.g.
+thousands of asteroid designations), querying them over a bounded pool of
+workers and writing the table of each target in a partitioned output
+directory as soon as it is ready.
+
+Progress is checkpointed in the output directory, so that an interrupted
+batch can be resumed, skipping the targets already fetched. A target which
+cannot be fetched or parsed is reported without stopping the others.
+"""
+
+import hashlib
+import io
+import json
+import os
+import os.path
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from astropy.table import QTable
+
+from .cache import dump_table
+from .client import Client
+from .horizons import MAX_ROWS
+from .reparse import BINARY, EXTENSIONS
+from .shortcuts import _dates, _reqs, _concat
+from .throttle import TokenBucket
+from .util import path
+
+CHECKPOINT = 'checkpoint.jsonl'
+
+# number of hexadecimal digits of the partition of a target
+PARTITION_DIGITS = 2
+
+
+def read_targets(filename):
+    """
+    Reads targets from a text file, one per line. Blank lines and lines
+    starting with ``#`` are skipped.
+
+    Args:
+        filename (str): the file of targets.
+
+    Returns:
+        :class:`list`: the targets, without duplicates, in order.
+    """
+    targets = []
+    with io.open(path(filename), 'r', encoding='utf-8') as f:
+        for line in f:
+            target = line.strip()
+            if target and not target.startswith('#'):
+                targets.append(target)
+    return list(dict.fromkeys(targets))
+
+
+def target_filename(target, output, fmt=BINARY):
+    """
+    Computes the output file of a target.
+
+    Files are partitioned in subdirectories named after the first digits of
+    a hash of the target, so that no directory grows too large, and named
+    after the target with unsafe characters replaced and a short hash
+    appended, so that different targets never share a file.
+
+    Args:
+        target (str): the target.
+        output (str): the output directory.
+        fmt (str): the output format (see :func:`eph.reparse.reparse`).
+
+    Returns:
+        str: the output file.
+    """
+    digest = hashlib.sha1(target.encode('utf-8')).hexdigest()
+    name = re.sub(r'[^\w.+-]', '_', target).strip('.') or 'target'
+    return os.path.join(output, digest[:PARTITION_DIGITS],
+                        '{0}-{1}{2}'.format(name, digest[:8],
+                                            EXTENSIONS.get(fmt, '.' + fmt)))
+
+
+class Checkpoint(object):
+    """
+    The journal of the targets of a batch, appended to a JSON lines file as
+    targets are completed.
+    """
+
+    def __init__(self, filename):
+        """
+        Initialize a :class:`Checkpoint` object, loading the targets already
+        completed.
+
+        Args:
+            filename (str): the journal file.
+        """
+        self.filename = filename
+        self.done = {}
+        self._lock = threading.Lock()
+        if os.path.isfile(filename):
+            with io.open(filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line truncated by an interruption
+                        continue
+                    if entry.get('error'):
+                        self.done.pop(entry['target'], None)
+                    else:
+                        self.done[entry['target']] = entry
+
+    def record(self, target, rows=0, filename=None, error=None):
+        """Appends the outcome of a target to the journal."""
+        entry = dict(target=target,
+                     rows=rows,
+                     file=filename,
+                     error=error,
+                     time=datetime.now().isoformat())
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            with io.open(self.filename, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+            if error:
+                self.done.pop(target, None)
+            else:
+                self.done[target] = entry
+
+
+def fetch_target(target,
+                 output,
+                 start,
+                 stop,
+                 fmt=BINARY,
+                 session=None,
+                 cache=None,
+                 limiter=None,
+                 max_rows=MAX_ROWS,
+                 target_type=QTable,
+                 timeout=None,
+                 retry=None,
+                 **kwargs):
+    """
+    Fetches the ephemeris of a target and writes it in its output file (see
+    :func:`target_filename`).
+
+    Returns:
+        :class:`tuple`: (target, rows, filename, error), where error is the
+        error message (None on success).
+    """
+    try:
+        objs, reqs = _reqs(target, start, stop, **kwargs)
+        windows = reqs[0].split(max_rows)
+        tables = []
+        for window in windows:
+            if limiter is not None:
+                limiter.acquire()
+            res = window.query(cache=cache,
+                               session=session,
+                               timeout=timeout,
+                               retry=retry)
+            tables.append(res.parse(target=target_type))
+        table, = _concat(tables, [len(windows)])
+        filename = target_filename(target, output, fmt)
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        tmp = '{0}.{1}.tmp{2}'.format(filename, threading.get_ident(),
+                                      os.path.splitext(filename)[1])
+        if fmt == BINARY:
+            dump_table(table, tmp)
+        else:
+            table.write(tmp, format=fmt, overwrite=True)
+        os.replace(tmp, filename)
+    except Exception as e:
+        # any failure is the target's own, and must not stop the batch
+        return target, 0, None, '{0}: {1}'.format(type(e).__name__, e)
+    return target, len(table), filename, None
+
+
+def batch(targets,
+          output,
+          dates=None,
+          fmt=BINARY,
+          max_workers=8,
+          rate=None,
+          resume=True,
+          session=None,
+          cache=None,
+          max_rows=MAX_ROWS,
+          target_type=QTable,
+          timeout=None,
+          retry=None,
+          **kwargs):
+    """
+    Fetches the ephemerides of many targets, writing the table of each one
+    in a partitioned output directory.
+
+    At most `max_workers` targets are in flight at the same time, and no
+    more than a few more are queued, so that memory does not grow with the
+    number of targets. Completed targets are recorded in a checkpoint file
+    (``checkpoint.jsonl``) in the output directory.
+
+    Args:
+        targets: the targets (names, codes or designations).
+        output (str): the output directory.
+        dates: start and stop (optional) time, as in
+            :func:`eph.shortcuts.get`. Today if None.
+        fmt (str): the output format, ``'tbl'`` for the binary columnar
+            format of :func:`eph.cache.dump_table` or any astropy table
+            format.
+        max_workers (int): the number of targets fetched concurrently.
+        rate (float): the maximum number of requests per second, unlimited
+            if None.
+        resume (bool): whether to skip the targets completed by a previous
+            run in the same output directory. Failed targets are retried.
+        session: the transport performing requests (see
+            :mod:`eph.transports`). A :class:`eph.Client` with a connection
+            per worker if None.
+        cache (:class:`eph.cache.ResponseCache`): the cache to look up
+            responses in.
+        max_rows (int): the maximum number of rows of each request (see
+            :meth:`JplReq.split`).
+        target_type: the type of tables to produce (Table or QTable).
+        timeout: the timeout in seconds of each request.
+        retry (:class:`eph.retry.Retry`): the policy of failed requests.
+        kwargs: the Jpl parameters of requests.
+
+    Returns:
+        generator: tuples (target, rows, filename, error), in order of
+        completion, where error is the error message (None on success).
+    """
+    output = path(output)
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    start, stop = _dates(dates if dates is not None else datetime.now())
+    checkpoint = Checkpoint(os.path.join(output, CHECKPOINT))
+    if resume:
+        targets = [t for t in targets if t not in checkpoint.done]
+    own_session = session is None
+    if own_session:
+        session = Client(pool_size=max_workers)
+    limiter = TokenBucket(rate) if rate else None
+
+    def fetch(t):
+        return fetch_target(t,
+                            output,
+                            start,
+                            stop,
+                            fmt=fmt,
+                            session=session,
+                            cache=cache,
+                            limiter=limiter,
+                            max_rows=max_rows,
+                            target_type=target_type,
+                            timeout=timeout,
+                            retry=retry,
+                            **kwargs)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for t in targets:
+                if len(pending) >= 2 * max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for result in _record(checkpoint, done):
+                        yield result
+                pending.add(executor.submit(fetch, t))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for result in _record(checkpoint, done):
+                    yield result
+    finally:
+        if own_session:
+            session.close()
+
+
+def _record(checkpoint, futures):
+    for future in futures:
+        t, rows, filename, error = future.result()
+        checkpoint.record(t, rows=rows, filename=filename, error=error)
+        yield t, rows, filename, error
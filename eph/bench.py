@@ -0,0 +1,418 @@
+"""
+Benchmarks the stages of parsing Jpl Horizons responses on synthetic
+responses (see :mod:`eph.synth`), measuring throughput and peak memory, and
+stores results so that regressions can be detected between versions.
+
+Run it with ``python -m eph.bench``. The end-to-end benchmark of queries
+against a local mock of the service (see :mod:`eph.mock`) runs with
+``eph bench``.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import astropy
+
+from .client import Client
+from .interface import JplReq
+from .mock import MockHorizons
+from .parsers import (get_sections, check_csv, parse, parse_cols,
+                      parse_columns, parse_data, parse_meta, parse_units,
+                      make_table)
+from .shortcuts import get
+from .synth import generate, QUANTITIES
+from .util import parse_table, numberify, transpose
+
+CASES = dict(
+    [('vectors{0}'.format(i), dict(table_type='VECTORS', vec_table=i))
+     for i in range(1, 7)],
+    vectors_fixed=dict(table_type='VECTORS', csv=False, vec_labels=True),
+    elements=dict(table_type='ELEMENTS'),
+    elements_fixed=dict(table_type='ELEMENTS', csv=False, vec_labels=True),
+    observer=dict(table_type='OBSERVER', quantities=(1, 9, 20, 23, 24)),
+    observer_all=dict(table_type='OBSERVER',
+                      quantities=tuple(sorted(QUANTITIES))),
+    observer_fixed=dict(table_type='OBSERVER', csv=False,
+                        quantities=(1, 9, 20, 23, 24)),
+)
+
+ROWS = (1000, 10000)
+
+# maximum slowdown (as a fraction) not considered a regression
+TOLERANCE = .25
+
+
+def stages(source):
+    """
+    Prepares the stages of parsing a response, each one with its own input
+    already computed, so that stages are measured separately.
+
+    Args:
+        source (str): the response.
+
+    Returns:
+        dict: the callables of each stage by name.
+    """
+    header, data, footer = get_sections(source)
+    funcs = dict(
+        get_sections=lambda: get_sections(source),
+        parse=lambda: parse(source),
+    )
+    if check_csv(source):
+        cols = parse_cols(header)
+        rows = parse_table(data)
+        columns = parse_columns(data)
+        units = parse_units(parse_meta(header))
+        funcs.update(
+            parse_table=lambda: parse_table(data),
+            numberify=lambda: numberify(rows),
+            transpose=lambda: transpose(rows),
+            parse_data=lambda: parse_data(data),
+            parse_columns=lambda: parse_columns(data),
+            make_table=lambda: make_table(columns, cols, {}, units),
+        )
+    return funcs
+
+
+def measure(func, repeat=3):
+    """
+    Measures a callable.
+
+    Args:
+        func: the callable.
+        repeat (int): the number of timed runs.
+
+    Returns:
+        :class:`tuple`: the best time in seconds and the peak memory in
+        bytes allocated during a run (traced in a further run).
+    """
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def run(rows=ROWS, cases=None, repeat=3, seed=0):
+    """
+    Runs the benchmark.
+
+    Args:
+        rows: the numbers of rows of the generated responses.
+        cases: the names of cases (see ``CASES``) to run, all if None.
+        repeat (int): the number of timed runs of each stage.
+        seed (int): the seed of generated responses.
+
+    Returns:
+        :class:`list`: the results, as dicts with case, rows, stage, seconds,
+        rows/s, MB/s of response text and peak memory in MB.
+    """
+    results = []
+    for case in cases or sorted(CASES):
+        for n in rows:
+            source = generate(rows=n, seed=seed, **CASES[case])
+            size = len(source.encode('utf-8')) / 1e6
+            for stage, func in sorted(stages(source).items()):
+                seconds, peak = measure(func, repeat=repeat)
+                results.append(
+                    dict(
+                        case=case,
+                        rows=n,
+                        stage=stage,
+                        seconds=seconds,
+                        rows_per_s=n / seconds,
+                        mb_per_s=size / seconds,
+                        peak_mb=peak / 1e6,
+                    ))
+    return results
+
+
+def environment(label=None):
+    """Describes the environment the benchmark runs in."""
+    try:
+        from importlib.metadata import version
+        eph_version = version('eph')
+    except Exception:
+        eph_version = None
+    return dict(
+        label=label,
+        eph=eph_version,
+        python=platform.python_version(),
+        numpy=np.__version__,
+        astropy=astropy.__version__,
+        machine=platform.machine(),
+        system=platform.system(),
+        date=datetime.now().isoformat(),
+    )
+
+
+def save(results, filename, label=None):
+    """Writes results, together with their environment, in a JSON file."""
+    with open(filename, 'w') as f:
+        json.dump(dict(environment=environment(label), results=results),
+                  f,
+                  indent=2)
+
+
+def load(filename):
+    """Reads the results stored by :func:`save`."""
+    with open(filename, 'r') as f:
+        return json.load(f)['results']
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Compares results with a baseline.
+
+    Args:
+        results: the current results.
+        baseline: the baseline results.
+        tolerance (float): the maximum relative slowdown not considered a
+            regression.
+
+    Returns:
+        :class:`list`: the regressions, as tuples (case, rows, stage,
+        baseline seconds, seconds).
+    """
+    reference = {(r['case'], r['rows'], r['stage']): r['seconds']
+                 for r in baseline}
+    regressions = []
+    for r in results:
+        key = (r['case'], r['rows'], r['stage'])
+        if key in reference and r['seconds'] > reference[key] * (1 +
+                                                                 tolerance):
+            regressions.append(key + (reference[key], r['seconds']))
+    return regressions
+
+
+def report(results, out=sys.stdout):
+    """Writes results as a text table."""
+    fmt = '{0:<16}{1:>8}  {2:<14}{3:>11}{4:>13}{5:>9}{6:>10}\n'
+    out.write(
+        fmt.format('case', 'rows', 'stage', 'seconds', 'rows/s', 'MB/s',
+                   'peak MB'))
+    for r in results:
+        out.write(
+            fmt.format(r['case'], r['rows'], r['stage'],
+                       '{0:.5f}'.format(r['seconds']),
+                       '{0:.0f}'.format(r['rows_per_s']),
+                       '{0:.2f}'.format(r['mb_per_s']),
+                       '{0:.2f}'.format(r['peak_mb'])))
+
+
+# end-to-end benchmark
+
+CONCURRENCY = (1, 4, 16)
+
+MODES = ('query', 'get')
+
+# objects joined by each request of the 'get' mode
+OBJECTS = ('199', '299', '399', '499')
+
+
+def _requests(n, rows, objs):
+    """Builds `n` requests of `rows` rows each, cycling over `objs`."""
+    return [
+        JplReq(COMMAND=objs[i % len(objs)],
+               TABLE_TYPE='VECTORS',
+               CSV_FORMAT=True,
+               START_TIME='2000-01-01',
+               STOP_TIME='2001-01-01',
+               STEP_SIZE=max(rows - 1, 1)) for i in range(n)
+    ]
+
+
+def _percentiles(latencies):
+    p50, p90, p99 = np.percentile(latencies, (50, 90, 99)) * 1e3
+    return dict(p50_ms=p50, p90_ms=p90, p99_ms=p99)
+
+
+def drive(client, reqs, concurrency, mode='query', objs=OBJECTS):
+    """
+    Performs and parses requests concurrently through a client.
+
+    Args:
+        client (:class:`eph.Client`): the client.
+        reqs: the requests (see :class:`eph.JplReq`).
+        concurrency (int): the number of requests performed concurrently.
+        mode (str): ``'query'`` to query and parse each request,
+            ``'get'`` to get the join of `objs` through
+            :func:`eph.shortcuts.get` for each one.
+        objs: the objects joined in the ``'get'`` mode.
+
+    Returns:
+        :class:`tuple`: the total time and the latencies of requests in
+        seconds.
+    """
+
+    def task(req):
+        start = time.perf_counter()
+        if mode == 'get':
+            params = {k: v for k, v in req.items() if k != 'COMMAND'}
+            get(list(objs),
+                dates=[params.pop('START_TIME'),
+                       params.pop('STOP_TIME')],
+                session=client,
+                **params)
+        else:
+            req.query(session=client).parse()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(task, reqs))
+    return time.perf_counter() - start, latencies
+
+
+def run_server(endpoint=None,
+               concurrency=CONCURRENCY,
+               requests=50,
+               rows=1000,
+               latency=0.,
+               jitter=0.,
+               modes=MODES,
+               seed=0):
+    """
+    Runs the end-to-end benchmark: requests are performed through a
+    :class:`eph.Client`, at several concurrency levels, against a local
+    :class:`eph.mock.MockHorizons` server or a given endpoint, and parsed.
+
+    Args:
+        endpoint (str): the url of the service to query in place of the Jpl
+            Horizons service. A local mock server is started if None.
+        concurrency: the numbers of requests performed concurrently.
+        requests (int): the number of requests at each level.
+        rows (int): the number of rows of each response.
+        latency (float): the latency in seconds of the mock server.
+        jitter (float): the maximum random delay in seconds added to
+            `latency` by the mock server.
+        modes: the modes of :func:`drive`.
+        seed (int): the seed of generated responses.
+
+    Returns:
+        :class:`list`: the results, as dicts with mode, concurrency,
+        requests, seconds, requests/s, latency percentiles in ms, MB/s of
+        responses parsed and peak memory in MB.
+    """
+    server = None
+    if endpoint is None:
+        server = MockHorizons(latency=latency, jitter=jitter, seed=seed)
+        endpoint = server.start().url
+    lock = threading.Lock()
+    received = [0]
+
+    def count(response, *args, **kwargs):
+        with lock:
+            received[0] += len(response.content)
+
+    results = []
+    try:
+        for mode in modes:
+            for level in concurrency:
+                reqs = _requests(requests, rows, OBJECTS)
+                with Client(pool_size=level, endpoint=endpoint) as client:
+                    client.session.hooks['response'].append(count)
+                    drive(client, reqs[:level], level, mode)
+                    received[0] = 0
+                    seconds, latencies = drive(client, reqs, level, mode)
+                    size = received[0] / 1e6
+                    tracemalloc.start()
+                    try:
+                        drive(client, reqs[:level], level, mode)
+                        current, peak = tracemalloc.get_traced_memory()
+                    finally:
+                        tracemalloc.stop()
+                record = dict(
+                    mode=mode,
+                    concurrency=level,
+                    requests=requests,
+                    seconds=seconds,
+                    requests_per_s=requests / seconds,
+                    mb_per_s=size / seconds,
+                    peak_mb=peak / 1e6,
+                )
+                record.update(_percentiles(latencies))
+                results.append(record)
+    finally:
+        if server is not None:
+            server.stop()
+    return results
+
+
+def report_server(results, out=sys.stdout):
+    """Writes results of :func:`run_server` as a text table."""
+    fmt = '{0:<7}{1:>6}{2:>10}{3:>11}{4:>10}{5:>10}{6:>10}{7:>9}{8:>10}\n'
+    out.write(
+        fmt.format('mode', 'conc', 'requests', 'req/s', 'p50 ms', 'p90 ms',
+                   'p99 ms', 'MB/s', 'peak MB'))
+    for r in results:
+        out.write(
+            fmt.format(r['mode'], r['concurrency'], r['requests'],
+                       '{0:.1f}'.format(r['requests_per_s']),
+                       '{0:.1f}'.format(r['p50_ms']),
+                       '{0:.1f}'.format(r['p90_ms']),
+                       '{0:.1f}'.format(r['p99_ms']),
+                       '{0:.2f}'.format(r['mb_per_s']),
+                       '{0:.2f}'.format(r['peak_mb'])))
+
+
+parser = argparse.ArgumentParser(
+    prog='python -m eph.bench',
+    description='Benchmark parsers of Jpl Horizons responses.')
+parser.add_argument('--rows',
+                    nargs='+',
+                    type=int,
+                    default=list(ROWS),
+                    help='numbers of rows of generated responses')
+parser.add_argument('--cases',
+                    nargs='+',
+                    choices=sorted(CASES),
+                    help='cases to run (default: all)')
+parser.add_argument('--repeat',
+                    type=int,
+                    default=3,
+                    help='number of timed runs of each stage')
+parser.add_argument('--output', '-o', help='stores results in a JSON file')
+parser.add_argument('--label', help='a label for stored results')
+parser.add_argument('--baseline',
+                    help='compares results with those stored in a JSON file')
+parser.add_argument('--tolerance',
+                    type=float,
+                    default=TOLERANCE,
+                    help='maximum relative slowdown not considered a regression')
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    results = run(rows=args.rows, cases=args.cases, repeat=args.repeat)
+    report(results)
+    if args.output:
+        save(results, args.output, label=args.label)
+    if args.baseline:
+        regressions = compare(results, load(args.baseline), args.tolerance)
+        for case, rows, stage, before, after in regressions:
+            sys.stdout.write(
+                'Regression: {0} ({1} rows) {2}: {3:.5f}s -> {4:.5f}s\n'.format(
+                    case, rows, stage, before, after))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,380 @@
+"""Defines on-disk caches for responses from the Jpl Horizons service and
+for the tables parsed out of them."""
+
+import hashlib
+import io
+import json
+import os
+import os.path
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+from astropy import units as u
+from astropy.table import Table, QTable, Column
+
+from .util import path
+from .config import get_cache_dir
+
+TABLE_MAGIC = b'EPHTBL1\n'
+
+TABLE_ALIGN = 64
+
+
+def dump_table(table, filename):
+    """
+    Writes a table in a binary columnar file.
+
+    The file starts with a JSON header, holding column names, dtypes,
+    units and the table metadata, followed by the raw buffer of each column
+    aligned so that columns can be memory-mapped by :func:`load_table`.
+
+    Args:
+        table: the `astropy.table.Table` or `astropy.table.QTable` to write.
+        filename (str): the output file.
+
+    Raises:
+        :class:`TypeError`: if a column cannot be stored in binary form.
+    """
+    columns, arrays, offset = [], [], 0
+    for name in table.colnames:
+        array = np.ascontiguousarray(np.asarray(table[name]))
+        if array.dtype.hasobject:
+            raise TypeError(
+                'Column \'{0}\' cannot be stored in binary form.'.format(name))
+        unit = getattr(table[name], 'unit', None)
+        columns.append(
+            dict(
+                name=name,
+                dtype=array.dtype.str,
+                shape=array.shape,
+                unit=unit.to_string() if unit is not None else None,
+                offset=offset,
+            ))
+        arrays.append(array)
+        offset += -(-array.nbytes // TABLE_ALIGN) * TABLE_ALIGN
+    header = json.dumps(dict(columns=columns, meta=dict(table.meta)),
+                        default=str).encode('utf-8')
+    start = len(TABLE_MAGIC) + 8 + len(header)
+    start += -start % TABLE_ALIGN
+    with open(filename, 'wb') as f:
+        f.write(TABLE_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for column, array in zip(columns, arrays):
+            f.seek(start + column['offset'])
+            f.write(array.tobytes())
+        f.truncate(start + offset)
+
+
+def load_table(filename, target=QTable, mmap=True):
+    """
+    Reads a table written by :func:`dump_table`.
+
+    Args:
+        filename (str): the input file.
+        target: the type of table to produce (Table or QTable).
+        mmap (bool): if True, columns are memory-mapped (copy-on-write)
+            instead of being read in memory.
+
+    Returns:
+        table: the table stored in the file.
+    """
+    if target not in (Table, QTable):
+        raise TypeError('Available target classes are Table and QTable.')
+    with open(filename, 'rb') as f:
+        if f.read(len(TABLE_MAGIC)) != TABLE_MAGIC:
+            raise ValueError('Not a binary table file.')
+        size, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(size).decode('utf-8'))
+        start = len(TABLE_MAGIC) + 8 + size
+        start += -start % TABLE_ALIGN
+        data = []
+        for column in header['columns']:
+            dtype, shape = np.dtype(column['dtype']), tuple(column['shape'])
+            if mmap and dtype.itemsize and all(shape):
+                array = np.memmap(f, dtype=dtype, mode='c', shape=shape,
+                                  offset=start + column['offset'])
+            else:
+                f.seek(start + column['offset'])
+                array = np.fromfile(f, dtype=dtype,
+                                    count=int(np.prod(shape))).reshape(shape)
+            if column['unit'] is not None:
+                unit = u.Unit(column['unit'])
+                if target is QTable:
+                    array = u.Quantity(array, unit, copy=False)
+                else:
+                    array = Column(array, unit=unit, copy=False)
+            data.append(array)
+    names = [column['name'] for column in header['columns']]
+    return target(data, names=names, meta=header['meta'], copy=False)
+
+
+class ResponseCache(object):
+    """
+    A persistent cache storing raw Jpl Horizons responses on disk.
+
+    Entries are keyed on the canonical parameters of a :class:`JplReq` (see
+    :meth:`JplReq.canonical`). The cache is bounded in size, evicting least
+    recently used entries first, and entries older than `ttl` seconds are
+    considered expired.
+
+    The size of the cache is kept as a running total, computed once when
+    the cache is opened, so that the directory is only scanned when the
+    total exceeds `max_size` (or, with a `ttl`, every `ttl` seconds to sweep
+    expired entries). Entries written by other processes sharing the
+    directory are accounted for at the next scan.
+    """
+
+    suffix = '.txt'
+
+    def __init__(self, directory=None, max_size=None, ttl=None, tables=True):
+        """
+        Initialize a :class:`ResponseCache` object.
+
+        Args:
+            directory (str): the cache directory (default ``~/.cache/eph``).
+            max_size (int): the maximum size in bytes of the cache. No limit
+                if None.
+            ttl (float): the time to live in seconds of entries. Entries
+                never expire if None.
+            tables (bool): if True, tables parsed out of responses are
+                cached as well in a :class:`TableCache` sharing the same
+                directory and policies.
+        """
+        self.directory = path(directory) if directory else get_cache_dir()
+        self.max_size = int(max_size) if max_size is not None else None
+        self.ttl = float(ttl) if ttl is not None else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self._size = sum(entry[1] for entry in self.entries())
+        self._sweep_at = time.time() + self.ttl if self.ttl else None
+        self.tables = TableCache(self.directory, max_size=max_size,
+                                 ttl=ttl) if tables else None
+
+    @staticmethod
+    def key(canonical):
+        """
+        Computes the cache key of a canonical parameters string.
+
+        Args:
+            canonical (str): the canonical representation of a request.
+
+        Returns:
+            str: the cache key.
+        """
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    def filename(self, key):
+        """Returns the path of the file storing the entry `key`."""
+        return os.path.join(self.directory, key + self.suffix)
+
+    def expired(self, filename, now=None):
+        """Checks whether the entry stored in `filename` is expired."""
+        if self.ttl is None:
+            return False
+        now = time.time() if now is None else now
+        return now - os.path.getmtime(filename) > self.ttl
+
+    def load(self, filename):
+        """Reads the value stored in `filename`."""
+        with io.open(filename, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def dump(self, value, filename):
+        """Writes `value` in `filename`."""
+        with io.open(filename, 'w', encoding='utf-8') as f:
+            f.write(value)
+
+    def lookup(self, key):
+        """
+        Looks up an entry of the cache without reading it, counting a hit or
+        a miss as :meth:`get` does.
+
+        Args:
+            key (str): the cache key.
+
+        Returns:
+            str: the file storing the entry, None on a miss.
+        """
+        filename = self.filename(key)
+        try:
+            if self.expired(filename):
+                self.remove(key)
+                raise IOError
+            os.utime(filename, (time.time(), os.path.getmtime(filename)))
+        except (IOError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return filename
+
+    def get(self, key, **kwargs):
+        """
+        Retrieves an entry from the cache.
+
+        Args:
+            key (str): the cache key.
+
+        Returns:
+            the cached value (the response text) or None on a miss.
+        """
+        filename = self.filename(key)
+        try:
+            if self.expired(filename):
+                self.remove(key)
+                raise IOError
+            value = self.load(filename, **kwargs)
+            os.utime(filename, (time.time(), os.path.getmtime(filename)))
+        except (IOError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Stores an entry in the cache, evicting old entries if needed.
+
+        Args:
+            key (str): the cache key.
+            value: the value (the response text) to be stored.
+        """
+        filename = self.filename(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            self.dump(value, tmp)
+            size = os.path.getsize(tmp)
+            try:
+                size -= os.path.getsize(filename)
+            except OSError:
+                pass
+            os.replace(tmp, filename)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            self._size += size
+            full = self.max_size is not None and self._size > self.max_size
+            sweep = self._sweep_at is not None and \
+                time.time() >= self._sweep_at
+        if full or sweep:
+            self.evict()
+
+    def remove(self, key):
+        """Removes the entry `key` from the cache, if present."""
+        filename = self.filename(key)
+        try:
+            size = os.path.getsize(filename)
+            os.remove(filename)
+        except OSError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def entries(self):
+        """
+        Lists the entries of the cache.
+
+        Returns:
+            :class:`list`: tuples (last access time, size, key) sorted from
+            the least recently used entry.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                key = entry.name[:-len(self.suffix)]
+                entries.append((stat.st_atime, stat.st_size, key))
+        return sorted(entries)
+
+    def evict(self):
+        """Removes expired entries and least recently used entries exceeding
+        the cache size limit, scanning the cache directory."""
+        now = time.time()
+        entries = []
+        for entry in self.entries():
+            if self.expired(self.filename(entry[2]), now=now):
+                self.remove(entry[2])
+                with self._lock:
+                    self.evictions += 1
+            else:
+                entries.append(entry)
+        size = sum(entry[1] for entry in entries)
+        if self.max_size is not None:
+            for atime, entry_size, key in entries:
+                if size <= self.max_size:
+                    break
+                self.remove(key)
+                size -= entry_size
+                with self._lock:
+                    self.evictions += 1
+        with self._lock:
+            self._size = size
+            if self.ttl:
+                self._sweep_at = now + self.ttl
+
+    def clear(self):
+        """Removes all entries from the cache."""
+        for atime, size, key in self.entries():
+            self.remove(key)
+
+    def stats(self):
+        """
+        Returns the statistics of the cache.
+
+        Returns:
+            dict: hits, misses and evictions counters together with the
+            number of entries and the total size in bytes of the cache.
+        """
+        entries = self.entries()
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            entries=len(entries),
+            size=sum(entry[1] for entry in entries),
+        )
+
+
+class TableCache(ResponseCache):
+    """
+    A persistent cache storing tables parsed out of Jpl Horizons responses
+    in a binary columnar format (see :func:`dump_table`).
+
+    On a hit, columns are memory-mapped so that no text parsing is needed.
+    """
+
+    suffix = '.tbl'
+
+    def __init__(self, directory=None, max_size=None, ttl=None):
+        super(TableCache, self).__init__(directory, max_size=max_size,
+                                         ttl=ttl, tables=False)
+
+    @staticmethod
+    def table_key(key, target=QTable, dates=False):
+        """Computes the key of the table of type `target` parsed out of the
+        response stored with key `key`, with calendar dates converted if
+        `dates` is True."""
+        return '{0}-{1}{2}'.format(key, target.__name__.lower(),
+                                   '-dates' if dates else '')
+
+    def load(self, filename, target=QTable):
+        return load_table(filename, target=target)
+
+    def dump(self, value, filename):
+        dump_table(value, filename)
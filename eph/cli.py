@@ -11,7 +11,14 @@ from .exceptions import *
 from .horizons import codify_obj, codify_site, is_jpl_param, transform_key
 from .interface import JplReq
 from .shortcuts import get
-from .config import read_config
+from .config import read_config, read_cache_config, read_transport_config
+from .cache import ResponseCache
+from .transports import make_transport
+from .reparse import reparse, BINARY, CHUNKSIZE
+from .batch import batch, read_targets
+from .client import Client
+from .retry import Retry
+from .bench import run_server, report_server, save, CONCURRENCY, MODES
 
 # logger
 
@@ -212,6 +219,53 @@ parser.add_argument('--apparent',
                     ''')
 parser.add_argument('--config',
                     help='specifies a configuration file to be used')
+parser.add_argument('--jobs',
+                    '-j',
+                    type=int,
+                    help='number of objects to be queried concurrently')
+parser.add_argument('--cache-dir',
+                    help='''
+                    caches responses from Jpl Horizons in the given
+                    directory (overrides the [cache] section of the
+                    config file)
+                    ''')
+parser.add_argument('--no-cache',
+                    action='store_true',
+                    help='disables the cache of responses')
+parser.add_argument('--transport',
+                    choices=['http', 'session', 'asyncio', 'replay'],
+                    help='''
+                    selects how requests are performed (overrides the
+                    [transport] section of the config file): http,
+                    session (pooled connections), asyncio or replay
+                    (responses stored in --replay-dir, fetched and
+                    recorded if missing)
+                    ''')
+parser.add_argument('--endpoint',
+                    help='''
+                    the url of a service (e.g. a proxy or a mirror) to be
+                    queried in place of the Jpl Horizons service
+                    ''')
+parser.add_argument('--replay-dir',
+                    help='the directory of responses of the replay transport')
+parser.add_argument('--layout',
+                    choices=['wide', 'long'],
+                    default='wide',
+                    help='''
+                    layout of multi-object tables: wide (a row per epoch,
+                    columns prefixed with objects) or long (rows of each
+                    object stacked, with a target column)
+                    ''')
+parser.add_argument('--timeout',
+                    type=float,
+                    help='timeout in seconds of each request')
+parser.add_argument('--retries',
+                    type=int,
+                    default=0,
+                    help='''
+                    number of retries of failed requests, with jittered
+                    exponential backoff
+                    ''')
 parser.add_argument('--output',
                     '-o',
                     default=sys.stdout,
@@ -221,8 +275,250 @@ parser.add_argument('--format',
                     help='specify how the data table must be formatted')
 
 
+# reparse subcommand
+
+reparse_parser = argparse.ArgumentParser(
+    prog='eph reparse',
+    description='''
+    Parse again raw Jpl Horizons responses saved in a directory or in a
+    tarball, writing tables in columnar files.
+    ''')
+reparse_parser.add_argument('source',
+                            help='the directory or the tarball of responses')
+reparse_parser.add_argument('--output',
+                            '-o',
+                            required=True,
+                            help='the output directory')
+reparse_parser.add_argument('--format',
+                            default=BINARY,
+                            help='''
+                            the output format: tbl (binary columnar, the
+                            default) or any astropy table format
+                            ''')
+reparse_parser.add_argument('--jobs',
+                            '-j',
+                            type=int,
+                            help='number of processes (default: all cores)')
+reparse_parser.add_argument('--chunksize',
+                            type=int,
+                            default=CHUNKSIZE,
+                            help='number of files sent to a process at once')
+reparse_parser.add_argument('--pattern',
+                            default='*.txt',
+                            help='pattern matching names of responses')
+
+
+def reparse_main(argv):
+    args = reparse_parser.parse_args(argv)
+    parsed, failed = 0, 0
+    try:
+        for name, rows, error in reparse(args.source,
+                                         args.output,
+                                         fmt=args.format,
+                                         processes=args.jobs,
+                                         chunksize=args.chunksize,
+                                         pattern=args.pattern):
+            if error:
+                failed += 1
+                logger.error('{0}: {1}'.format(name, error))
+            else:
+                parsed += 1
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(-1)
+    sys.stdout.write('{0} parsed, {1} failed.\n'.format(parsed, failed))
+    if failed:
+        sys.exit(1)
+
+
+# bench subcommand
+
+bench_parser = argparse.ArgumentParser(
+    prog='eph bench',
+    description='''
+    Benchmark queries to a local mock of the Jpl Horizons service (or to
+    a given endpoint), at several concurrency levels.
+    ''')
+bench_parser.add_argument('--endpoint',
+                          help='''
+                          the url of the service to query (default: a local
+                          mock server)
+                          ''')
+bench_parser.add_argument('--concurrency',
+                          nargs='+',
+                          type=int,
+                          default=list(CONCURRENCY),
+                          help='numbers of requests performed concurrently')
+bench_parser.add_argument('--requests',
+                          '-n',
+                          type=int,
+                          default=50,
+                          help='number of requests at each concurrency level')
+bench_parser.add_argument('--rows',
+                          type=int,
+                          default=1000,
+                          help='number of rows of each response')
+bench_parser.add_argument('--latency',
+                          type=float,
+                          default=0.,
+                          help='latency in seconds of the mock server')
+bench_parser.add_argument('--jitter',
+                          type=float,
+                          default=0.,
+                          help='''
+                          maximum random delay in seconds added to the
+                          latency of the mock server
+                          ''')
+bench_parser.add_argument('--modes',
+                          nargs='+',
+                          choices=MODES,
+                          default=list(MODES),
+                          help='''
+                          query: query and parse single requests;
+                          get: get joins of several objects
+                          ''')
+bench_parser.add_argument('--output',
+                          '-o',
+                          help='stores results in a JSON file')
+bench_parser.add_argument('--label', help='a label for stored results')
+
+
+def bench_main(argv):
+    args = bench_parser.parse_args(argv)
+    try:
+        results = run_server(endpoint=args.endpoint,
+                             concurrency=args.concurrency,
+                             requests=args.requests,
+                             rows=args.rows,
+                             latency=args.latency,
+                             jitter=args.jitter,
+                             modes=args.modes)
+    except ConnectionError:
+        logger.error('Connection error.')
+        sys.exit(-1)
+    report_server(results)
+    if args.output:
+        save(results, args.output, label=args.label)
+
+
+# batch subcommand
+
+batch_parser = argparse.ArgumentParser(
+    prog='eph batch',
+    description='''
+    Fetch the ephemerides of many targets (e.g. asteroid designations),
+    writing the table of each one in a partitioned output directory.
+    Interrupted batches are resumed from the checkpoint in the output
+    directory.
+    ''')
+batch_parser.add_argument('--targets',
+                          required=True,
+                          help='a file of targets, one per line')
+batch_parser.add_argument('--output',
+                          '-o',
+                          required=True,
+                          help='the output directory')
+batch_parser.add_argument('--dates',
+                          nargs='+',
+                          help='ephemeris start and stop times')
+batch_parser.add_argument('--step', '-s', help='the step size')
+batch_parser.add_argument('--table-type',
+                          '-t',
+                          choices=['O', 'V', 'E'],
+                          help='the type of tables (see eph --help)')
+batch_parser.add_argument('--quantities',
+                          '-q',
+                          help='the quantities of observer tables')
+batch_parser.add_argument('--center',
+                          '-c',
+                          type=codify_site,
+                          help='the coordinate origin')
+batch_parser.add_argument('--config',
+                          help='specifies a configuration file to be used')
+batch_parser.add_argument('--format',
+                          default=BINARY,
+                          help='''
+                          the output format: tbl (binary columnar, the
+                          default) or any astropy table format
+                          ''')
+batch_parser.add_argument('--jobs',
+                          '-j',
+                          type=int,
+                          default=8,
+                          help='number of targets fetched concurrently')
+batch_parser.add_argument('--rate',
+                          type=float,
+                          help='maximum number of requests per second')
+batch_parser.add_argument('--no-resume',
+                          action='store_true',
+                          help='fetches again targets already completed')
+batch_parser.add_argument('--timeout',
+                          type=float,
+                          default=60.,
+                          help='timeout in seconds of each request')
+batch_parser.add_argument('--retries',
+                          type=int,
+                          default=3,
+                          help='''
+                          number of retries of failed requests, with
+                          jittered exponential backoff
+                          ''')
+batch_parser.add_argument('--endpoint',
+                          help='''
+                          the url of a service to be queried in place of the
+                          Jpl Horizons service
+                          ''')
+
+
+def batch_main(argv):
+    args = batch_parser.parse_args(argv)
+    try:
+        jplparams = read_config(filename=args.config)
+    except (ConfigNotFoundError, ConfigParserError):
+        jplparams = {}
+    jplparams.update({
+        transform_key(k): v
+        for k, v in vars(args).items()
+        if is_jpl_param(k) and v
+    })
+    try:
+        targets = read_targets(args.targets)
+    except IOError as e:
+        logger.error(str(e))
+        sys.exit(-1)
+    fetched, failed = 0, 0
+    with Client(pool_size=args.jobs, endpoint=args.endpoint) as client:
+        for target, rows, filename, error in batch(
+                targets,
+                args.output,
+                dates=args.dates,
+                fmt=args.format,
+                max_workers=args.jobs,
+                rate=args.rate,
+                resume=not args.no_resume,
+                session=client,
+                timeout=args.timeout,
+                retry=Retry(args.retries) if args.retries else None,
+                **jplparams):
+            if error:
+                failed += 1
+                logger.error('{0}: {1}'.format(target, error))
+            else:
+                fetched += 1
+    sys.stdout.write('{0} fetched, {1} failed.\n'.format(fetched, failed))
+    if failed:
+        sys.exit(1)
+
+
 def main():
 
+    if sys.argv[1:2] == ['reparse']:
+        return reparse_main(sys.argv[2:])
+    if sys.argv[1:2] == ['bench']:
+        return bench_main(sys.argv[2:])
+    if sys.argv[1:2] == ['batch']:
+        return batch_main(sys.argv[2:])
+
     args = parser.parse_args()
 
     try:
@@ -238,8 +534,40 @@ def main():
         if is_jpl_param(k) and v
     })
 
+    cache = None
+    if not args.no_cache:
+        cache_config = read_cache_config(filename=args.config)
+        if args.cache_dir:
+            cache_config = dict(cache_config or {}, directory=args.cache_dir)
+        if cache_config is not None:
+            cache = ResponseCache(**cache_config)
+
+    transport_config = dict(read_transport_config(filename=args.config) or {})
+    transport_config.update({
+        k: v
+        for k, v in (('transport', args.transport), ('endpoint',
+                                                     args.endpoint),
+                     ('directory', args.replay_dir)) if v
+    })
+    transport = None
+    if transport_config:
+        try:
+            transport = make_transport(
+                transport_config.pop('transport', 'http'), **transport_config)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.error('Invalid transport configuration: {0}'.format(e))
+            sys.exit(-1)
+
     try:
-        data = get(args.objs, dates=args.dates, **jplparams)
+        data = get(args.objs,
+                   dates=args.dates,
+                   cache=cache,
+                   max_workers=args.jobs,
+                   session=transport,
+                   layout=args.layout,
+                   timeout=args.timeout,
+                   retry=Retry(args.retries) if args.retries else None,
+                   **jplparams)
     except ConnectionError:
         logger.error('Connection error.')
         sys.exit(-1)
@@ -248,10 +576,13 @@ def main():
         sys.exit(-1)
     except ParserError:
         logger.error('''
-        eph cannot parse this format.
-        Try passing --csv YES option.
+        eph cannot parse this response: its data section does not match the
+        columns of its header.
         ''')
         sys.exit(-1)
+    finally:
+        if transport is not None:
+            transport.close()
 
     try:
         data.write(args.output, format=args.format)
@@ -0,0 +1,80 @@
+"""Defines a client to reuse connections to the Jpl Horizons service."""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .transports import Transport
+
+
+class Client(Transport):
+    """
+    A client owning a pool of keep-alive connections to the Jpl Horizons
+    service.
+
+    It can be passed as `session` to :meth:`JplReq.query` and to shortcut
+    functions, so that consecutive (or concurrent) requests reuse the same
+    connections instead of opening a new one for each request.
+    """
+
+    def __init__(self, pool_size=10, timeout=None, compress=True,
+                 endpoint=None):
+        """
+        Initialize a :class:`Client` object.
+
+        Args:
+            pool_size (int): the maximum number of connections kept open
+                for each host.
+            timeout: the default timeout in seconds of requests, as a single
+                value or a (connect, read) tuple. No timeout if None.
+            compress (bool): whether to ask for compressed responses.
+            endpoint (str): the url of a service to be queried in place of
+                the Jpl Horizons service (e.g. a :class:`eph.mock.MockHorizons`
+                server), replacing ``JPL_ENDPOINT`` in requested urls.
+        """
+        super(Client, self).__init__(endpoint)
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(pool_connections=pool_size,
+                                   pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers['Accept-Encoding'] = (
+            'gzip, deflate' if compress else 'identity')
+
+    def get(self, url, **kwargs):
+        """
+        Performs an http GET request through the pool of connections.
+
+        Args:
+            url (str): the url to be requested.
+            kwargs: further arguments for `requests.Session.get`.
+
+        Returns:
+            the http response.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(self.resolve(url), **kwargs)
+
+    def stats(self):
+        """
+        Returns the statistics of the pools of connections.
+
+        Returns:
+            dict: the number of requests performed, of connections opened
+            and of requests which reused an open connection.
+        """
+        requests_, connections = 0, 0
+        for key in self.adapter.poolmanager.pools.keys():
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                requests_ += pool.num_requests
+                connections += pool.num_connections
+        return dict(
+            requests=requests_,
+            opened=connections,
+            reused=requests_ - connections,
+        )
+
+    def close(self):
+        """Closes all the connections of the client."""
+        self.session.close()
@@ -0,0 +1,119 @@
+"""
+Defines a single-flight layer coalescing identical calls made concurrently,
+so that threads asking for the same Jpl Horizons query at the same time share
+one http request and one parsed response.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# the default number of keys whose metrics are kept
+MAX_KEYS = 10000
+
+
+def _metrics():
+    return dict(calls=0, executions=0, coalesced=0, errors=0)
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls by key: while a call for a key is in flight,
+    later calls for the same key wait for it and share its result (or its
+    exception) instead of being performed again.
+
+    Calls are only coalesced while in flight, results are not retained
+    afterwards (see :class:`eph.cache.ResponseCache` for that). Metrics are
+    kept for the `max_keys` keys called most recently.
+    """
+
+    def __init__(self, max_keys=MAX_KEYS):
+        """
+        Initialize a :class:`SingleFlight` object.
+
+        Args:
+            max_keys (int): the maximum number of keys whose metrics are
+                kept.
+        """
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = OrderedDict()
+
+    def _metrics(self, key):
+        # the metrics of a key, evicting those of the least recent keys
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _metrics()
+            while len(self._stats) > self.max_keys:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        return stats
+
+    def do(self, key, func):
+        """
+        Calls `func`, unless a call for the same key is in flight, in which
+        case its result is waited for and returned.
+
+        Args:
+            key: the key identifying equivalent calls.
+            func: the callable to be called.
+
+        Returns:
+            the result of `func`, shared by coalesced calls.
+        """
+        with self._lock:
+            stats = self._metrics(key)
+            stats['calls'] += 1
+            future = self._calls.get(key)
+            if future is None:
+                leader = True
+                stats['executions'] += 1
+                future = self._calls[key] = Future()
+            else:
+                leader = False
+                stats['coalesced'] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                stats['errors'] += 1
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        future.set_result(result)
+        return result
+
+    def in_flight(self):
+        """Returns the keys of the calls in flight."""
+        with self._lock:
+            return list(self._calls)
+
+    def stats(self, key=None):
+        """
+        Returns the metrics of calls.
+
+        Args:
+            key: the key whose metrics are returned. The metrics of all keys
+                are returned if None.
+
+        Returns:
+            dict: the number of calls, of calls actually performed
+            (executions), of calls which shared the result of another one
+            (coalesced) and of executions which raised an exception, by key
+            if `key` is None.
+        """
+        with self._lock:
+            if key is not None:
+                return dict(self._stats.get(key, _metrics()))
+            return {k: dict(v) for k, v in self._stats.items()}
+
+    def reset(self):
+        """Clears the metrics of calls."""
+        with self._lock:
+            self._stats.clear()
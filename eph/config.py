@@ -2,7 +2,7 @@ import os.path
 from shutil import copy2
 from six.moves import configparser
 
-from .util import path
+from .util import path, yes_or_no
 from .exceptions import ConfigParserError, ConfigNotFoundError
 
 
@@ -14,6 +14,10 @@ def get_config_file():
     return os.path.join(get_config_dir(), '.ephrc')
 
 
+def get_cache_dir():
+    return os.path.join(get_config_dir(), '.cache', 'eph')
+
+
 def get_default_config_file():
     return os.path.abspath(os.path.join(os.path.dirname(__file__), 'eph.cfg'))
 
@@ -35,3 +39,36 @@ def read_config(filename=None, section=None):
         return dict(parser.items(section if section else 'DEFAULT'))
     else:
         raise ConfigNotFoundError('Config file not found.')
+
+
+CACHE_OPTIONS = ('directory', 'max_size', 'ttl', 'tables')
+
+
+def read_cache_config(filename=None, section='cache'):
+    try:
+        params = read_config(filename, section=section)
+    except (ConfigNotFoundError, configparser.NoSectionError):
+        return None
+    config = {k: v for k, v in params.items() if k in CACHE_OPTIONS}
+    if 'tables' in config:
+        config['tables'] = yes_or_no(config['tables'], yes=True, no=False)
+    return config
+
+
+TRANSPORT_OPTIONS = ('transport', 'endpoint', 'directory', 'pool_size',
+                     'timeout', 'record')
+
+
+def read_transport_config(filename=None, section='transport'):
+    try:
+        params = read_config(filename, section=section)
+    except (ConfigNotFoundError, configparser.NoSectionError):
+        return None
+    config = {k: v for k, v in params.items() if k in TRANSPORT_OPTIONS}
+    if 'pool_size' in config:
+        config['pool_size'] = int(config['pool_size'])
+    if 'timeout' in config:
+        config['timeout'] = float(config['timeout'])
+    if 'record' in config:
+        config['record'] = yes_or_no(config['record'], yes=True, no=False)
+    return config
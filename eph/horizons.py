@@ -1,7 +1,8 @@
 """Defines variables and functions used to interfacing with JPL Horizons
 system."""
 
-from datetime import datetime
+import re
+from datetime import datetime, timedelta
 from astropy.time import Time
 
 from .util import wrap, yes_or_no
@@ -9,6 +10,12 @@ from .exceptions import JplBadParamError
 
 JPL_ENDPOINT = 'https://ssd.jpl.nasa.gov/horizons_batch.cgi?batch=1'
 
+MAX_ROWS = 90000
+
+MAX_TLIST = 10000
+
+MAX_URL_LENGTH = 8000
+
 JPL_PARAMS = {
     # target
     'COMMAND',
@@ -281,6 +288,15 @@ def get_col_dim(col):
             return dim
 
 
+# columns of calendar dates
+
+DATE_COLS = (
+    'Calendar Date (TDB)',
+    'Date__(UT)__HR:MN:SC.fff',
+    'Date__(UT)__HR:MN',
+)
+
+
 def format_time(t):
     """
     Modify time data t so that str(t) can be interpreted by Jpl.
@@ -299,6 +315,72 @@ def format_time(t):
     return t
 
 
+TIME_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%Y-%b-%d %H:%M:%S',
+    '%Y-%b-%d %H:%M',
+    '%Y-%b-%d',
+)
+
+
+def parse_time(t):
+    """
+    Tries to interpret time data t as a datetime.
+
+    Args:
+        t: the time data. It can be a str in one of the formats in
+        ``TIME_FORMATS``, an astropy.time.Time or a datetime object.
+
+    Returns:
+        datetime: the corresponding datetime or None if t cannot be
+        interpreted.
+    """
+    if isinstance(t, datetime):
+        return t
+    elif isinstance(t, Time):
+        return t.datetime
+    cleaned = str(t).strip('\'" ')
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt)
+        except ValueError:
+            pass
+
+
+STEP_UNITS = (
+    ('mo', None),
+    ('y', None),
+    ('d', timedelta(days=1)),
+    ('h', timedelta(hours=1)),
+    ('m', timedelta(minutes=1)),
+)
+
+
+def parse_step(step):
+    """
+    Interprets a Jpl step size.
+
+    Args:
+        step: the step size, i.e. an integer followed by optional units.
+
+    Returns:
+        the step as a timedelta if it has fixed-length units, the number of
+        equal intervals (int) if it has no units, None if it cannot be
+        interpreted or has calendar (months, years) units.
+    """
+    m = re.match(r'^(\d+)\s*([a-zA-Z]*)', str(step).strip('\'" '))
+    if not m:
+        return None
+    n, units = int(m.group(1)), m.group(2).lower()
+    if not units:
+        return n
+    for prefix, delta in STEP_UNITS:
+        if units.startswith(prefix):
+            return n * delta if delta and n else None
+
+
 # aliases and filters
 
 ALIASES = dict(
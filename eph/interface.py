@@ -5,15 +5,25 @@ service`_ from NASA.
 .. _`Jpl Horizons service`: https://ssd.jpl.nasa.gov/?horizons
 """
 
+import io
+import threading
+from string import whitespace as ws
+
 import requests
 
 from astropy.table import QTable
 
+from six.moves.urllib.parse import urlencode
+
 from .util import addparams2url, wrap
 from .config import read_config
 from .models import BaseMap
-from .horizons import JPL_ENDPOINT, transform_key, transform
-from .parsers import parse, get_sections
+from .throttle import get_throttle
+from .horizons import (JPL_ENDPOINT, MAX_ROWS, transform_key, transform,
+                       parse_time, parse_step)
+from .parsers import (ENGINES, find_sections, get_sections, parse_params,
+                      is_csv, get_label_lines, parse_ephemeris, parse_cols,
+                      parse_meta, parse_units, make_table)
 
 
 class JplReq(BaseMap):
@@ -25,19 +35,43 @@ class JplReq(BaseMap):
     as attributes of the :class:`JplReq` instance. Furthermore, keys and
     values are adjusted to match Jpl Horizons interface in order to
     enhance readability and usability.
+
+    Requests are performed through their :attr:`transport` (see
+    :mod:`eph.transports`), with `requests`_ if None.
+
+    .. _`requests`: http://docs.python-requests.org/en/master/
     """
 
+    def __init__(self, *args, **kwargs):
+        transport = kwargs.pop('transport', None)
+        if transport is None and args and isinstance(args[0], JplReq):
+            transport = args[0].transport
+        self.transport = transport
+        super(JplReq, self).__init__(*args, **kwargs)
+
+    @property
+    def transport(self):
+        """The transport performing the request (see
+        :mod:`eph.transports`), inherited by requests copied from it."""
+        return self.__dict__.get('_transport')
+
+    @transport.setter
+    def transport(self, value):
+        self.__dict__['_transport'] = value
+
     def __getattr__(self, key):
         key = transform_key(key)
-        return super(self.__class__, self).__getattr__(key)
+        return super(JplReq, self).__getattr__(key)
 
     def __setattr__(self, key, value):
+        if key == 'transport':
+            return object.__setattr__(self, key, value)
         k, v = transform(key, value)
-        super(self.__class__, self).__setattr__(k, v)
+        super(JplReq, self).__setattr__(k, v)
 
     def __delattr__(self, key):
         key = transform_key(key)
-        super(self.__class__, self).__delattr__(key)
+        super(JplReq, self).__delattr__(key)
 
     def read(self, filename, section='DEFAULT'):
         """
@@ -67,57 +101,426 @@ class JplReq(BaseMap):
         return addparams2url(JPL_ENDPOINT,
                              {k: wrap(str(v)) for k, v in self.items()})
 
-    def query(self):
+    def canonical(self):
+        """
+        Calculate a canonical representation of the Jpl parameters of the
+        :class:`JplReq` object, that does not depend on the order in which
+        parameters were set.
+
+        Returns:
+            str: the sorted and encoded Jpl parameters.
+        """
+        return urlencode(sorted((k, wrap(str(v))) for k, v in self.items()))
+
+    def response_key(self, transport=None):
+        """
+        Calculate a key identifying the response to the :class:`JplReq`
+        object, used to cache and coalesce queries.
+
+        Args:
+            transport: the transport performing the request, the
+                :attr:`transport` of the request if None.
+
+        Returns:
+            str: the :meth:`canonical` parameters, prefixed by the endpoint
+            queried if the transport replaces the Jpl Horizons service (e.g.
+            a mock or a mirror).
+        """
+        transport = transport if transport is not None else self.transport
+        resolve = getattr(transport, 'resolve', None)
+        endpoint = resolve(JPL_ENDPOINT) if resolve else JPL_ENDPOINT
+        if endpoint == JPL_ENDPOINT:
+            return self.canonical()
+        return '{0} {1}'.format(endpoint, self.canonical())
+
+    def estimate_rows(self):
+        """
+        Estimates the number of rows of the ephemeris requested from the
+        START_TIME, STOP_TIME and STEP_SIZE parameters.
+
+        Returns:
+            int: the estimated number of rows or None if it cannot be
+            estimated.
+        """
+        if 'TLIST' in self:
+            return None
+        step = parse_step(self.get('STEP_SIZE', ''))
+        if isinstance(step, int):
+            return step + 1
+        start = parse_time(self.get('START_TIME', ''))
+        stop = parse_time(self.get('STOP_TIME', ''))
+        if step is None or start is None or stop is None or stop < start:
+            return None
+        return int((stop - start) // step) + 1
+
+    def split(self, max_rows=MAX_ROWS):
+        """
+        Splits the request in consecutive requests for time windows of at most
+        `max_rows` rows each (Jpl Horizons caps the number of output lines
+        per request).
+
+        Consecutive windows share their boundary epoch, so that the first row
+        of a window repeats the last row of the previous one.
+
+        Args:
+            max_rows (int): the maximum number of rows of each window.
+
+        Returns:
+            :class:`list`: the list of requests, just the request itself if no
+            splitting is needed or possible.
+        """
+        rows = self.estimate_rows()
+        step = parse_step(self.get('STEP_SIZE', ''))
+        if rows is None or rows <= max_rows or isinstance(step, int):
+            return [self]
+        if max_rows < 2:
+            raise ValueError('Windows must contain at least two rows.')
+        start = parse_time(self['START_TIME'])
+        stop = parse_time(self['STOP_TIME'])
+        window = (max_rows - 1) * step
+        reqs = []
+        while start < stop:
+            req = self.__class__(self)
+            req.start_time = start.strftime('%Y-%m-%d %H:%M:%S')
+            if start + window < stop:
+                req.stop_time = (start + window).strftime('%Y-%m-%d %H:%M:%S')
+            reqs.append(req)
+            start += window
+        return reqs
+
+    def query(self,
+              stream=False,
+              cache=None,
+              session=None,
+              flight=None,
+              timeout=None,
+              retry=None,
+              hedge=None):
         """
         Performs the query to the Jpl Horizons service.
 
+        Args:
+            stream (bool): if True, the body of the http response is not
+                downloaded immediately but read incrementally on access.
+            cache (:class:`eph.cache.ResponseCache`): if given, the response
+                is looked up in the cache before querying the service and
+                successful responses are stored in it. Parsed tables are
+                cached as well if the cache has a table tier.
+            session: a :class:`eph.Client` (or a `requests.Session`) whose
+                connections are reused to perform the request, or any
+                transport (see :mod:`eph.transports`) to be used in place
+                of :attr:`transport`.
+            flight (:class:`eph.coalesce.SingleFlight`): if given, identical
+                queries (by :meth:`response_key`) performed
+                concurrently share one http request and one response,
+                whose parsed tables are shared as well. Streamed queries
+                are never coalesced.
+            timeout: the timeout in seconds of the http request, as a
+                single value or a (connect, read) tuple. The default of the
+                transport (no timeout for plain requests) if None.
+            retry (:class:`eph.retry.Retry`): if given, requests failing
+                with connection errors, timeouts or transient http statuses
+                are retried with jittered exponential backoff.
+            hedge (:class:`eph.retry.Hedge`): if given, a duplicate request
+                is fired when the first one is slower than most (e.g. than
+                their 95th percentile) and the first answer wins.
+
+        Http requests are limited by the throttle shared by the process, if
+        one is installed (see :func:`eph.throttle.set_throttle`).
+
         Returns:
             :class:`JplRes`: the response from Jpl Horizons service.
 
         Raises:
             :class:`ConnectionError`
         """
+        transport = session if session is not None else self.transport
+        if flight is not None and not stream:
+            return flight.do(
+                self.response_key(transport),
+                lambda: self.query(cache=cache,
+                                   session=session,
+                                   timeout=timeout,
+                                   retry=retry,
+                                   hedge=hedge))
+
+        get = transport.get if transport is not None else requests.get
+        kwargs = dict(stream=stream)
+        if timeout is not None:
+            kwargs.update(timeout=timeout)
+        throttle = get_throttle()
+
+        def send(started=None):
+            if throttle is not None:
+                return throttle.call(lambda: get(self.url(), **kwargs),
+                                     started=started)
+            if started is not None:
+                started()
+            return get(self.url(), **kwargs)
+
+        def attempt():
+            if hedge is not None:
+                # hedging delays start once the throttle lets requests out
+                return hedge.call(send, waits=True)
+            return send()
+
+        def fetch():
+            try:
+                http_response = retry.call(attempt) if retry else attempt()
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                raise ConnectionError(e.__str__())
+            if cache is not None and not stream and http_response.ok:
+                text = http_response.text
+                if '$$SOE' in text:
+                    cache.set(key, text)
+            return http_response
+
+        key, tables = None, None
+        if cache is not None:
+            key, tables = cache.key(self.response_key(transport)), \
+                cache.tables
+            if stream:
+                text = cache.get(key)
+                if text is not None:
+                    return JplRes(make_response(text, url=self.url()),
+                                  cache=tables,
+                                  key=key)
+            else:
+                filename = cache.lookup(key)
+                if filename is not None:
+                    # the text is only read if the table cache misses
+                    def load():
+                        try:
+                            text = cache.load(filename)
+                        except (IOError, OSError, ValueError):
+                            return fetch()
+                        return make_response(text, url=self.url())
+
+                    return JplRes(None, cache=tables, key=key, load=load)
+
+        return JplRes(fetch(), cache=tables, key=key)
+
+    def stream(self, rows=1000, target=QTable, session=None):
+        """
+        Performs the query to the Jpl Horizons service and parses the
+        response while it is downloaded.
 
-        try:
-            http_response = requests.get(self.url())
-        except requests.exceptions.ConnectionError as e:
-            raise ConnectionError(e.__str__())
+        Args:
+            rows (int): the maximum number of rows of each chunk.
+            target: the type of tables to produce (Table or QTable).
+            session: a :class:`eph.Client` to perform the request with.
+
+        Returns:
+            generator: the tables containing consecutive chunks of data.
+
+        Raises:
+            :class:`ConnectionError`
+        """
+        res = self.query(stream=True, session=session)
+        return res.iter_chunks(rows=rows, target=target)
+
+
+def make_response(text, url=None):
+    """
+    Builds a `requests`_ http response object out of the content of a Jpl
+    Horizons response, e.g. to replay a stored response.
+
+    Args:
+        text (str): the content of the response.
+        url (str): the url of the response.
 
-        return JplRes(http_response)
+    Returns:
+        the http response object.
+
+    .. _`requests`: http://docs.python-requests.org/en/master/
+    """
+    http_response = requests.models.Response()
+    http_response.raw = io.BytesIO(text.encode('utf-8'))
+    http_response.encoding = 'utf-8'
+    http_response.status_code = 200
+    http_response.url = url
+    return http_response
 
 
 class JplRes(object):
-    """A response from the Jpl Horizons service."""
+    """
+    A response from the Jpl Horizons service.
 
-    def __init__(self, http_response):
+    The decoded text, its sections, the echoed parameters, metadata, units
+    and parsed tables are computed lazily and memoized, so that repeated
+    access does not repeat the work, even by concurrent threads sharing
+    the response. Large intermediates can be dropped with :meth:`release`,
+    retaining only what has been parsed already.
+    """
+
+    def __init__(self, http_response, cache=None, key=None, load=None):
         """
         Initialize a :class:`JplRes` object from a `requests`_ http response
         object.
 
         Args:
             http_response: the http response from Jpl Horizons service.
+            cache (:class:`eph.cache.TableCache`): the cache of parsed
+                tables to be used by :meth:`parse`.
+            key (str): the cache key of the request of the response.
+            load: a callable returning the http response on first access,
+                if `http_response` is None (e.g. reading it from a cache
+                only if parsed tables are not cached).
 
         .. _`requests`: http://docs.python-requests.org/en/master/
         """
-        self.http_response = http_response
+        self._http_response = http_response
+        self._load = load
+        self.cache = cache
+        self.key = key
+        self._memo = {}
+        self._lock = threading.RLock()
+
+    @property
+    def http_response(self):
+        """The http response, loaded on first access if needed."""
+        if self._load is not None:
+            with self._lock:
+                if self._load is not None:
+                    self._http_response, self._load = self._load(), None
+        return self._http_response
+
+    def _memoized(self, name, compute):
+        try:
+            return self._memo[name]
+        except KeyError:
+            pass
+        with self._lock:
+            try:
+                return self._memo[name]
+            except KeyError:
+                value = self._memo[name] = compute()
+                return value
+
+    def _text(self):
+        if self.http_response is None:
+            raise ValueError('The response has been released.')
+        return self.http_response.text
 
     def raw(self):
         """Returns the content of the Jpl Horizons http response as is."""
-        return self.http_response.text
+        return self._memoized('text', self._text)
+
+    def spans(self):
+        """
+        Returns the offsets of the sections of the response (see
+        :func:`eph.parsers.find_sections`), locating them on first call only.
+        """
+        return self._memoized('spans', lambda: find_sections(self.raw()))
+
+    def _section(self, i):
+        start, stop = self.spans()[i]
+        return self.raw()[start:stop]
 
     def get_header(self):
-        header, ephem, footer = get_sections(self.raw())
-        return header
+        return self._memoized('header', lambda: self._section(0))
 
     def get_data(self):
-        header, data, footer = get_sections(self.raw())
-        return data
+        return self._section(1)
 
     def get_footer(self):
-        header, ephemeris, footer = get_sections(self.raw())
-        return footer
+        return self._section(2)
 
-    def parse(self, target=QTable):
+    def get_params(self):
+        """Returns the request parameters echoed by the Jpl Horizons
+        service."""
+        return self._memoized('params',
+                              lambda: parse_params(self.raw(), self.spans()))
+
+    def get_cols(self):
+        """Returns the names of the columns of the ephemeris."""
+        return self._memoized('cols', lambda: parse_cols(self.get_header()))
+
+    def get_meta(self):
+        """Returns the metadata found in the header of the ephemeris."""
+        return self._memoized('meta', lambda: parse_meta(self.get_header()))
+
+    def get_units(self):
+        """Returns the units of each physical dimension of the ephemeris."""
+        return self._memoized('units', lambda: parse_units(self.get_meta()))
+
+    def release(self):
+        """
+        Drops the http response, its decoded text and its sections.
+
+        Parameters, metadata, units and tables already parsed are retained,
+        while any later access needing the text raises a
+        :class:`ValueError`.
+        """
+        for name in ('text', 'spans', 'header'):
+            self._memo.pop(name, None)
+        self._http_response, self._load = None, None
+
+    def iter_lines(self):
+        """Iterates over the lines of the Jpl Horizons http response as they
+        are read."""
+        for line in self.http_response.iter_lines(decode_unicode=True):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            yield line
+
+    def iter_chunks(self, rows=1000, target=QTable):
+        """
+        Parse the http response from Jpl Horizons incrementally, yielding
+        tables of at most `rows` rows.
+
+        Only the header and the current chunk of data lines are held in
+        memory, so that the memory footprint does not depend on the length
+        of the ephemeris.
+
+        Args:
+            rows (int): the maximum number of rows of each chunk.
+            target: the type of tables to produce (Table or QTable).
+
+        Returns:
+            generator: the tables containing consecutive chunks of data.
+
+        Raises:
+            :class:`JplBadReqError`
+        """
+        if rows < 1:
+            raise ValueError('Chunks must contain at least one row.')
+        lines = self.iter_lines()
+        header = []
+        for line in lines:
+            if line.startswith('$$SOE'):
+                break
+            header.append(line)
+        else:
+            get_sections('\n'.join(header))
+        header = '\n'.join(header).strip(ws + '*')
+        csv = len(parse_cols(header)) > 1
+        labels = get_label_lines(header)
+        records = not csv and len(labels) > 1 and labels[0] == 'JDTDB'
+        size = len(labels) if records else 1
+        meta = parse_meta(header)
+        units = parse_units(meta)
+
+        def parse_chunk(chunk):
+            cols, data = parse_ephemeris(header, '\n'.join(chunk), csv=csv)
+            return make_table(data, cols, dict(meta), units, target=target)
+
+        chunk = []
+        try:
+            for line in lines:
+                if line.startswith('$$EOE'):
+                    break
+                chunk.append(line)
+                if len(chunk) == rows * size:
+                    yield parse_chunk(chunk)
+                    chunk = []
+            if chunk:
+                yield parse_chunk(chunk)
+        finally:
+            self.http_response.close()
+
+    def parse(self, target=QTable, engine='numpy', parse_dates=False):
         """
         Parse the http response from Jpl Horizons and return, according to
         target.
@@ -125,10 +528,44 @@ class JplRes(object):
          * an `astropy.table.Table`_ object.
          * an `astropy.table.QTable`_ object.
 
+        The `engine` argument selects the parser engine for the data section
+        and `parse_dates` whether calendar dates are converted in
+        ``datetime64`` columns (see :func:`eph.parsers.parse`). If the
+        response has a table cache,
+        the table is loaded from it when available, skipping text parsing
+        (and reading, for responses served by a cache).
+        Tables are memoized, so that further calls return the same object.
+
         .. _`astropy.table.Table`: http://docs.astropy.org/en/stable/table/
         .. _`astropy.table.QTable`: http://docs.astropy.org/en/stable/table/
         """
-        return parse(self.raw(), target=target)
+        if engine not in ENGINES:
+            raise ValueError('Available engines are {0}.'.format(
+                ', '.join(sorted(ENGINES))))
+        return self._memoized(('table', target, engine, parse_dates),
+                              lambda: self._parse(target, engine, parse_dates))
+
+    def _parse(self, target, engine, parse_dates):
+        if self.cache is None or self.key is None:
+            return self._make_table(target, engine, parse_dates)
+        key = self.cache.table_key(self.key, target, dates=parse_dates)
+        table = self.cache.get(key, target=target)
+        if table is None:
+            table = self._make_table(target, engine, parse_dates)
+            try:
+                self.cache.set(key, table)
+            except TypeError:
+                pass
+        return table
+
+    def _make_table(self, target, engine, parse_dates):
+        cols, data = parse_ephemeris(self.get_header(),
+                                     self.get_data(),
+                                     csv=is_csv(self.get_params()),
+                                     engine=engine,
+                                     parse_dates=parse_dates)
+        return make_table(data, cols, dict(self.get_meta()),
+                          self.get_units(), target=target)
 
     def __str__(self):
         return self.raw()
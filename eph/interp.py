@@ -0,0 +1,395 @@
+"""
+Defines interpolants of vector ephemerides, to evaluate positions and
+velocities at arbitrary epochs from a table already retrieved (e.g. with
+:func:`eph.shortcuts.vec`) without querying the Jpl Horizons service again.
+"""
+
+from math import factorial
+
+import numpy as np
+from numpy.polynomial import chebyshev as cheb
+from astropy import units as u
+from astropy.table import QTable
+from astropy.time import Time
+
+from .horizons import DIM_COL
+
+POSITION = ('X', 'Y', 'Z')
+
+VELOCITY = ('VX', 'VY', 'VZ')
+
+# safety factor applied to error bounds estimated by finite differences
+SAFETY = 2.
+
+
+def get_vectors(table, obj=None):
+    """
+    Extracts epochs, positions and velocities from a vector table.
+
+    Args:
+        table: the table (e.g. the output of :func:`eph.shortcuts.vec`).
+        obj (str): the object whose columns are to be extracted, in case of
+            tables with columns prefixed by object names.
+
+    Returns:
+        :class:`tuple`: Julian dates, positions and velocities (None if the
+        table has no velocity columns) as (n, 3) Quantity arrays.
+
+    Raises:
+        :class:`KeyError`: if the table has no JDTDB or position columns.
+    """
+    prefix = obj + '_' if obj else ''
+    space = [col for col in POSITION if col in DIM_COL['SPACE']]
+    velocity = [col for col in VELOCITY if col in DIM_COL['VELOCITY']]
+    jd = _values(table['JDTDB'])
+    pos = _stack([table[prefix + col] for col in space])
+    if all(prefix + col in table.colnames for col in velocity):
+        vel = _stack([table[prefix + col] for col in velocity])
+    else:
+        vel = None
+    return jd, pos, vel
+
+
+def _values(col):
+    return np.asarray(getattr(col, 'value', col), dtype=np.float64)
+
+
+def _stack(cols):
+    unit = getattr(cols[0], 'unit', None) or u.dimensionless_unscaled
+    return u.Quantity([u.Quantity(col, unit).value for col in cols],
+                      unit).T
+
+
+def divided_differences(t, values, order):
+    """
+    Computes the divided differences of samples.
+
+    Args:
+        t: the (n,) sorted sample epochs.
+        values: the (n, components) samples.
+        order (int): the order of the differences.
+
+    Returns:
+        the (n - order, components) divided differences f[t_j, ...,
+        t_{j + order}], which estimate the order-th derivative divided by
+        order! on non-uniform grids as well.
+    """
+    d = np.asarray(values, dtype=np.float64)
+    for k in range(1, order + 1):
+        d = (d[1:] - d[:-1]) / (t[k:] - t[:-k])[:, None]
+    return d
+
+
+def _window_max(m, starts, lo, hi):
+    # the maximum of m over the windows starts + lo ... starts + hi
+    idx = np.clip(np.asarray(starts)[:, None] + np.arange(lo, hi + 1), 0,
+                  len(m) - 1)
+    return m[idx].max(axis=1)
+
+
+def _jd(t):
+    if isinstance(t, Time):
+        return np.atleast_1d(t.tdb.jd)
+    return np.atleast_1d(np.asarray(getattr(t, 'value', t), dtype=np.float64))
+
+
+class PiecewiseChebyshev(object):
+    """
+    A piecewise polynomial expressed in Chebyshev series on each segment.
+
+    Segments are looked up by binary search over the breakpoints, and each
+    segment has its own domain, mapped to [-1, 1], where its series is
+    evaluated with the Clenshaw recurrence, for all epochs at once.
+    """
+
+    def __init__(self, breaks, mid, radius, coeffs):
+        """
+        Initialize a :class:`PiecewiseChebyshev` object.
+
+        Args:
+            breaks: the n + 1 sorted breakpoints delimiting n segments.
+            mid: the centers of the domains of the n segments.
+            radius: the half-widths of the domains of the n segments.
+            coeffs: the (n, degree + 1, components) Chebyshev coefficients.
+        """
+        self.breaks = np.asarray(breaks, dtype=np.float64)
+        self.mid = np.asarray(mid, dtype=np.float64)
+        self.radius = np.asarray(radius, dtype=np.float64)
+        self.coeffs = np.asarray(coeffs, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, t, values, breaks, starts, degree):
+        """
+        Fits Chebyshev series on segments of samples.
+
+        Args:
+            t: the sorted sample epochs.
+            values: the (n, components) samples.
+            breaks: the breakpoints delimiting segments.
+            starts: the index of the first sample of each segment. Each
+                segment is fitted on `degree` + 1 consecutive samples.
+            degree (int): the degree of the series.
+
+        Returns:
+            :class:`PiecewiseChebyshev`: the fitted piecewise polynomial.
+        """
+        idx = np.asarray(starts)[:, None] + np.arange(degree + 1)
+        lo, hi = t[idx[:, 0]], t[idx[:, -1]]
+        mid, radius = (hi + lo) / 2, (hi - lo) / 2
+        x = (t[idx] - mid[:, None]) / radius[:, None]
+        vander = cheb.chebvander(x, degree)
+        coeffs = np.linalg.solve(vander, values[idx])
+        return cls(breaks, mid, radius, coeffs)
+
+    def segments(self, t):
+        """Finds the segment of each epoch in `t`."""
+        if np.any(t < self.breaks[0]) or np.any(t > self.breaks[-1]):
+            raise ValueError('Epochs out of the interpolation range.')
+        idx = np.searchsorted(self.breaks, t, side='right') - 1
+        return np.clip(idx, 0, len(self.mid) - 1)
+
+    def __call__(self, t, derivative=False):
+        """
+        Evaluates the piecewise polynomial (or its derivative).
+
+        Args:
+            t: the epochs.
+            derivative (bool): whether to evaluate the first derivative.
+
+        Returns:
+            the (len(t), components) array of values.
+        """
+        t = np.asarray(t, dtype=np.float64)
+        idx = self.segments(t)
+        x = (t - self.mid[idx]) / self.radius[idx]
+        coeffs = self.coeffs
+        if derivative:
+            coeffs = cheb.chebder(coeffs, axis=1)
+            coeffs = coeffs / self.radius[:, None, None]
+        return clenshaw(x, coeffs, index=idx)
+
+
+def clenshaw(x, coeffs, index=None):
+    """
+    Evaluates Chebyshev series with the Clenshaw recurrence, each point with
+    its own coefficients.
+
+    Args:
+        x: the (n,) points in [-1, 1].
+        coeffs: the (n, degree + 1, components) coefficients, or the
+            (series, degree + 1, components) coefficients of several series
+            if `index` is given.
+        index: the (n,) series of each point. Coefficients are gathered one
+            degree at a time, so that they are never copied for each point.
+
+    Returns:
+        the (n, components) values.
+    """
+    if index is None:
+        index = slice(None)
+    x = x[:, None]
+    b1 = np.zeros((len(x), coeffs.shape[2]))
+    b2 = np.zeros_like(b1)
+    for k in range(coeffs.shape[1] - 1, 0, -1):
+        b1, b2 = 2 * x * b1 - b2 + coeffs[index, k], b1
+    return x * b1 - b2 + coeffs[index, 0]
+
+
+class Interpolant(object):
+    """
+    Base class for interpolants of vector ephemerides.
+
+    An interpolant evaluates positions and velocities at arbitrary epochs
+    within the time span of the table it is built from, with an estimated
+    maximum position error given by `error_bound`.
+    """
+
+    def __init__(self, table, obj=None):
+        """
+        Initialize an :class:`Interpolant` from a vector table.
+
+        Args:
+            table: the table, e.g. the output of :func:`eph.shortcuts.vec`.
+            obj (str): the object to interpolate in multi-object tables.
+        """
+        jd, pos, vel = get_vectors(table, obj=obj)
+        if len(jd) < 2 or np.any(np.diff(jd) <= 0):
+            raise ValueError(
+                'At least two samples with increasing epochs are needed.')
+        self.jd = jd
+        self.pos_unit = pos.unit
+        self.vel_unit = vel.unit if vel is not None else pos.unit / u.day
+        self.pos = pos.value
+        self.vel = vel.to(self.pos_unit / u.day).value if vel is not None \
+            else None
+        self.error_bound = None
+
+    def position(self, t):
+        """
+        Evaluates positions.
+
+        Args:
+            t: the epochs, as an astropy Time or Julian dates (TDB).
+
+        Returns:
+            :class:`astropy.units.Quantity`: the (n, 3) positions.
+        """
+        raise NotImplementedError
+
+    def velocity(self, t):
+        """
+        Evaluates velocities.
+
+        Args:
+            t: the epochs, as an astropy Time or Julian dates (TDB).
+
+        Returns:
+            :class:`astropy.units.Quantity`: the (n, 3) velocities.
+        """
+        raise NotImplementedError
+
+    def __call__(self, t):
+        """
+        Evaluates positions and velocities.
+
+        Args:
+            t: the epochs, as an astropy Time or Julian dates (TDB).
+
+        Returns:
+            :class:`astropy.table.QTable`: a vector table at the epochs.
+        """
+        jd = _jd(t)
+        pos, vel = self.position(jd), self.velocity(jd)
+        data = [jd * u.day] + [pos[:, i] for i in range(3)] + \
+            [vel[:, i] for i in range(3)]
+        return QTable(data, names=('JDTDB', ) + POSITION + VELOCITY)
+
+
+class HermiteInterpolant(Interpolant):
+    """
+    A piecewise cubic Hermite interpolant, matching positions and velocities
+    at each sample.
+
+    The error bound is estimated on each interval as h^4 max|f''''| / 384,
+    with h the length of the interval and the fourth derivative estimated by
+    the divided differences of positions around it, times a ``SAFETY``
+    factor.
+    """
+
+    def __init__(self, table, obj=None):
+        super(HermiteInterpolant, self).__init__(table, obj=obj)
+        if self.vel is None:
+            raise ValueError('Hermite interpolation needs velocity columns.')
+        if len(self.jd) > 4:
+            h = np.diff(self.jd)
+            # f'''' / 4! on the windows of 5 samples around each interval
+            m = np.abs(divided_differences(self.jd, self.pos, 4)).max(axis=1)
+            m = _window_max(m, np.arange(len(h)), -3, 0)
+            bound = (m * h**4).max() * factorial(4) / 384 * SAFETY
+        else:
+            bound = np.inf
+        self.error_bound = bound * self.pos_unit
+
+    def basis(self, t):
+        t = _jd(t)
+        if np.any(t < self.jd[0]) or np.any(t > self.jd[-1]):
+            raise ValueError('Epochs out of the interpolation range.')
+        idx = np.clip(
+            np.searchsorted(self.jd, t, side='right') - 1, 0,
+            len(self.jd) - 2)
+        h = (self.jd[idx + 1] - self.jd[idx])[:, None]
+        s = ((t - self.jd[idx]) / h[:, 0])[:, None]
+        p0, p1 = self.pos[idx], self.pos[idx + 1]
+        m0, m1 = self.vel[idx] * h, self.vel[idx + 1] * h
+        return s, h, p0, p1, m0, m1
+
+    def position(self, t):
+        s, h, p0, p1, m0, m1 = self.basis(t)
+        s2, s3 = s * s, s * s * s
+        pos = (2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * m0 + \
+            (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * m1
+        return pos * self.pos_unit
+
+    def velocity(self, t):
+        s, h, p0, p1, m0, m1 = self.basis(t)
+        s2 = s * s
+        vel = ((6 * s2 - 6 * s) * p0 + (3 * s2 - 4 * s + 1) * m0 +
+               (-6 * s2 + 6 * s) * p1 + (3 * s2 - 2 * s) * m1) / h
+        return (vel * self.pos_unit / u.day).to(self.vel_unit)
+
+
+class ChebyshevInterpolant(Interpolant):
+    """
+    A piecewise Chebyshev interpolant of positions, built on segments of
+    `degree` + 1 consecutive samples. Velocities are evaluated as the
+    derivative of the series.
+
+    The error bound is estimated on each segment from the (degree + 1)-th
+    divided differences of positions around it and the maximum of the nodal
+    polynomial of its samples, times a ``SAFETY`` factor.
+    """
+
+    def __init__(self, table, obj=None, degree=7):
+        super(ChebyshevInterpolant, self).__init__(table, obj=obj)
+        n = len(self.jd)
+        degree = min(degree, n - 1)
+        starts = np.minimum(np.arange(0, n - 1, degree), n - 1 - degree)
+        breaks = np.append(self.jd[:-1:degree], self.jd[-1])
+        self.degree = degree
+        self.series = PiecewiseChebyshev.fit(self.jd, self.pos, breaks,
+                                             starts, degree)
+        if n > degree + 1:
+            # f^(degree + 1) / (degree + 1)! on the windows of degree + 2
+            # samples overlapping each segment
+            m = divided_differences(self.jd, self.pos, degree + 1)
+            m = _window_max(np.abs(m).max(axis=1), starts, -degree,
+                            degree - 1)
+            bound = (m * self._nodal(starts)).max() * SAFETY
+        else:
+            bound = np.inf
+        self.error_bound = bound * self.pos_unit
+
+    def _nodal(self, starts, chunk=1000):
+        # the maximum of |prod(t - t_j)| over the samples t_j of each segment
+        s = np.linspace(0, 1, 100 * self.degree + 1)
+        nodal = []
+        for i in range(0, len(starts), chunk):
+            idx = starts[i:i + chunk, None] + np.arange(self.degree + 1)
+            nodes = self.jd[idx]
+            t = nodes[:, :1] + (nodes[:, -1:] - nodes[:, :1]) * s
+            nodal.append(
+                np.abs(np.prod(t[:, :, None] - nodes[:, None, :],
+                               axis=2)).max(axis=1))
+        return np.concatenate(nodal)
+
+    def position(self, t):
+        return self.series(_jd(t)) * self.pos_unit
+
+    def velocity(self, t):
+        vel = self.series(_jd(t), derivative=True) * self.pos_unit / u.day
+        return vel.to(self.vel_unit)
+
+
+METHODS = dict(
+    hermite=HermiteInterpolant,
+    chebyshev=ChebyshevInterpolant,
+)
+
+
+def interpolate(table, method='hermite', obj=None, **kwargs):
+    """
+    Builds an interpolant out of a vector table.
+
+    Args:
+        table: the table, e.g. the output of :func:`eph.shortcuts.vec`.
+        method (str): 'hermite' (needs velocities) or 'chebyshev'.
+        obj (str): the object to interpolate in multi-object tables.
+        kwargs: further arguments for the interpolant (e.g. `degree`).
+
+    Returns:
+        :class:`Interpolant`: the interpolant.
+    """
+    if method not in METHODS:
+        raise ValueError('Available methods are {0}.'.format(', '.join(
+            sorted(METHODS))))
+    return METHODS[method](table, obj=obj, **kwargs)
@@ -0,0 +1,217 @@
+"""
+Defines a compact binary ephemeris format, made of fixed-interval Chebyshev
+coefficient records (like the type 2 segments of SPICE SPK kernels), and a
+reader evaluating it through a memory-mapped view of the file.
+
+A kernel file starts with a JSON header, padded to an aligned offset, followed
+by the records as a contiguous ``float64`` array of shape
+(records, degree + 1, 3). Record ``i`` covers the time interval
+``[start + i * interval, start + (i + 1) * interval]``.
+"""
+
+import json
+import struct
+
+import numpy as np
+from numpy.polynomial import chebyshev as cheb
+from astropy import units as u
+from astropy.table import QTable
+
+from .interp import (POSITION, VELOCITY, ChebyshevInterpolant, clenshaw,
+                     get_vectors, _jd)
+
+KERNEL_MAGIC = b'EPHKRN1\n'
+
+KERNEL_ALIGN = 64
+
+# number of epochs per record where the fit residual is checked
+FIT_SAMPLES = 64
+
+
+def write_kernel(table, filename, obj=None, interval=None, degree=11):
+    """
+    Writes a vector table as a kernel file.
+
+    Positions are interpolated out of the table with a
+    :class:`eph.interp.ChebyshevInterpolant` at the Chebyshev nodes of each
+    record, so that records are exact Chebyshev interpolants of degree
+    `degree` of the interpolated positions. The maximum residual of records
+    against the interpolated positions, on a grid of ``FIT_SAMPLES`` epochs
+    per record, is stored in the header as the fit error.
+
+    Args:
+        table: the vector table, e.g. the output of :func:`eph.shortcuts.vec`.
+        filename (str): the output file.
+        obj (str): the object to be written in multi-object tables.
+        interval (float): the time span in days of each record. The span of
+            the table is divided in equal records not longer than `interval`.
+            Eight times the step of the table if None.
+        degree (int): the degree of Chebyshev series.
+    """
+    jd, pos, vel = get_vectors(table, obj=obj)
+    interp = ChebyshevInterpolant(table, obj=obj)
+    span = jd[-1] - jd[0]
+    if interval is None:
+        interval = 8 * np.median(np.diff(jd))
+    records = max(int(np.ceil(span / interval - 1e-9)), 1)
+    interval = span / records
+    start = jd[0]
+    mid = start + (np.arange(records) + .5) * interval
+    nodes = np.cos(np.pi * (np.arange(degree + 1) + .5) / (degree + 1))
+    t = np.clip(mid[:, None] + nodes * interval / 2, jd[0], jd[-1])
+    values = interp.position(t.ravel()).to(interp.pos_unit).value
+    values = values.reshape(records, degree + 1, 3)
+    coeffs = np.linalg.solve(cheb.chebvander(nodes, degree), values)
+    x = np.linspace(-1, 1, FIT_SAMPLES)
+    t = np.clip(mid[:, None] + x * interval / 2, jd[0], jd[-1])
+    x = (t - mid[:, None]) / (interval / 2)
+    fitted = clenshaw(x.ravel(), np.repeat(coeffs, FIT_SAMPLES, axis=0))
+    expected = interp.position(t.ravel()).to(interp.pos_unit).value
+    header = dict(
+        start=start,
+        interval=interval,
+        records=records,
+        degree=degree,
+        fit_error=float(np.abs(fitted - expected).max()),
+        interp_error=float(interp.error_bound.value),
+        pos_unit=interp.pos_unit.to_string(),
+        vel_unit=interp.vel_unit.to_string(),
+        meta=dict(table.meta),
+    )
+    header = json.dumps(header, default=str).encode('utf-8')
+    offset = len(KERNEL_MAGIC) + 8 + len(header)
+    offset += -offset % KERNEL_ALIGN
+    with open(filename, 'wb') as f:
+        f.write(KERNEL_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.seek(offset)
+        f.write(np.ascontiguousarray(coeffs, dtype='<f8').tobytes())
+
+
+class Kernel(object):
+    """
+    A kernel file opened for evaluation.
+
+    Records are memory-mapped read-only, so that the file is never loaded as
+    a whole and processes evaluating the same kernel share its pages through
+    the page cache. The record of an epoch is found in constant time from
+    the fixed record interval. Coefficients are gathered from the map one
+    degree at a time (see :func:`eph.interp.clenshaw`), never copied for
+    each epoch.
+
+    The error of positions is bounded by the sum of :attr:`fit_error`, the
+    maximum residual of records against the interpolant they were fitted
+    to, and :attr:`interp_error`, the error bound of that interpolant (see
+    :class:`eph.interp.ChebyshevInterpolant`). Both are None for kernels
+    written without them.
+    """
+
+    def __init__(self, filename):
+        """
+        Opens a kernel file written by :func:`write_kernel`.
+
+        Args:
+            filename (str): the kernel file.
+        """
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            if f.read(len(KERNEL_MAGIC)) != KERNEL_MAGIC:
+                raise ValueError('Not a kernel file.')
+            size, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(size).decode('utf-8'))
+        offset = len(KERNEL_MAGIC) + 8 + size
+        offset += -offset % KERNEL_ALIGN
+        self.start = header['start']
+        self.interval = header['interval']
+        self.degree = header['degree']
+        self.stop = self.start + header['records'] * self.interval
+        self.pos_unit = u.Unit(header['pos_unit'])
+        self.vel_unit = u.Unit(header['vel_unit'])
+        self.meta = header['meta']
+        self.fit_error = _error(header.get('fit_error'), self.pos_unit)
+        self.interp_error = _error(header.get('interp_error'), self.pos_unit)
+        self.records = np.memmap(filename,
+                                 dtype='<f8',
+                                 mode='r',
+                                 offset=offset,
+                                 shape=(header['records'], self.degree + 1,
+                                        3))
+
+    def __getstate__(self):
+        return dict(filename=self.filename)
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'])
+
+    def __len__(self):
+        return len(self.records)
+
+    def locate(self, t):
+        """
+        Finds the record of each epoch and the epoch mapped to the record
+        domain [-1, 1].
+
+        Args:
+            t: the epochs, as an astropy Time or Julian dates (TDB).
+
+        Returns:
+            :class:`tuple`: the record indices and the mapped epochs.
+        """
+        jd = _jd(t)
+        if np.any(jd < self.start) or np.any(jd > self.stop):
+            raise ValueError('Epochs out of the kernel time span.')
+        scaled = (jd - self.start) / self.interval
+        idx = np.minimum(scaled.astype(np.intp), len(self.records) - 1)
+        return idx, 2 * (scaled - idx) - 1
+
+    def position(self, t):
+        """
+        Evaluates positions.
+
+        Args:
+            t: the epochs, as an astropy Time or Julian dates (TDB).
+
+        Returns:
+            :class:`astropy.units.Quantity`: the (n, 3) positions.
+        """
+        idx, x = self.locate(t)
+        return clenshaw(x, self.records, index=idx) * self.pos_unit
+
+    def velocity(self, t):
+        """
+        Evaluates velocities.
+
+        Args:
+            t: the epochs, as an astropy Time or Julian dates (TDB).
+
+        Returns:
+            :class:`astropy.units.Quantity`: the (n, 3) velocities.
+        """
+        idx, x = self.locate(t)
+        # derivatives of the records met only, each one once
+        records, index = np.unique(idx, return_inverse=True)
+        coeffs = cheb.chebder(self.records[records], axis=1) * 2 / \
+            self.interval
+        vel = clenshaw(x, coeffs, index=index.ravel())
+        return (vel * self.pos_unit / u.day).to(self.vel_unit)
+
+    def __call__(self, t):
+        """
+        Evaluates positions and velocities.
+
+        Args:
+            t: the epochs, as an astropy Time or Julian dates (TDB).
+
+        Returns:
+            :class:`astropy.table.QTable`: a vector table at the epochs.
+        """
+        jd = _jd(t)
+        pos, vel = self.position(jd), self.velocity(jd)
+        data = [jd * u.day] + [pos[:, i] for i in range(3)] + \
+            [vel[:, i] for i in range(3)]
+        return QTable(data, names=('JDTDB', ) + POSITION + VELOCITY)
+
+
+def _error(value, unit):
+    return value * unit if value is not None else None
@@ -0,0 +1,200 @@
+"""
+Defines a local mock of the Jpl Horizons service, serving synthetic
+responses (see :mod:`eph.synth`) with configurable latency and payload size,
+to test and benchmark clients end to end without querying the real service.
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from astropy.time import Time
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import urlparse, parse_qsl
+
+from .horizons import parse_time, parse_step
+from .interface import JplReq
+from .synth import generate, VEC_TABLES, QUANTITIES
+
+# maximum number of rows of a mock response
+MAX_ROWS = 100000
+
+TABLE_TYPES = dict(V='VECTORS', E='ELEMENTS', O='OBSERVER')
+
+# number of generated responses kept in memory
+CACHE_SIZE = 64
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        mock = self.server.mock
+        params = {
+            k.upper(): v.strip('\'"')
+            for k, v in parse_qsl(urlparse(self.path).query)
+        }
+        delay = mock.delay()
+        if delay:
+            time.sleep(delay)
+        content = mock.response(params).encode('utf-8')
+        mock.count(len(content))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockHorizons(object):
+    """
+    A local http server answering Jpl Horizons requests with synthetic
+    responses.
+
+    Responses follow the TABLE_TYPE, VEC_TABLE, QUANTITIES, CSV_FORMAT,
+    VEC_LABELS, START_TIME, STOP_TIME and STEP_SIZE parameters of requests,
+    so that they can be parsed and joined like real ones. Pass :attr:`url`
+    as `endpoint` to :class:`eph.Client` to query it.
+    """
+
+    def __init__(self,
+                 host='127.0.0.1',
+                 port=0,
+                 latency=0.,
+                 jitter=0.,
+                 rows=None,
+                 seed=0):
+        """
+        Initialize a :class:`MockHorizons` object.
+
+        Args:
+            host (str): the host to listen on.
+            port (int): the port to listen on (any free port if 0).
+            latency (float): the delay in seconds before each response.
+            jitter (float): the maximum random delay in seconds added to
+                `latency`.
+            rows (int): the number of rows of every response, sizing the
+                payload. Rows follow the time span and step of requests if
+                None.
+            seed (int): the seed of generated responses and delays.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rows = rows
+        self.seed = seed
+        self.requests = 0
+        self.bytes = 0
+        self._random = random.Random(seed)
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """The url of the mock service, to be used in place of
+        ``JPL_ENDPOINT``."""
+        host, port = self._server.server_address[:2]
+        return 'http://{0}:{1}/horizons_batch.cgi?batch=1'.format(host, port)
+
+    def delay(self):
+        with self._lock:
+            return self.latency + self._random.uniform(0., self.jitter)
+
+    def count(self, size):
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+
+    def response(self, params):
+        """
+        Generates (or retrieves from memory) the response to a request.
+
+        Args:
+            params (dict): the parameters of the request.
+
+        Returns:
+            str: the response.
+        """
+        key = tuple(sorted(params.items()))
+        with self._lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                return self._responses[key]
+        response = generate(seed=self.seed, **self.options(params))
+        with self._lock:
+            self._responses[key] = response
+            while len(self._responses) > CACHE_SIZE:
+                self._responses.popitem(last=False)
+        return response
+
+    def options(self, params):
+        """Translates the parameters of a request in arguments of
+        :func:`eph.synth.generate`."""
+        req = JplReq({
+            k: v
+            for k, v in params.items()
+            if k in ('START_TIME', 'STOP_TIME', 'STEP_SIZE', 'TLIST')
+        })
+        rows = self.rows or req.estimate_rows() or 1
+        rows = max(min(rows, MAX_ROWS), 1)
+        start = parse_time(params.get('START_TIME', ''))
+        stop = parse_time(params.get('STOP_TIME', ''))
+        start = Time(start).jd if start else 2451544.5
+        step = parse_step(params.get('STEP_SIZE', ''))
+        if isinstance(step, int):
+            step = (Time(stop).jd - start) / max(step, 1) if stop else 1.
+        elif step:
+            step = step.total_seconds() / 86400.
+        else:
+            step = 1.
+        options = dict(
+            table_type=TABLE_TYPES.get(
+                params.get('TABLE_TYPE', 'O')[:1].upper(), 'OBSERVER'),
+            rows=rows,
+            csv=params.get('CSV_FORMAT', 'NO').upper() == 'YES',
+            vec_labels=params.get('VEC_LABELS', 'YES').upper() == 'YES',
+            start=start,
+            step=step,
+            target=params.get('COMMAND', '299'),
+        )
+        vec_table = params.get('VEC_TABLE', '')[:1]
+        if vec_table.isdigit() and int(vec_table) in VEC_TABLES:
+            options.update(vec_table=int(vec_table))
+        quantities = tuple(
+            int(q) for q in params.get('QUANTITIES', '').split(',')
+            if q.strip().isdigit() and int(q) in QUANTITIES)
+        if quantities:
+            options.update(quantities=quantities)
+        return options
+
+    def start(self):
+        """Starts serving requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05, ))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
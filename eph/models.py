@@ -33,18 +33,22 @@ class BaseMap(MutableMapping):
     def __delitem__(self, key):
         self.__delattr__(key)
 
+    def _params(self):
+        # private attributes (starting with an underscore) are not items
+        return {k: v for k, v in self.__dict__.items() if not k.startswith('_')}
+
     def __iter__(self):
-        return self.__dict__.__iter__()
+        return self._params().__iter__()
 
     def __len__(self):
-        return len(self.__dict__)
+        return len(self._params())
 
     def __repr__(self):
-        return self.__class__.__name__ + '(' + self.__dict__.__repr__() + ')'
+        return self.__class__.__name__ + '(' + self._params().__repr__() + ')'
 
     def __str__(self):
         return '\n'.join('{key}={value}'.format(key=k, value=v)
-                         for k, v in self.__dict__.items())
+                         for k, v in self._params().items())
 
     def set(self, *args, **kwargs):
         if args:
@@ -3,36 +3,85 @@
 import re
 from string import whitespace as ws
 
+import numpy as np
 from astropy import units as u
 from astropy.table import Table, QTable
 
-from .util import parse_table, parse_row, numberify, transpose, yes_or_no
+from .util import parse_table, parse_row, columnize, convert_column, yes_or_no
 from .exceptions import JplBadReqError, ParserError
-from .horizons import get_col_dim
+from .horizons import get_col_dim, DATE_COLS
 
 
-def get_sections(source):
+SOE, EOE, SOF = '$$SOE', '$$EOE', '!$$SOF'
+
+
+def _strip_span(source, start, stop, chars):
+    while start < stop and source[start] in chars:
+        start += 1
+    while stop > start and source[stop - 1] in chars:
+        stop -= 1
+    return start, stop
+
+
+def find_sections(source):
+    """
+    Locates header, data, footer and echoed parameters of a Jpl Horizons
+    ephemeris in a single pass over `source`.
+
+    Args:
+      source (str): the content of the Jpl Horizons ephemeris data output.
+
+    Returns:
+      :class:`tuple`: the (start, stop) offsets of header, data, footer and
+      parameters sections in `source`.
+
+    Raises:
+      :class:`JplBadReqError`: if `source` has no data section.
+
+    .. note:
+      Note that offsets exclude whitespaces and asterisks surrounding sections,
+      except for the indentation of the first line of data, which is kept
+      for fixed-width columns.
+    """
+
+    soe = source.find(SOE)
+    eoe = source.find(EOE, soe + len(SOE)) if soe >= 0 else -1
+    sof = source.find(SOF, eoe if eoe >= 0 else 0)
+    if sof < 0:
+        sof = len(source)
+    if eoe < 0:
+        raise JplBadReqError(source[:sof].strip(ws))
+    to_strip = ws + '*'
+    data = _strip_span(source, soe + len(SOE), eoe, '\r\n')
+    return (
+        _strip_span(source, 0, soe, to_strip),
+        (data[0], _strip_span(source, data[0], data[1], to_strip)[1]),
+        _strip_span(source, eoe + len(EOE), sof, to_strip),
+        _strip_span(source, min(sof + len(SOF), len(source)), len(source),
+                    ws),
+    )
+
+
+def get_sections(source, spans=None):
     """
     Split a Jpl Horizons ephemeris in header, data and footer.
 
     Args:
     source (str): the content of the Jpl Horizons ephemeris data output.
+    spans (tuple): the offsets of sections, as returned by
+      :func:`find_sections`, if already known.
 
     Returns:
       :class:`tuple`: a tuple of strings containing header, data and footer sections respectively.
 
     .. note:
-      Note that whitespaces and \* are stripped out from section contents.
+      Note that whitespaces and \* are stripped out from section contents,
+      except for the indentation of the first line of data, which is kept
+      for fixed-width columns (see :func:`find_sections`).
     """
 
-    m = re.match(r'(.*?)\$\$SOE(.*?)\$\$EOE(.*?)', source, flags=re.DOTALL)
-    if m:
-        to_strip = ws + '*'
-        return (m.group(i).strip(to_strip) for i in range(1, 4))
-    else:
-        problem_report, jplparams = map(lambda x: x.strip(ws),
-                                        re.split(r'!\$\$SOF', source))
-        raise JplBadReqError(problem_report)
+    spans = spans or find_sections(source)
+    return tuple(source[start:stop] for start, stop in spans[:3])
 
 
 def get_subsections(source):
@@ -50,24 +99,29 @@ def get_subsections(source):
     return list(map(lambda ss: ss.strip(to_strip), re.split(r'\*{3,}', source)))
 
 
-def parse_params(source):
-    m = re.search(r'(?<=!\$\$SOF)[\s\S]*$', source)
-    if m:
-        to_strip = ws
-        cleaned = m.group().strip(to_strip)
-        return {
-            m.group(1): m.group(2)
-            for m in re.finditer(r'(\S*)\s=\s(\S*)', cleaned)
-        }
-    return dict()
+PARAM = re.compile(r'(\S*)\s=\s(\S*)')
+
+
+def parse_params(source, spans=None):
+    if spans:
+        start, stop = spans[3]
+    else:
+        start = source.find(SOF)
+        if start < 0:
+            return dict()
+        start, stop = _strip_span(source, start + len(SOF), len(source), ws)
+    return {m.group(1): m.group(2) for m in PARAM.finditer(source, start, stop)}
+
+
+def check_csv(source, spans=None):
+    return is_csv(parse_params(source, spans))
 
 
-def check_csv(source):
-    params = parse_params(source)
+def is_csv(params):
     csv = params.get('CSV_FORMAT', 'NO')
     to_strip = ws + '\'"'
     cleaned = csv.strip(to_strip)
-    return yes_or_no(cleaned)
+    return yes_or_no(cleaned) == 'YES'
 
 
 def parse_meta(header):
@@ -97,22 +151,99 @@ def parse_units(meta):
         )
 
 
-def parse_data(data, **kwargs):
+def parse_data(data, dates=(), **kwargs):
     """
-    Parses the data section of a Jpl Horizons ephemeris in a *list of lists*
-    table.
+    Parses the data section of a Jpl Horizons ephemeris in typed column
+    arrays, splitting rows with regular expressions.
 
     Args:
       data (str): the section containing data of a Jpl Horizons ephemeris.
+      dates: the indices of columns to be converted in calendar dates.
 
     Returns:
-      :class:`list`: the list of lists representing a data table.
+      :class:`list`: the list of column arrays (see
+      :func:`eph.util.columnize`).
+
+    Raises:
+      :class:`ParserError`
     """
 
     try:
-        return numberify(parse_table(data, **kwargs))
-    except:
+        rows = parse_table(data, **kwargs)
+    except Exception:
+        raise ParserError
+    if any(len(row) != len(rows[0]) for row in rows):
+        raise ParserError
+    return columnize(rows, dates=dates)
+
+
+def parse_columns(data, cols_del=',', dates=()):
+    """
+    Parses the data section of a Jpl Horizons ephemeris directly in typed
+    column arrays.
+
+    Rows are split in a single pass and cells are sliced by column in
+    `numpy`_ arrays, one column at a time, so that each column is converted
+    as a whole in the type inferred by :func:`eph.util.convert_column`.
+
+    Args:
+      data (str): the section containing data of a Jpl Horizons ephemeris.
+      cols_del (str): the column delimiter (a regex if not a comma).
+      dates: the indices of columns to be converted in calendar dates.
+
+    Returns:
+      :class:`list`: the list of column arrays.
+
+    Raises:
+      :class:`ParserError`
+
+    .. _`numpy`: https://numpy.org/
+    """
+
+    to_strip = ws + cols_del
+    rows = [row.strip(to_strip) for row in data.splitlines()]
+    rows = [row for row in rows if row]
+    if not rows:
         raise ParserError
+    nrows = len(rows)
+    if cols_del == ',':
+        ncols = rows[0].count(',') + 1
+        cells = ','.join(rows).split(',')
+    else:
+        splitted = [re.split(cols_del, row) for row in rows]
+        ncols = len(splitted[0])
+        cells = [cell for row in splitted for cell in row]
+        del splitted
+    del rows
+    if len(cells) != nrows * ncols:
+        raise ParserError
+    # columns are converted one at a time, so that only the strings of one
+    # column are held in arrays at once
+    return [
+        _narrow(
+            convert_column(np.char.strip(np.array(cells[i::ncols])),
+                           date=i in dates)) for i in range(ncols)
+    ]
+
+
+def _narrow(column):
+    # string columns keep their own width, not the widest of the table
+    if column.dtype.kind != 'U' or not len(column):
+        return column
+    width = max(np.char.str_len(column).max(), 1)
+    return column.astype('<U{0}'.format(width))
+
+
+ENGINES = dict(
+    python=parse_data,
+    numpy=parse_columns,
+)
+
+
+def get_date_cols(cols):
+    """Finds the indices of columns of calendar dates (see
+    ``DATE_COLS``)."""
+    return tuple(i for i, col in enumerate(cols) if col in DATE_COLS)
 
 
 def parse_cols(header):
@@ -131,28 +262,192 @@ def parse_cols(header):
     return tuple(cols)
 
 
-def parse(source, target=QTable):
+LABELLED = re.compile(r'=\s*(\S+)')
+
+
+def get_label_lines(header):
     """
-    Parses an entire Jpl Horizons ephemeris and build an `astropy`_ table out
-    of it.
+    Finds the lines of column labels of a Jpl Horizons ephemeris not in CSV
+    format, keeping their indentation.
 
     Args:
-      source (str): the content of the Jpl Horizons data file.
-      target: the type of table to produce (Table or QTable).
+      header (str): the header of a Jpl Horizons ephemeris.
 
     Returns:
-      table: the table containing data from Jpl Horizons source ephemeris.
+      :class:`list`: the lines of labels.
+    """
 
-    .. _`astropy`:  http://docs.astropy.org/en/stable/table/
+    subsection = re.split(r'\*{3,}', header)[-1]
+    return [line.rstrip() for line in subsection.splitlines() if line.strip()]
+
+
+def parse_records(labels, data):
     """
+    Parses the data section of a Jpl Horizons ephemeris not in CSV format,
+    made of multi-line records (like vectors and orbital elements), e.g.::
 
-    cols_del = ',' if check_csv(source) else r'\s'
+      2451544.500000000 = A.D. 2000-Jan-01 00:00:00.0000 TDB
+       X =-1.085735509178141E+08 Y =-3.784200933160055E+06 Z = ...
 
-    header, ephemeris, footer = get_sections(source)
-    data = transpose(parse_data(ephemeris, cols_del=cols_del))
-    cols = parse_cols(header)
-    meta = parse_meta(header)
-    units = parse_units(meta)
+    Both labelled (``VEC_LABELS=YES``) and unlabelled records are supported.
+
+    Args:
+      labels: the lines of labels (see :func:`get_label_lines`), the first
+        one being ``JDTDB``.
+      data (str): the section containing data of a Jpl Horizons ephemeris.
+
+    Returns:
+      :class:`tuple`: the names of columns and the list of string columns.
+
+    Raises:
+      :class:`ParserError`
+    """
+
+    size = len(labels)
+    lines = [line for line in data.splitlines() if line.strip()]
+    if not lines or len(lines) % size:
+        raise ParserError
+    epochs = np.char.partition(np.char.strip(lines[::size]), '=')
+    jd, date = np.char.strip(epochs[:, 0]), np.char.strip(epochs[:, 2])
+    tdb = np.char.endswith(date, ' TDB')
+    date[tdb] = np.char.rstrip(np.char.rstrip(date[tdb], 'TDB'))
+    cols = [label for line in labels[1:] for label in line.split()]
+    body = '\n'.join(line for i, line in enumerate(lines) if i % size)
+    if '=' in body:
+        cells = LABELLED.findall(body)
+    else:
+        cells = body.split()
+    if len(cells) != len(jd) * len(cols):
+        raise ParserError
+    ncols = len(cols)
+    return ('JDTDB', 'Calendar Date (TDB)') + tuple(cols), \
+        [jd, date] + [np.array(cells[i::ncols]) for i in range(ncols)]
+
+
+def parse_fixed_width(labels, data):
+    """
+    Parses the data section of a Jpl Horizons ephemeris not in CSV format,
+    made of one line per row with fixed-width columns (like observer
+    tables).
+
+    Rows are gathered in a 2d array of bytes, and fields are found as runs
+    of characters which are not blank in every row. Each field belongs to
+    the label it overlaps the most, so that values are sliced out by
+    offsets for all rows at once. Fields overlapping no label (like the
+    solar and lunar presence flags of observer tables) are skipped.
+
+    Args:
+      labels (str): the line of labels (see :func:`get_label_lines`).
+      data (str): the section containing data of a Jpl Horizons ephemeris.
+
+    Returns:
+      :class:`tuple`: the names of columns and the list of string columns.
+
+    Raises:
+      :class:`ParserError`
+    """
+
+    lines = [line.rstrip() for line in data.splitlines() if line.strip()]
+    if not lines:
+        raise ParserError
+    width = max(len(labels), max(map(len, lines)))
+    buffer = ''.join(line.ljust(width) for line in lines)
+    chars = np.frombuffer(buffer.encode('ascii', 'replace'),
+                          dtype=np.uint8).reshape(len(lines), width)
+    filled = np.concatenate(([0], np.any(chars != 32, axis=0), [0]))
+    edges = np.flatnonzero(np.diff(filled.astype(np.int8)))
+    starts, stops = edges[::2], edges[1::2]
+    matches = list(re.finditer(r'\S+', labels))
+    cols = tuple(m.group() for m in matches)
+    lo = np.array([m.start() for m in matches])
+    hi = np.array([m.end() for m in matches])
+    overlap = np.minimum(stops[:, None], hi) - np.maximum(starts[:, None], lo)
+    owner = np.argmax(overlap, axis=1)
+    owned = overlap[np.arange(len(owner)), owner] > 0
+    columns = []
+    for i in range(len(cols)):
+        fields = owned & (owner == i)
+        start = starts[fields].min() if fields.any() else lo[i]
+        stop = stops[fields].max() if fields.any() else hi[i]
+        column = np.ascontiguousarray(chars[:, start:stop]).view(
+            'S{0}'.format(stop - start)).ravel()
+        columns.append(np.char.strip(np.char.decode(column, 'ascii')))
+    return cols, columns
+
+
+def parse_fixed(header, data):
+    """
+    Parses the data section of a Jpl Horizons ephemeris not in CSV format,
+    choosing between :func:`parse_records` and :func:`parse_fixed_width`
+    according to the labels in the header.
+
+    Args:
+      header (str): the header of a Jpl Horizons ephemeris.
+      data (str): the section containing data of a Jpl Horizons ephemeris.
+
+    Returns:
+      :class:`tuple`: the names of columns and the list of string columns.
+
+    Raises:
+      :class:`ParserError`
+    """
+
+    labels = get_label_lines(header)
+    if not labels:
+        raise ParserError
+    if labels[0].strip() == 'JDTDB' and len(labels) > 1:
+        return parse_records(labels, data)
+    return parse_fixed_width(labels[-1], data)
+
+
+def parse_ephemeris(header, data, csv=True, engine='numpy',
+                    parse_dates=False):
+    """
+    Parses the data section of a Jpl Horizons ephemeris in typed column
+    arrays, together with the names of columns.
+
+    Args:
+      header (str): the header of a Jpl Horizons ephemeris.
+      data (str): the section containing data of a Jpl Horizons ephemeris.
+      csv (bool): whether the ephemeris is in CSV format. Otherwise columns
+        are parsed by :func:`parse_fixed`.
+      engine (str): the parser engine for data in CSV format.
+      parse_dates (bool): whether to convert calendar dates columns in
+        ``datetime64`` columns.
+
+    Returns:
+      :class:`tuple`: the names of columns and the list of column arrays.
+    """
+
+    if csv:
+        cols = parse_cols(header)
+        dates = get_date_cols(cols) if parse_dates else ()
+        return cols, ENGINES[engine](data, cols_del=',', dates=dates)
+    cols, columns = parse_fixed(header, data)
+    dates = get_date_cols(cols) if parse_dates else ()
+    return cols, [
+        convert_column(col, date=i in dates) for i, col in enumerate(columns)
+    ]
+
+
+def make_table(data, cols, meta, units=None, target=QTable):
+    """
+    Builds an `astropy`_ table out of parsed data columns, assigning units to
+    columns with a known physical dimension.
+
+    Args:
+      data: the list of data columns.
+      cols: the names of columns.
+      meta (dict): the metadata of the table.
+      units (dict): the units of each physical dimension (see
+        :func:`parse_units`).
+      target: the type of table to produce (Table or QTable).
+
+    Returns:
+      table: the table containing data.
+
+    .. _`astropy`:  http://docs.astropy.org/en/stable/table/
+    """
 
     if target in (Table, QTable):
         table = target(data, names=cols, meta=meta)
@@ -166,3 +461,42 @@ def parse(source, target=QTable):
                 table[col].unit = units[dim]
 
     return table
+
+
+def parse(source, target=QTable, engine='numpy', spans=None,
+          parse_dates=False):
+    """
+    Parses an entire Jpl Horizons ephemeris and build an `astropy`_ table out
+    of it.
+
+    Args:
+      source (str): the content of the Jpl Horizons data file.
+      target: the type of table to produce (Table or QTable).
+      engine (str): the parser engine for the data section. ``'numpy'``
+        builds typed column arrays in one pass, ``'python'`` is the
+        reference implementation working on lists of lists.
+      spans (tuple): the offsets of sections, as returned by
+        :func:`find_sections`, if already known.
+      parse_dates (bool): whether to convert calendar dates columns in
+        ``datetime64`` columns.
+
+    Returns:
+      table: the table containing data from Jpl Horizons source ephemeris.
+
+    .. _`astropy`:  http://docs.astropy.org/en/stable/table/
+    """
+
+    if engine not in ENGINES:
+        raise ValueError('Available engines are {0}.'.format(
+            ', '.join(sorted(ENGINES))))
+
+    spans = spans or find_sections(source)
+    csv = check_csv(source, spans)
+
+    header, ephemeris, footer = get_sections(source, spans)
+    cols, data = parse_ephemeris(header, ephemeris, csv=csv, engine=engine,
+                                 parse_dates=parse_dates)
+    meta = parse_meta(header)
+    units = parse_units(meta)
+
+    return make_table(data, cols, meta, units, target=target)
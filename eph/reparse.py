@@ -0,0 +1,199 @@
+"""
+Defines tools to parse again, offline, archives of raw responses from the Jpl
+Horizons service saved on disk, distributing files over a pool of processes.
+"""
+
+import fnmatch
+import io
+import multiprocessing
+import os
+import os.path
+import queue
+import tarfile
+
+from astropy.table import QTable
+
+from .cache import dump_table
+from .interface import JplRes, make_response
+from .util import path
+
+# the binary columnar format of :func:`eph.cache.dump_table`
+BINARY = 'tbl'
+
+EXTENSIONS = dict(
+    tbl='.tbl',
+    ecsv='.ecsv',
+    fits='.fits',
+    hdf5='.h5',
+    votable='.xml',
+)
+
+# the default number of files sent to a process at once
+CHUNKSIZE = 16
+
+
+def iter_sources(source, pattern='*.txt'):
+    """
+    Finds the responses stored in a directory (recursively) or in a tarball.
+
+    Args:
+        source (str): the directory or the tarball.
+        pattern (str): the shell-style pattern matching names of responses.
+
+    Returns:
+        generator: tuples (name, filename, text), where name is the path of
+        the response relative to `source`. Files in directories are not read
+        (text is None), while members of tarballs are (filename is None).
+    """
+    source = path(source)
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if fnmatch.fnmatch(name, pattern):
+                    filename = os.path.join(root, name)
+                    yield os.path.relpath(filename, source), filename, None
+    elif os.path.isfile(source) and tarfile.is_tarfile(source):
+        with tarfile.open(source) as tar:
+            for member in tar:
+                if member.isfile() and fnmatch.fnmatch(
+                        os.path.basename(member.name), pattern):
+                    with tar.extractfile(member) as f:
+                        text = f.read().decode('utf-8')
+                    yield member.name, None, text
+    else:
+        raise ValueError(
+            '{0} is neither a directory nor a tarball.'.format(source))
+
+
+def output_filename(name, output, fmt=BINARY):
+    """
+    Computes the output file of a response, mirroring its relative path
+    `name` in the `output` directory.
+
+    Raises:
+        :class:`ValueError`: if `name` points outside of the output
+        directory.
+    """
+    parts = [part for part in name.replace('\\', '/').split('/') if part]
+    if not parts or any(part == '..' for part in parts):
+        raise ValueError('Invalid response name {0}.'.format(name))
+    stem = os.path.splitext(os.path.join(output, *parts))[0]
+    return stem + EXTENSIONS.get(fmt, '.' + fmt)
+
+
+def reparse_one(task):
+    """
+    Parses a single response and writes the table in its output file.
+
+    Args:
+        task (tuple): (name, filename, text, output, format, target), see
+            :func:`iter_sources` and :func:`reparse`.
+
+    Returns:
+        :class:`tuple`: (name, rows, error), where rows is the number of
+        rows of the table and error the error message (None on success).
+    """
+    name, filename, text, output, fmt, target = task
+    try:
+        if text is None:
+            with io.open(filename, 'r', encoding='utf-8') as f:
+                text = f.read()
+        table = JplRes(make_response(text)).parse(target=target)
+        outfile = output_filename(name, output, fmt)
+        directory = os.path.dirname(outfile)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        if fmt == BINARY:
+            dump_table(table, outfile)
+        else:
+            table.write(outfile, format=fmt, overwrite=True)
+    except Exception as e:
+        # any failure is the file's own, and must not stop the others
+        return name, 0, '{0}: {1}'.format(type(e).__name__, e)
+    return name, len(table), None
+
+
+def _reparse_chunk(tasks):
+    return [reparse_one(task) for task in tasks]
+
+
+def _results(done):
+    # the results of the next chunk completed, raising the error of the pool
+    results = done.get()
+    if isinstance(results, BaseException):
+        raise results
+    return results
+
+
+def _chunks(tasks, chunksize):
+    chunk = []
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reparse(source,
+            output,
+            fmt=BINARY,
+            processes=None,
+            chunksize=CHUNKSIZE,
+            pattern='*.txt',
+            target=QTable):
+    """
+    Parses again all the responses of a directory or a tarball, writing each
+    table in a columnar file in the `output` directory.
+
+    Files are distributed over a pool of processes in chunks of `chunksize`
+    files, so that the work scales with the number of cores. Only a few
+    chunks per process are read ahead, so that memory does not grow with the
+    number of files. Errors found in a file (e.g. :class:`JplBadReqError` or
+    :class:`ParserError`) are reported in its result without stopping the
+    others.
+
+    Args:
+        source (str): the directory or the tarball of responses.
+        output (str): the output directory.
+        fmt (str): the output format, ``'tbl'`` for the binary columnar
+            format of :func:`eph.cache.dump_table` or any astropy table
+            format (e.g. ``'ecsv'``, ``'fits'``).
+        processes (int): the number of processes (the number of cores if
+            None). Files are parsed in the calling process if 1.
+        chunksize (int): the number of files sent to a process at once.
+        pattern (str): the shell-style pattern matching names of responses.
+        target: the type of tables to produce (Table or QTable).
+
+    Returns:
+        generator: tuples (name, rows, error), in order of completion (see
+        :func:`reparse_one`).
+    """
+    output = path(output)
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    tasks = ((name, filename, text, output, fmt, target)
+             for name, filename, text in iter_sources(source, pattern))
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for task in tasks:
+            yield reparse_one(task)
+        return
+    done = queue.Queue()
+    pending = 0
+    with multiprocessing.Pool(processes) as pool:
+        for chunk in _chunks(tasks, chunksize or CHUNKSIZE):
+            if pending >= 2 * processes:
+                for result in _results(done):
+                    yield result
+                pending -= 1
+            pool.apply_async(_reparse_chunk, (chunk, ),
+                             callback=done.put,
+                             error_callback=done.put)
+            pending += 1
+        while pending:
+            for result in _results(done):
+                yield result
+            pending -= 1
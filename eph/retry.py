@@ -0,0 +1,251 @@
+"""
+Defines policies cutting the failures and the tail latency of requests to the
+Jpl Horizons service: retries with jittered exponential backoff, and hedged
+requests, where a duplicate request is fired when the first one is slower
+than most and the first answer wins.
+"""
+
+import collections
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import requests
+
+# errors of requests worth retrying
+ERRORS = (ConnectionError, requests.exceptions.ConnectionError,
+          requests.exceptions.Timeout)
+
+# http statuses of responses worth retrying
+STATUSES = (429, 500, 502, 503, 504)
+
+
+class Retry(object):
+    """
+    Retries requests failing with connection errors, timeouts or transient
+    http statuses, waiting a random delay (full jitter) up to an exponentially
+    growing backoff between attempts, or the delay asked by the
+    ``Retry-After`` header of the response.
+    """
+
+    def __init__(self,
+                 retries=3,
+                 backoff=.5,
+                 max_backoff=30.,
+                 statuses=STATUSES,
+                 seed=None):
+        """
+        Initialize a :class:`Retry` object.
+
+        Args:
+            retries (int): the maximum number of retries of a request.
+            backoff (float): the backoff in seconds of the first retry,
+                doubled at each further retry.
+            max_backoff (float): the maximum backoff in seconds.
+            statuses: the http statuses of responses to be retried.
+            seed (int): the seed of the random delays.
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.attempts = 0
+        self.retried = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, attempt, response=None):
+        """
+        Computes the delay before retrying.
+
+        Args:
+            attempt (int): the number of the failed attempt (from 0).
+            response: the http response of the failed attempt, if any.
+
+        Returns:
+            float: the delay in seconds.
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        with self._lock:
+            return self._random.uniform(
+                0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def call(self, func):
+        """
+        Performs a request, retrying it if needed.
+
+        Args:
+            func: the callable performing the request, returning the http
+                response.
+
+        Returns:
+            the http response of the last attempt.
+
+        Raises:
+            the error of the last attempt, if it failed.
+        """
+        for attempt in range(self.retries + 1):
+            with self._lock:
+                self.attempts += 1
+                self.retried += attempt > 0
+            response = None
+            try:
+                response = func()
+            except ERRORS:
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in self.statuses or \
+                        attempt == self.retries:
+                    return response
+                response.close()
+            time.sleep(self.delay(attempt, response))
+
+    def stats(self):
+        """Returns the number of attempts and of retries performed."""
+        with self._lock:
+            return dict(attempts=self.attempts, retries=self.retried)
+
+
+class Hedge(object):
+    """
+    Hedges requests: if a request has not been answered after `quantile` of
+    the latencies of past requests (e.g. their 95th percentile), a
+    duplicate is fired and the first successful answer wins.
+
+    Latencies are learnt from the last `window` requests. Until
+    `min_samples` are known, duplicates are fired after `delay` seconds, or
+    never if `delay` is None. Delays run from the start of a request, so that
+    requests waiting for one of the `max_workers` threads, or for a
+    throttle, are not hedged.
+    """
+
+    def __init__(self,
+                 quantile=.95,
+                 delay=None,
+                 min_samples=20,
+                 window=1000,
+                 max_workers=32):
+        """
+        Initialize a :class:`Hedge` object.
+
+        Args:
+            quantile (float): the quantile of latencies after which requests
+                are hedged.
+            delay (float): the delay in seconds after which requests are
+                hedged while latencies are not known.
+            min_samples (int): the number of latencies needed to estimate
+                the quantile.
+            window (int): the number of latencies remembered.
+            max_workers (int): the number of threads performing requests.
+        """
+        self.quantile = quantile
+        self.initial_delay = delay
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedged = 0
+        self.won = 0
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def delay(self):
+        """Returns the delay in seconds after which requests are hedged
+        (None if they are not)."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            return float(np.quantile(self._latencies, self.quantile))
+
+    def _timed(self, func, started, waits):
+        # times the request from its start, signalled by `started`
+        starts = []
+
+        def start():
+            starts.append(time.monotonic())
+            started.set()
+
+        try:
+            if waits:
+                result = func(start)
+            else:
+                start()
+                result = func()
+        finally:
+            started.set()
+        if starts:
+            with self._lock:
+                self._latencies.append(time.monotonic() - starts[0])
+        return result
+
+    def call(self, func, waits=False):
+        """
+        Performs a request, hedging it if it is slow.
+
+        Args:
+            func: the callable performing the request, returning the http
+                response.
+            waits (bool): whether `func` waits before sending the request
+                (e.g. for a :class:`eph.throttle.Throttle`). If True, `func`
+                is passed a callable to be called when the request is sent,
+                where the hedging delay and the latency start.
+
+        Returns:
+            the http response answered first (without errors, if any).
+        """
+        with self._lock:
+            self.requests += 1
+        delay = self.delay()
+        started = threading.Event()
+        futures = [self._executor.submit(self._timed, func, started, waits)]
+        # the delay runs from the start of the request, not from its
+        # submission, so that requests queued for a thread (or a throttle)
+        # are not hedged
+        started.wait()
+        done, pending = wait(futures, timeout=delay)
+        if not done:
+            with self._lock:
+                self.hedged += 1
+            futures.append(
+                self._executor.submit(self._timed, func, threading.Event(),
+                                      waits))
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+            if winner is not None or not pending:
+                break
+        if winner is None:
+            return futures[0].result()
+        if winner is not futures[0]:
+            with self._lock:
+                self.won += 1
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(_close)
+        return winner.result()
+
+    def stats(self):
+        """Returns the number of requests, of requests hedged and of hedges
+        answered first, and the current hedging delay."""
+        with self._lock:
+            stats = dict(requests=self.requests,
+                         hedged=self.hedged,
+                         won=self.won)
+        stats.update(delay=self.delay())
+        return stats
+
+    def close(self):
+        """Stops the threads of the hedge."""
+        self._executor.shutdown(wait=False)
+
+
+def _close(future):
+    # releases the connection of a response which lost the race
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
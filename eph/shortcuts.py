@@ -1,15 +1,32 @@
 """Defines shortcut functions useful to ease the access of Jpl Horizons
 data."""
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
-from astropy.table import join
+import numpy as np
+from astropy.table import join, vstack
+from astropy.time import Time
 
 from .util import is_vector
 from .interface import JplReq
-from .horizons import format_time
-
-
-def get(objs, dates=datetime.now(), **kwargs):
+from .exceptions import ParserError
+from .horizons import (format_time, MAX_ROWS, MAX_TLIST, MAX_URL_LENGTH,
+                       DATE_COLS)
+
+
+def get(objs,
+        dates=datetime.now(),
+        cache=None,
+        max_workers=None,
+        session=None,
+        max_rows=MAX_ROWS,
+        flight=None,
+        layout='wide',
+        timeout=None,
+        retry=None,
+        hedge=None,
+        **kwargs):
     """
     Shortcut function to directly obtain an astropy QTable from Jpl Horizons
     parameters without building a JplReq and get a JplRes out of it to be
@@ -18,10 +35,143 @@ def get(objs, dates=datetime.now(), **kwargs):
     Args:
       objs: The celestial objects to be targeted.
       dates: start and stop (optional) time.
+      cache: a :class:`eph.cache.ResponseCache` to look up responses in.
+      max_workers: the maximum number of objects to be queried concurrently.
+        Objects are queried one after the other if None.
+      session: a :class:`eph.Client` whose connections are reused.
+      max_rows: the maximum number of rows of each request. Longer time
+        spans are split in several requests (see :meth:`JplReq.split`).
+      flight: a :class:`eph.coalesce.SingleFlight` coalescing requests
+        identical to concurrent ones (see :meth:`JplReq.query`).
+      layout: 'wide' to have a row per epoch and the columns of each object
+        prefixed with its name, 'long' to stack the rows of each object,
+        identified by a 'target' column (see ``LAYOUTS``).
+      timeout: the timeout in seconds of each request.
+      retry: a :class:`eph.retry.Retry` policy of failed requests.
+      hedge: a :class:`eph.retry.Hedge` policy of slow requests.
 
     Returns:
       :class:`astropy.table.Qtable`: The data structure containing ephemeris data.
     """
+    _check_layout(layout)
+    start, stop = _dates(dates)
+    objs, reqs = _reqs(objs, start, stop, **kwargs)
+    windows = [req.split(max_rows) for req in reqs]
+
+    def fetch(req):
+        return req.query(cache=cache,
+                         session=session,
+                         flight=flight,
+                         timeout=timeout,
+                         retry=retry,
+                         hedge=hedge).parse()
+
+    flat = [window for req_windows in windows for window in req_windows]
+    if max_workers and len(flat) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            tables = list(executor.map(fetch, flat))
+    else:
+        tables = map(fetch, flat)
+    tables = _concat(tables, [len(req_windows) for req_windows in windows])
+    return _merge(objs, tables, dates, layout)
+
+
+def at_times(objs,
+             times,
+             cache=None,
+             max_workers=None,
+             session=None,
+             max_epochs=MAX_TLIST,
+             max_length=MAX_URL_LENGTH,
+             flight=None,
+             timeout=None,
+             retry=None,
+             hedge=None,
+             **kwargs):
+    """
+    Shortcut function to obtain an astropy QTable with ephemeris data at
+    arbitrary epochs, packed in as few TLIST requests as possible.
+
+    Args:
+      objs: The celestial objects to be targeted.
+      times: the epochs, as an astropy Time or as Julian dates. Julian
+        dates are read by Jpl Horizons as TDB for vectors and elements
+        tables and as UT for observer tables: astropy Time objects are
+        converted to the matching time scale.
+      cache: a :class:`eph.cache.ResponseCache` to look up responses in.
+      max_workers: the maximum number of requests performed concurrently.
+      session: a :class:`eph.Client` whose connections are reused.
+      max_epochs: the maximum number of epochs of each request.
+      max_length: the maximum length of the url of each request.
+      flight: a :class:`eph.coalesce.SingleFlight` coalescing requests
+        identical to concurrent ones (see :meth:`JplReq.query`).
+      timeout: the timeout in seconds of each request.
+      retry: a :class:`eph.retry.Retry` policy of failed requests.
+      hedge: a :class:`eph.retry.Hedge` policy of slow requests.
+
+    Returns:
+      :class:`astropy.table.Qtable`: The data structure containing ephemeris
+      data, aligned row-for-row with `times`.
+    """
+    if not is_vector(objs):
+        objs = [objs]
+    kwargs.update({'OBJ_DATA': False, 'CSV_FORMAT': True})
+    jd = _jd(times, JplReq(**kwargs).get('TABLE_TYPE', 'OBSERVER'))
+    epochs, inverse = np.unique(np.atleast_1d(jd), return_inverse=True)
+    reqs, counts = [], []
+    for obj in objs:
+        req = JplReq(COMMAND=obj, **kwargs)
+        tlists = _tlists(epochs, len(req.url()), max_length, max_epochs)
+        for tlist in tlists:
+            reqs.append(JplReq(req, TLIST=tlist))
+        counts.append(len(tlists))
+
+    def fetch(req):
+        return req.query(cache=cache,
+                         session=session,
+                         flight=flight,
+                         timeout=timeout,
+                         retry=retry,
+                         hedge=hedge).parse()
+
+    if max_workers and len(reqs) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            tables = list(executor.map(fetch, reqs))
+    else:
+        tables = list(map(fetch, reqs))
+    aligned = []
+    for table in _concat(tables, counts, dedup=False):
+        if len(table) != len(epochs):
+            raise ParserError
+        aligned.append(table[inverse.ravel()])
+    return _hstack(objs, aligned)
+
+
+def _jd(times, table_type):
+    # TLIST epochs are TDB, except for observer tables, where they are UT
+    if not isinstance(times, Time):
+        return np.asarray(times, dtype=float)
+    if str(table_type).strip("'").upper().startswith('O'):
+        return times.utc.jd
+    return times.tdb.jd
+
+
+def _tlists(epochs, base_length, max_length, max_epochs):
+    tlists, tlist, length = [], [], base_length + len('&TLIST=%27%27')
+    for epoch in epochs:
+        s = '{0:.9f}'.format(epoch)
+        if tlist and (len(tlist) == max_epochs or
+                      length + len(s) + 1 > max_length):
+            tlists.append(' '.join(tlist))
+            tlist, length = [], base_length + len('&TLIST=%27%27')
+        tlist.append(s)
+        length += len(s) + 1
+    if tlist:
+        tlists.append(' '.join(tlist))
+    return tlists
+
+
+def _dates(dates):
     if is_vector(dates) and len(dates) > 1:
         start, stop = format_time(dates[0]), format_time(dates[1])
     else:
@@ -32,44 +182,157 @@ def get(objs, dates=datetime.now(), **kwargs):
             start_date = datetime.strptime(str(start), '%Y-%m-%d %H:%M')
         stop_date = start_date + timedelta(1, 0, 0)
         stop = stop_date.strftime('%Y-%m-%d')
+    return start, stop
+
+
+def _reqs(objs, start, stop, cls=JplReq, **kwargs):
     kwargs.update({'OBJ_DATA': False, 'CSV_FORMAT': True})
-    req = JplReq(START_TIME=start, STOP_TIME=stop, **kwargs)
-    data = None
-    keys = ['JDTDB', 'Calendar Date (TDB)']
+    reqs = []
     if not is_vector(objs):
         objs = [objs]
     for obj in objs:
+        req = cls(START_TIME=start, STOP_TIME=stop, **kwargs)
         req.command = obj
-        res = req.query()
-        table = res.parse()
-        if len(objs) > 1:
-            for k, v in table.meta.items():
-                table.meta[k] = [
-                    v,
-                ]
-            for col in table.colnames:
-                if col not in [
-                        'Date__(UT)__HR:MN', 'JDTDB', 'Calendar Date (TDB)'
-                ]:
-                    table.rename_column(col, obj + '_' + col)
-        if data:
-            try:
-                data = join(data, table, keys=keys)
-            except:
-                keys = [
-                    'Date__(UT)__HR:MN',
-                ]
-                data = join(data, table, keys=keys)
-        else:
-            data = table
-    if not is_vector(dates) or len(dates) < 2:
-        data = data[:1]
+        reqs.append(req)
+    return objs, reqs
+
+
+def _concat(tables, counts, dedup=True):
+    tables = iter(tables)
+    for count in counts:
+        chunks = [next(tables) for i in range(count)]
+        if count == 1:
+            yield chunks[0]
+            continue
+        if not dedup:
+            yield vstack(chunks, metadata_conflicts='silent')
+            continue
+        key = 'JDTDB' if 'JDTDB' in chunks[0].colnames else chunks[0].colnames[0]
+        last = None
+        for i, chunk in enumerate(chunks):
+            if last is not None and len(chunk):
+                if key == 'JDTDB':
+                    chunk = chunk[chunk[key] > last]
+                elif chunk[key][0] == last:
+                    chunk = chunk[1:]
+            if len(chunk):
+                last = chunk[key][-1]
+            chunks[i] = chunk
+        data = vstack(chunks, metadata_conflicts='silent')
+        data.meta = dict(chunks[0].meta)
+        data.meta.update({
+            k: v for k, v in chunks[-1].meta.items() if k.startswith('Stop')
+        })
+        yield data
+
+
+LAYOUTS = ('wide', 'long')
+
+# epoch columns shared by the tables of different objects
+EPOCH_COLS = ('JDTDB', ) + DATE_COLS
+
+
+def _epochs(table):
+    return [col for col in EPOCH_COLS if col in table.colnames]
+
+
+def _aligned(tables, keys):
+    first = tables[0]
+    check = ['JDTDB'] if 'JDTDB' in keys else keys
+    for table in tables[1:]:
+        if len(table) != len(first) or _epochs(table) != keys:
+            return False
+        for key in check:
+            if not np.array_equal(np.asarray(table[key]),
+                                  np.asarray(first[key])):
+                return False
+    return True
+
+
+def _meta(tables):
+    meta = OrderedDict()
+    for table in tables:
+        for k, v in table.meta.items():
+            meta.setdefault(k, []).append(v)
+    return meta
+
+
+def _wide(objs, tables, keys):
+    # epoch columns of the first table, then the other columns of each
+    # table prefixed with its object
+    first = tables[0]
+    cols, names = [first[key] for key in keys], list(keys)
+    for obj, table in zip(objs, tables):
+        for col in table.colnames:
+            if col not in keys:
+                cols.append(table[col])
+                names.append(obj + '_' + col)
+    return first.__class__(cols, names=names, meta=_meta(tables))
+
+
+def _collapse(data):
     for k, v in data.meta.items():
-        if all(item == v[0] for item in v):
+        if isinstance(v, list) and all(item == v[0] for item in v):
             data.meta[k] = v[0]
     return data
 
 
+def _hstack(objs, tables):
+    if len(objs) == 1:
+        return _collapse(tables[0])
+    return _collapse(_wide(objs, tables, _epochs(tables[0])))
+
+
+def _check_layout(layout):
+    if layout not in LAYOUTS:
+        raise ValueError('Unknown layout {0}.'.format(layout))
+
+
+def _long(objs, tables):
+    # the meta shared by all objects, plus the meta of each object in a
+    # side dict
+    metas = OrderedDict((obj, table.meta) for obj, table in zip(objs, tables))
+    meta = OrderedDict(
+        (k, v) for k, v in tables[0].meta.items()
+        if all(k in m and m[k] == v for m in metas.values()))
+    meta['targets'] = metas
+    target = np.repeat(np.array([str(obj) for obj in objs]),
+                       [len(table) for table in tables])
+    data = vstack(tables, metadata_conflicts='silent')
+    data.add_column(target, name='target', index=0)
+    data.meta = meta
+    return data
+
+
+def _merge(objs, tables, dates, layout='wide'):
+    tables = list(tables)
+    keys = _epochs(tables[0])
+    if layout == 'long':
+        if not is_vector(dates) or len(dates) < 2:
+            tables = [table[:1] for table in tables]
+        return _long(objs, tables)
+    if len(objs) == 1:
+        data = tables[0]
+    elif _aligned(tables, keys):
+        data = _wide(objs, tables, keys)
+    else:
+        # misaligned epochs (e.g. different time spans): keyed joins
+        data = _wide(objs[:1], tables[:1], keys)
+        for obj, table in zip(objs[1:], tables[1:]):
+            on = [key for key in _epochs(table) if key in keys]
+            if not on:
+                raise ParserError(
+                    'Tables of {0} and {1} have no epoch column in common.'.
+                    format(objs[0], obj))
+            data = join(data,
+                        _wide([obj], [table], _epochs(table)),
+                        keys=on,
+                        metadata_conflicts='silent')
+    if not is_vector(dates) or len(dates) < 2:
+        data = data[:1]
+    return _collapse(data)
+
+
 def vec(objs, dates=datetime.now(), center='@0', **kwargs):
     """
     Shortcut function to directly obtain an astropy QTable with vector data.
@@ -0,0 +1,313 @@
+"""
+Generates synthetic, deterministic Jpl Horizons responses of any table type
+and length, mimicking the layout of real ones, to test and benchmark parsers
+without querying the Jpl Horizons service.
+"""
+
+import numpy as np
+
+from .horizons import ID2NAME
+
+STARS = '*' * 79
+
+# one-way light time in seconds per km
+LIGHT_TIME = 1. / 299792.458
+
+VEC_TABLES = {
+    1: ('X', 'Y', 'Z'),
+    2: ('X', 'Y', 'Z', 'VX', 'VY', 'VZ'),
+    3: ('X', 'Y', 'Z', 'VX', 'VY', 'VZ', 'LT', 'RG', 'RR'),
+    4: ('X', 'Y', 'Z', 'LT', 'RG', 'RR'),
+    5: ('VX', 'VY', 'VZ'),
+    6: ('LT', 'RG', 'RR'),
+}
+
+ELEMENTS = ('EC', 'QR', 'IN', 'OM', 'W', 'Tp', 'N', 'MA', 'TA', 'A', 'AD',
+            'PR')
+
+# observer quantities: (CSV labels, fixed-width labels)
+QUANTITIES = {
+    1: (('R.A._(ICRF/J2000.0)', 'DEC_(ICRF/J2000.0)'),
+        ('R.A._(ICRF/J2000.0)_DEC', )),
+    2: (('R.A._(a-app)', 'DEC_(a-app)'), ('R.A._(a-app)_DEC', )),
+    3: (('dRA*cosD', 'd(DEC)/dt'), ('dRA*cosD', 'd(DEC)/dt')),
+    4: (('Azi_(a-app)', 'Elev_(a-app)'), ('Azi_(a-app)', 'Elev_(a-app)')),
+    9: (('APmag', 'S-brt'), ('APmag', 'S-brt')),
+    10: (('Illu%', ), ('Illu%', )),
+    19: (('r', 'rdot'), ('r', 'rdot')),
+    20: (('delta', 'deldot'), ('delta', 'deldot')),
+    21: (('1-way_LT', ), ('1-way_LT', )),
+    23: (('S-O-T', '/r'), ('S-O-T', '/r')),
+    24: (('S-T-O', ), ('S-T-O', )),
+}
+
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+          'Oct', 'Nov', 'Dec')
+
+
+def calendar(jd, digits=4):
+    """
+    Formats Julian dates as Jpl Horizons calendar dates (e.g.
+    ``'2000-Jan-01 00:00:00.0000'``).
+    """
+    ms = np.round((np.asarray(jd) - 2440587.5) * 86400000.)
+    iso = np.datetime_as_string(ms.astype('datetime64[ms]'), unit='ms')
+    dates = []
+    for s in iso:
+        fraction = (s[20:23] + '0' * digits)[:digits]
+        dates.append('{0}-{1}-{2} {3}.{4}'.format(
+            s[:4], MONTHS[int(s[5:7]) - 1], s[8:10], s[11:19], fraction))
+    return dates
+
+
+def sexagesimal(values, hours=False):
+    """Formats angles in degrees as sexagesimal strings (hours of right
+    ascension if `hours` is True)."""
+    values = np.asarray(values) / (15. if hours else 1.)
+    signs = np.where(values < 0, '-', '' if hours else '+')
+    values = np.abs(values)
+    degrees = np.floor(values)
+    minutes = np.floor((values - degrees) * 60)
+    seconds = ((values - degrees) * 60 - minutes) * 60
+    fmt = '{0}{1:02.0f} {2:02.0f} {3:05.2f}' if hours else \
+        '{0}{1:02.0f} {2:02.0f} {3:04.1f}'
+    return [fmt.format(*v) for v in zip(signs, degrees, minutes, seconds)]
+
+
+def orbit(jd, period=224.7, radius=1.082e8, inclination=3.39):
+    """
+    A circular inclined orbit, in km and km/s, used to synthesize
+    consistent positions and velocities.
+    """
+    omega = 2 * np.pi / period
+    phase = omega * (np.asarray(jd) - 2451545.)
+    inc = np.radians(inclination)
+    x, y = radius * np.cos(phase), radius * np.sin(phase)
+    vx, vy = -radius * omega * np.sin(phase), radius * omega * np.cos(phase)
+    pos = np.stack([x, y * np.cos(inc), y * np.sin(inc)], axis=1)
+    vel = np.stack([vx, vy * np.cos(inc), vy * np.sin(inc)], axis=1) / 86400.
+    return pos, vel
+
+
+def _header(target, center, jd, meta, labels, width):
+    lines = [
+        STARS,
+        'Ephemeris / WWW_USER Thu Jan  1 00:00:00 2026 Pasadena, USA'
+        '      / Horizons',
+        STARS,
+        'Target body name: {0} ({1})'
+        '                     {{source: DE441}}'.format(
+            ID2NAME.get(int(target), target).capitalize()
+            if target.isdigit() else target, target),
+        'Center body name: Solar System Barycenter (0)'
+        '     {source: DE441}',
+        'Center-site name: BODY CENTER',
+        STARS,
+        'Start time      : A.D. {0} TDB'.format(calendar(jd[:1])[0]),
+        'Stop  time      : A.D. {0} TDB'.format(calendar(jd[-1:])[0]),
+        'Step-size       : {0} minutes'.format(
+            int(round((jd[1] - jd[0]) * 1440)) if len(jd) > 1 else 0),
+        STARS,
+    ] + meta + ['*' * width] + labels + ['*' * width]
+    return '\n'.join(lines) + '\n'
+
+
+def _footer(params, width):
+    lines = [
+        '*' * width,
+        '',
+        ' Computations by ...',
+        '     Solar System Dynamics Group, Horizons On-Line Ephemeris System',
+        STARS,
+        '',
+        '!$$SOF',
+    ] + ['{0} = \'{1}\''.format(k, v) for k, v in params.items()]
+    return '\n'.join(lines) + '\n'
+
+
+def _records(jd, cols, values, csv, labels):
+    dates = calendar(jd)
+    if csv:
+        cells = [['{0:.9f}'.format(t), ' A.D. ' + date] for t, date in
+                 zip(jd, dates)]
+        for row, vals in zip(cells, values):
+            row.extend('{0:22.15E}'.format(v) for v in vals)
+        return [', '.join(row) + ',' for row in cells]
+    lines = []
+    for t, date, vals in zip(jd, dates, values):
+        lines.append('{0:.9f} = A.D. {1} TDB '.format(t, date))
+        for i in range(0, len(cols), 3):
+            if labels:
+                lines.append(''.join(
+                    ' {0:<2}={1:22.15E}'.format(col, v)
+                    for col, v in zip(cols[i:i + 3], vals[i:i + 3])))
+            else:
+                lines.append(''.join('{0:23.15E}'.format(v)
+                                     for v in vals[i:i + 3]))
+    return lines
+
+
+def _record_labels(cols, csv):
+    if csv:
+        names = ['JDTDB', 'Calendar Date (TDB)'] + list(cols)
+        return [', '.join('{0:>22}'.format(name) for name in names) + ',']
+    return ['JDTDB'] + [
+        '   ' + '    '.join('{0:<2}'.format(col)
+                            for col in cols[i:i + 3]).rstrip()
+        for i in range(0, len(cols), 3)
+    ]
+
+
+def _vectors(jd, rng, vec_table):
+    pos, vel = orbit(jd)
+    pos += rng.normal(scale=1., size=pos.shape)
+    rg = np.linalg.norm(pos, axis=1)
+    columns = dict(zip(('X', 'Y', 'Z'), pos.T))
+    columns.update(zip(('VX', 'VY', 'VZ'), vel.T))
+    columns.update(LT=rg * LIGHT_TIME, RG=rg,
+                   RR=np.sum(pos * vel, axis=1) / rg)
+    cols = VEC_TABLES[vec_table]
+    return cols, np.stack([columns[col] for col in cols], axis=1)
+
+
+def _elements(jd, rng):
+    n = len(jd)
+    a = 0.7233 + rng.normal(scale=1e-6, size=n)
+    ec = 0.0068 + rng.normal(scale=1e-5, size=n)
+    motion = np.full(n, 1.6021)
+    ma = np.mod(50.1 + motion * (jd - jd[0]), 360.)
+    values = np.stack([
+        ec,
+        a * (1 - ec),
+        np.full(n, 3.3947) + rng.normal(scale=1e-6, size=n),
+        np.full(n, 76.68) + rng.normal(scale=1e-5, size=n),
+        np.full(n, 54.88) + rng.normal(scale=1e-3, size=n),
+        jd - ma / motion,
+        motion,
+        ma,
+        np.mod(ma + 2 * ec * np.degrees(np.sin(np.radians(ma))), 360.),
+        a,
+        a * (1 + ec),
+        np.full(n, 360. / 1.6021),
+    ], axis=1)
+    return ELEMENTS, values
+
+
+def _observer(jd, rng, quantities, csv):
+    pos, vel = orbit(jd)
+    n = len(jd)
+    ra = np.mod(np.degrees(np.arctan2(pos[:, 1], pos[:, 0])), 360.)
+    dec = np.degrees(np.arcsin(pos[:, 2] / np.linalg.norm(pos, axis=1)))
+    au = np.linalg.norm(pos, axis=1) / 149597870.7
+    fields = {
+        1: [sexagesimal(ra, hours=True), sexagesimal(dec)],
+        2: [sexagesimal(ra + 0.01, hours=True), sexagesimal(dec + 0.003)],
+        3: [rng.normal(scale=100., size=n), rng.normal(scale=50., size=n)],
+        4: [rng.uniform(0., 360., n), rng.uniform(-90., 90., n)],
+        9: [-4. + rng.normal(scale=.3, size=n), 1. + rng.normal(scale=.1,
+                                                                size=n)],
+        10: [rng.uniform(0., 100., n)],
+        19: [au, rng.normal(scale=.1, size=n)],
+        20: [au + rng.uniform(0., 1., n), rng.normal(scale=10., size=n)],
+        21: [au * 8.3167],
+        23: [rng.uniform(0., 180., n), rng.choice(['/L', '/T'], n)],
+        24: [rng.uniform(0., 180., n)],
+    }
+    labels, cells = ['Date__(UT)__HR:MN:SC.fff'], [
+        [' ' + date for date in calendar(jd, digits=3)]
+    ]
+    for q in quantities:
+        names = QUANTITIES[q][0 if csv else 1]
+        values = [
+            column if isinstance(column[0], str) else
+            ['{0:.6f}'.format(v) for v in column] for column in fields[q]
+        ]
+        if len(names) < len(values):
+            values = [[' '.join(pair) for pair in zip(*values)]]
+        labels.extend(names)
+        cells.extend(values)
+    return labels, cells
+
+
+def generate(table_type='VECTORS',
+             rows=1000,
+             vec_table=3,
+             quantities=(1, 9, 20, 23, 24),
+             csv=True,
+             vec_labels=False,
+             start=2451544.5,
+             step=1.,
+             target='299',
+             seed=0):
+    """
+    Generates a synthetic Jpl Horizons response.
+
+    Responses are deterministic for given arguments, and parseable by
+    :func:`eph.parsers.parse` like real ones.
+
+    Args:
+        table_type (str): 'VECTORS', 'ELEMENTS' or 'OBSERVER'.
+        rows (int): the number of rows of the ephemeris.
+        vec_table (int): the VEC_TABLE of vectors (see ``VEC_TABLES``).
+        quantities: the QUANTITIES of observer tables (see
+            ``QUANTITIES``).
+        csv (bool): whether to generate the table in CSV format.
+        vec_labels (bool): whether to label values of vectors and
+            elements not in CSV format.
+        start (float): the Julian date of the first row.
+        step (float): the step in days between rows.
+        target (str): the Jpl Horizons code of the target.
+        seed (int): the seed of the random generator.
+
+    Returns:
+        str: the response.
+    """
+    rng = np.random.RandomState(seed)
+    jd = start + step * np.arange(rows)
+    table_type = table_type.upper()
+    params = dict(CENTER='@0', MAKE_EPHEM='YES', TABLE_TYPE=table_type)
+    if table_type in ('VECTORS', 'ELEMENTS'):
+        if table_type == 'VECTORS':
+            cols, values = _vectors(jd, rng, vec_table)
+            units = 'KM-S'
+            params.update(VEC_TABLE=vec_table, OUT_UNITS='KM-S')
+        else:
+            cols, values = _elements(jd, rng)
+            units = 'AU-D, deg, Julian Day Number (Tp)'
+            params.update(OUT_UNITS='AU-D')
+        labels = _record_labels(cols, csv)
+        lines = _records(jd, cols, values, csv, vec_labels)
+        meta = ['Output units    : {0}'.format(units)]
+    elif table_type == 'OBSERVER':
+        names, cells = _observer(jd, rng, quantities, csv)
+        params.update(QUANTITIES=','.join(map(str, quantities)))
+        meta = ['Table format    : {0}'.format(
+            'Comma Separated Values (spreadsheet)' if csv else 'Plain text')]
+        if csv:
+            labels = [' ' + ', , ,'.join(names[:1] + [', '.join(names[1:])])
+                      + ',']
+            lines = [
+                ', , ,'.join([row[0], ', '.join(row[1:])]) + ','
+                for row in zip(*cells)
+            ]
+        else:
+            widths = [
+                max(len(name), max(len(cell) for cell in column)) + 2
+                for name, column in zip(names, cells)
+            ]
+            widths[0] += 3
+            labels = [' ' + names[0].ljust(widths[0] - 1) + ''.join(
+                name.rjust(w) for name, w in zip(names[1:], widths[1:]))]
+            lines = [
+                row[0].ljust(widths[0]) +
+                ''.join(cell.rjust(w) for cell, w in zip(row[1:], widths[1:]))
+                for row in zip(*cells)
+            ]
+    else:
+        raise ValueError('Unknown table type {0}.'.format(table_type))
+    params.update(CSV_FORMAT='YES' if csv else 'NO',
+                  VEC_LABELS='YES' if vec_labels else 'NO',
+                  COMMAND=target)
+    width = max([len(STARS)] + [len(line) for line in labels])
+    return (_header(target, '@0', jd, meta, labels, width) + '$$SOE\n' +
+            '\n'.join(lines) + '\n$$EOE\n' + _footer(params, width))
@@ -0,0 +1,391 @@
+"""
+Defines client-side controls of the traffic towards the Jpl Horizons
+service: a token bucket limiting the rate of requests and an adaptive (AIMD)
+limit of the requests in flight, which backs off multiplicatively on
+throttling responses (http 429 and 503), connection errors and slow
+responses, and grows additively otherwise.
+
+A :class:`Throttle` installed with :func:`set_throttle` is shared by all the
+queries of the process, both blocking (see :meth:`eph.interface.JplReq.query`)
+and asynchronous (see :meth:`eph.aio.AsyncJplReq.query`).
+"""
+
+import asyncio
+import threading
+import time
+
+import requests
+
+# http statuses of throttling responses
+THROTTLED = (429, 503)
+
+# errors of requests signalling congestion
+ERRORS = (ConnectionError, requests.exceptions.ConnectionError,
+          requests.exceptions.Timeout)
+
+# the interval in seconds at which coroutines check for a free slot
+POLL_INTERVAL = .005
+
+
+class TokenBucket(object):
+    """
+    Limits the rate of calls to :meth:`acquire` to `rate` per second on
+    average, allowing bursts of `burst` calls, across threads.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Initialize a :class:`TokenBucket` object.
+
+        Args:
+            rate (float): the number of tokens added per second.
+            burst (int): the capacity of the bucket.
+        """
+        self.rate = float(rate)
+        self.burst = burst
+        self.waiting = 0
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._paused = 0.
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _take(self):
+        # takes a token, or returns the time to wait for one
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._paused and self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return max(self._paused - now, (1 - self._tokens) / self.rate)
+
+    def acquire(self):
+        """Waits for a token and takes it."""
+        with self._lock:
+            self.waiting += 1
+        try:
+            delay = self._take()
+            while delay is not None:
+                time.sleep(delay)
+                delay = self._take()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    async def aacquire(self):
+        """Waits for a token without blocking the event loop and takes
+        it."""
+        with self._lock:
+            self.waiting += 1
+        try:
+            delay = self._take()
+            while delay is not None:
+                await asyncio.sleep(delay)
+                delay = self._take()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def pause(self, seconds):
+        """Hands out no tokens for the given time, e.g. as asked by the
+        ``Retry-After`` header of a throttling response."""
+        with self._lock:
+            self._paused = max(self._paused, time.monotonic() + seconds)
+
+    def stats(self):
+        """Returns the rate, the tokens available and the number of callers
+        waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return dict(rate=self.rate,
+                        tokens=self._tokens,
+                        waiting=self.waiting)
+
+
+class AdaptiveLimit(object):
+    """
+    An additive-increase/multiplicative-decrease limit of the calls in
+    flight: the limit grows by `increase` every `limit` successful calls,
+    and shrinks by the factor `decrease` on congestion, at most once for
+    the calls in flight when congestion was detected.
+    """
+
+    def __init__(self,
+                 limit=4,
+                 min_limit=1,
+                 max_limit=64,
+                 increase=1.,
+                 decrease=.5,
+                 latency=None):
+        """
+        Initialize a :class:`AdaptiveLimit` object.
+
+        Args:
+            limit (int): the initial limit.
+            min_limit (int): the minimum limit.
+            max_limit (int): the maximum limit.
+            increase (float): the additive increase of the limit every
+                `limit` successful calls.
+            decrease (float): the multiplicative decrease of the limit on
+                congestion.
+            latency (float): the latency in seconds above which calls are
+                considered a sign of congestion. Latency is ignored if None.
+        """
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency = latency
+        self.in_flight = 0
+        self.waiting = 0
+        self.decreases = 0
+        self._epoch = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Waits until a call can be performed within the limit.
+
+        Returns:
+            the token to be passed to :meth:`release`.
+        """
+        with self._cond:
+            self.waiting += 1
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.waiting -= 1
+            self.in_flight += 1
+            return self._epoch
+
+    def try_acquire(self):
+        """
+        Starts a call if it can be performed within the limit, without
+        waiting.
+
+        Returns:
+            the token to be passed to :meth:`release`, None if the limit is
+            reached.
+        """
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return None
+            self.in_flight += 1
+            return self._epoch
+
+    async def aacquire(self):
+        """
+        Waits without blocking the event loop until a call can be performed
+        within the limit.
+
+        Returns:
+            the token to be passed to :meth:`release`.
+        """
+        with self._cond:
+            self.waiting += 1
+        try:
+            token = self.try_acquire()
+            while token is None:
+                await asyncio.sleep(POLL_INTERVAL)
+                token = self.try_acquire()
+            return token
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def release(self, token, ok=True, latency=None):
+        """
+        Reports the end of a call.
+
+        Args:
+            token: the token returned by :meth:`acquire`.
+            ok (bool): False if the call was throttled or failed to connect.
+            latency (float): the latency of the call in seconds.
+        """
+        congested = not ok or (self.latency is not None and
+                               latency is not None and latency > self.latency)
+        with self._cond:
+            self.in_flight -= 1
+            if not congested:
+                self.limit = min(self.max_limit,
+                                 self.limit + self.increase / self.limit)
+            elif token == self._epoch:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self.decreases += 1
+                self._epoch += 1
+            self._cond.notify_all()
+
+    def stats(self):
+        """Returns the current limit, the calls in flight and waiting, and
+        the number of decreases."""
+        with self._cond:
+            return dict(limit=int(self.limit),
+                        in_flight=self.in_flight,
+                        waiting=self.waiting,
+                        decreases=self.decreases)
+
+
+class Throttle(object):
+    """
+    Controls the http requests of queries with a :class:`TokenBucket` and an
+    :class:`AdaptiveLimit`, both optional.
+    """
+
+    def __init__(self, rate=None, burst=1, limit=None, **kwargs):
+        """
+        Initialize a :class:`Throttle` object.
+
+        Args:
+            rate (float): the maximum rate of requests per second. No rate
+                limit if None.
+            burst (int): the maximum burst of requests.
+            limit (int): the initial limit of requests in flight. No
+                concurrency limit if None.
+            kwargs: further arguments of :class:`AdaptiveLimit` (e.g.
+                `max_limit`, `latency`).
+        """
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.concurrency = AdaptiveLimit(limit, **kwargs) if limit else None
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def call(self, func, started=None):
+        """
+        Performs an http request within the limits.
+
+        Args:
+            func: the callable performing the request, returning the http
+                response.
+            started: a callable called when the limits allow the request,
+                right before it is performed.
+
+        Returns:
+            the http response.
+        """
+        token = self.concurrency.acquire() if self.concurrency else None
+        ok, start = True, time.monotonic()
+        try:
+            if self.bucket is not None:
+                self.bucket.acquire()
+                start = time.monotonic()
+            if started is not None:
+                started()
+            response = func()
+            ok = self._check(response)
+            return response
+        except ERRORS:
+            ok = False
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            self._release(token, ok, start)
+
+    async def acall(self, func):
+        """
+        Performs an http request within the limits without blocking the
+        event loop.
+
+        Args:
+            func: the coroutine function performing the request, returning
+                the http response.
+
+        Returns:
+            the http response.
+        """
+        token = None
+        if self.concurrency is not None:
+            token = await self.concurrency.aacquire()
+        ok, start = True, time.monotonic()
+        try:
+            if self.bucket is not None:
+                await self.bucket.aacquire()
+                start = time.monotonic()
+            response = await func()
+            ok = self._check(response)
+            return response
+        except ERRORS:
+            ok = False
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            self._release(token, ok, start)
+
+    def _check(self, response):
+        # whether the response is not a throttling one
+        if getattr(response, 'status_code', None) not in THROTTLED:
+            return True
+        with self._lock:
+            self.throttled += 1
+        retry_after = response.headers.get('Retry-After', '')
+        if self.bucket is not None and retry_after.isdigit():
+            self.bucket.pause(int(retry_after))
+        return False
+
+    def _release(self, token, ok, start):
+        with self._lock:
+            self.requests += 1
+        if self.concurrency is not None:
+            self.concurrency.release(token,
+                                     ok=ok,
+                                     latency=time.monotonic() - start)
+
+    def stats(self):
+        """
+        Returns the metrics of the throttle.
+
+        Returns:
+            dict: the number of requests, of throttling responses and of
+            connection errors, the current limit of requests in flight
+            (None if unlimited), the requests in flight and the queue depth
+            (requests waiting for the rate or the concurrency limit).
+        """
+        with self._lock:
+            stats = dict(requests=self.requests,
+                         throttled=self.throttled,
+                         errors=self.errors,
+                         limit=None,
+                         in_flight=None,
+                         waiting=0)
+        if self.concurrency is not None:
+            concurrency = self.concurrency.stats()
+            stats.update(limit=concurrency['limit'],
+                         in_flight=concurrency['in_flight'],
+                         waiting=concurrency['waiting'])
+        if self.bucket is not None:
+            bucket = self.bucket.stats()
+            stats.update(rate=bucket['rate'],
+                         tokens=bucket['tokens'],
+                         waiting=stats['waiting'] + bucket['waiting'])
+        return stats
+
+
+_throttle = None
+
+
+def set_throttle(throttle):
+    """
+    Installs a throttle shared by all the queries of the process.
+
+    Args:
+        throttle (:class:`Throttle`): the throttle, None to remove it.
+
+    Returns:
+        the throttle previously installed.
+    """
+    global _throttle
+    previous, _throttle = _throttle, throttle
+    return previous
+
+
+def get_throttle():
+    """Returns the throttle installed with :func:`set_throttle`, if any."""
+    return _throttle
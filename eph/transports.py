@@ -0,0 +1,273 @@
+"""
+Defines the transports performing http requests to the Jpl Horizons service.
+
+A transport is any object with a ``get(url, **kwargs)`` method returning a
+`requests`_ http response, so it can be passed as `session` wherever a
+:class:`eph.Client` is accepted, or bound to a request with
+``JplReq(..., transport=...)``. Transports can point to a service other than
+Jpl Horizons (e.g. a caching proxy, a mirror or a
+:class:`eph.mock.MockHorizons` server) through their `endpoint`, and can be
+layered, e.g. a :class:`ReplayTransport` recording responses fetched by a
+:class:`eph.Client`.
+
+.. _`requests`: http://docs.python-requests.org/en/master/
+"""
+
+import asyncio
+import functools
+import hashlib
+import io
+import os
+import os.path
+import threading
+
+import requests
+from six.moves.urllib.parse import urlsplit, parse_qsl, urlencode
+
+from . import horizons
+from .aio import aiohttp, fetch
+from .interface import JplReq, make_response
+from .util import path
+
+
+def url_key(url):
+    """
+    Computes a key of the Jpl parameters of a url, independent of the
+    endpoint and of the order of parameters.
+
+    Args:
+        url (str): the url.
+
+    Returns:
+        str: the hexadecimal digest of the sorted parameters.
+    """
+    query = urlencode(sorted(parse_qsl(urlsplit(url).query)))
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class Transport(object):
+    """Base class of transports."""
+
+    def __init__(self, endpoint=None):
+        """
+        Initialize a :class:`Transport` object.
+
+        Args:
+            endpoint (str): the url of a service to be queried in place of
+                the Jpl Horizons service, replacing ``JPL_ENDPOINT`` in
+                requested urls.
+        """
+        self.endpoint = endpoint
+
+    def resolve(self, url):
+        """Replaces ``JPL_ENDPOINT`` with the endpoint of the transport."""
+        if self.endpoint and url.startswith(horizons.JPL_ENDPOINT):
+            return self.endpoint + url[len(horizons.JPL_ENDPOINT):]
+        return url
+
+    def get(self, url, **kwargs):
+        """
+        Performs an http GET request.
+
+        Args:
+            url (str): the url to be requested.
+            kwargs: the options of the request (e.g. `stream`, `timeout`).
+
+        Returns:
+            the http response.
+        """
+        raise NotImplementedError
+
+    async def aget(self, url, **kwargs):
+        """Performs an http GET request without blocking the event loop (see
+        :meth:`get`), running :meth:`get` in an executor."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.get, url, **kwargs))
+
+    def close(self):
+        """Releases the resources of the transport."""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HttpTransport(Transport):
+    """Performs each request with `requests`_ on a new connection."""
+
+    def __init__(self, endpoint=None, timeout=None):
+        """
+        Initialize a :class:`HttpTransport` object.
+
+        Args:
+            endpoint (str): see :class:`Transport`.
+            timeout: the default timeout in seconds of requests, as a single
+                value or a (connect, read) tuple. No timeout if None.
+        """
+        super(HttpTransport, self).__init__(endpoint)
+        self.timeout = timeout
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return requests.get(self.resolve(url), **kwargs)
+
+
+class AsyncTransport(Transport):
+    """
+    Performs requests with `aiohttp`_ if it is installed (through
+    :func:`eph.aio.fetch`), otherwise with `requests`_ in an executor.
+
+    Synchronous requests run their own event loop, so :meth:`get` must not
+    be called from a coroutine.
+
+    .. _`aiohttp`: https://docs.aiohttp.org/
+    """
+
+    async def aget(self, url, **kwargs):
+        if aiohttp is not None:
+            return await fetch(self.resolve(url))
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(
+                None, functools.partial(requests.get, self.resolve(url)))
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectionError(e.__str__())
+
+    def get(self, url, **kwargs):
+        return asyncio.run(self.aget(url, **kwargs))
+
+
+class ReplayTransport(Transport):
+    """
+    Replays responses stored in a directory, one file per set of Jpl
+    parameters (see :func:`url_key`).
+
+    Responses not found are fetched through the `fallback` transport, if
+    any, and recorded, so that later runs can replay them without querying
+    the service.
+    """
+
+    def __init__(self, directory, fallback=None, record=True):
+        """
+        Initialize a :class:`ReplayTransport` object.
+
+        Args:
+            directory (str): the directory of stored responses.
+            fallback: the transport fetching responses not found (e.g. a
+                :class:`eph.Client`). Requests of responses not found fail
+                if None.
+            record (bool): whether to store successful responses fetched
+                through `fallback`.
+        """
+        super(ReplayTransport, self).__init__()
+        self.directory = path(directory)
+        self.fallback = fallback
+        self.record = record
+
+    def filename(self, url):
+        """The file storing the response of a url."""
+        return os.path.join(self.directory, url_key(url) + '.txt')
+
+    def get(self, url, **kwargs):
+        filename = self.filename(url)
+        if os.path.isfile(filename):
+            with io.open(filename, 'r', encoding='utf-8') as f:
+                return make_response(f.read(), url=url)
+        if self.fallback is None:
+            raise ConnectionError('No response to {0} stored in {1}.'.format(
+                url, self.directory))
+        kwargs['stream'] = False
+        http_response = self.fallback.get(url, **kwargs)
+        if self.record and http_response.ok and \
+                '$$SOE' in http_response.text:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory, exist_ok=True)
+            tmp = '{0}.{1}.{2}.tmp'.format(filename, os.getpid(),
+                                           threading.get_ident())
+            with io.open(tmp, 'w', encoding='utf-8') as f:
+                f.write(http_response.text)
+            os.replace(tmp, filename)
+        return http_response
+
+    def close(self):
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+class MemoryTransport(Transport):
+    """
+    Serves responses held in memory, recording the urls requested, e.g. to
+    test code querying the service.
+    """
+
+    def __init__(self, responses=(), default=None):
+        """
+        Initialize a :class:`MemoryTransport` object.
+
+        Args:
+            responses: (request, text) pairs, where request is a
+                :class:`eph.JplReq` (or a dict of Jpl parameters) and text
+                the content of its response.
+            default (str): the content of responses to requests not in
+                `responses`. Such requests fail if None.
+        """
+        super(MemoryTransport, self).__init__()
+        self.responses = {}
+        self.default = default
+        self.urls = []
+        for req, text in responses:
+            self.add(req, text)
+
+    def add(self, req, text):
+        """Sets the content of the response to a request."""
+        self.responses[url_key(JplReq(req).url())] = text
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        text = self.responses.get(url_key(url), self.default)
+        if text is None:
+            raise ConnectionError('No response to {0}.'.format(url))
+        return make_response(text, url=url)
+
+
+TRANSPORTS = dict(
+    http=HttpTransport,
+    asyncio=AsyncTransport,
+    replay=ReplayTransport,
+    memory=MemoryTransport,
+)
+
+
+def make_transport(name='http', **options):
+    """
+    Builds a transport by name.
+
+    Args:
+        name (str): ``'http'``, ``'session'`` (a pooled :class:`eph.Client`),
+            ``'asyncio'``, ``'replay'`` or ``'memory'``.
+        options: the arguments of the transport. Replay transports fetch
+            responses not found through a :class:`eph.Client` built with
+            the remaining options (e.g. `endpoint`, `pool_size`).
+
+    Returns:
+        the transport.
+
+    Raises:
+        :class:`ValueError`: if the transport is unknown.
+    """
+    from .client import Client
+    if name == 'session':
+        return Client(**options)
+    if name == 'replay':
+        directory = options.pop('directory')
+        record = options.pop('record', True)
+        return ReplayTransport(directory,
+                               fallback=Client(**options),
+                               record=record)
+    if name not in TRANSPORTS:
+        raise ValueError('Unknown transport {0}.'.format(name))
+    return TRANSPORTS[name](**options)
@@ -1,9 +1,20 @@
-import copy
 import os.path
 import string
 import re
 from six.moves.urllib.parse import urlparse, urlunparse, urlencode
 
+import numpy as np
+
+# number of cells inspected to infer the type of a column
+SAMPLE = 64
+
+INT = re.compile(r'[+-]?\d+$')
+
+FLOAT = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+          'Oct', 'Nov', 'Dec')
+
 
 def is_vector(obj):
     return hasattr(obj, '__iter__') and not isinstance(obj, str)
@@ -29,14 +40,105 @@ def parse_table(raw, cols_del=r',', rows_del=r'\r?\n'):
 
 
 def numberify(data):
-    numberified = copy.deepcopy(data)
-    if is_vector(numberified):
-        return list(map(lambda obj: numberify(obj), numberified))
-    else:
+    if is_vector(data):
+        return list(map(numberify, data))
+    try:
+        return float(data)
+    except (TypeError, ValueError):
+        return data
+
+
+def infer_dtype(cells, sample=SAMPLE):
+    """
+    Infers the type of a column of strings from a sample of its cells,
+    evenly spaced along the column.
+
+    Args:
+        cells: the cells of the column.
+        sample (int): the maximum number of cells inspected.
+
+    Returns:
+        the inferred type: ``np.int64``, ``np.float64`` or ``str``.
+    """
+    step = max(len(cells) // sample, 1)
+    sampled = cells[::step][:sample]
+    for dtype, pattern in ((np.int64, INT), (np.float64, FLOAT)):
+        if len(sampled) and all(pattern.match(cell) for cell in sampled):
+            return dtype
+    return str
+
+
+def to_datetime(cells):
+    """
+    Converts a column of Jpl Horizons calendar dates (e.g.
+    ``'A.D. 2000-Jan-01 00:00:00.0000'``) in a ``datetime64`` array.
+
+    Args:
+        cells: the cells of the column.
+
+    Returns:
+        the ``datetime64`` array or None if cells cannot be converted.
+    """
+    column = np.asarray(cells, dtype=str)
+    if np.any(np.char.startswith(column, 'B.C.')):
+        return None
+    column = np.char.strip(np.char.replace(column, 'A.D.', ''))
+    for i, month in enumerate(MONTHS):
+        column = np.char.replace(column, month, '{0:02d}'.format(i + 1))
+    try:
+        return np.char.replace(column, ' ', 'T').astype('datetime64[ms]')
+    except ValueError:
+        return None
+
+
+def convert_column(cells, date=False, sample=SAMPLE):
+    """
+    Converts a column of strings as a whole, in the type inferred from a
+    sample of its cells (see :func:`infer_dtype`).
+
+    Columns falling outside of the inferred type (mixed columns) fall back
+    to floats and then to strings.
+
+    Args:
+        cells: the cells of the column.
+        date (bool): whether to try to convert cells in calendar dates.
+        sample (int): the maximum number of cells inspected.
+
+    Returns:
+        the column array.
+    """
+    column = np.asarray(cells, dtype=str)
+    if date:
+        dates = to_datetime(column)
+        if dates is not None:
+            return dates
+    dtype = infer_dtype(column, sample=sample)
+    dtypes = (np.int64, np.float64) if dtype is np.int64 else \
+        (np.float64, ) if dtype is np.float64 else ()
+    for dtype in dtypes:
         try:
-            return float(numberified)
-        except (TypeError, ValueError):
-            return numberified
+            return column.astype(dtype)
+        except (ValueError, OverflowError):
+            pass
+    return column
+
+
+def columnize(rows, dates=(), sample=SAMPLE):
+    """
+    Converts a *list of lists* table of strings in typed column arrays.
+
+    Args:
+        rows: the rows of the table.
+        dates: the indices of columns to be converted in calendar dates.
+        sample (int): the maximum number of cells inspected per column.
+
+    Returns:
+        :class:`list`: the column arrays.
+    """
+    return [
+        convert_column(col, date=i in dates, sample=sample)
+        for i, col in enumerate(zip(*rows))
+    ]
 
 
 def transpose(data):
@@ -65,7 +65,13 @@ setup(
         'six>=1.0,<2.0',
         'requests>=2.0,<3.0',
         'astropy>=2.0,<4.0',
+        'numpy>=1.15',
     ],
+    extras_require={
+        'async': [
+            'aiohttp>=3.0,<4.0',
+        ],
+    },
     include_package_data=True,
     zip_safe=False,
     entry_points={
@@ -2,6 +2,10 @@ import pytest
 
 import os.path
 
+import numpy as np
+from astropy import units as u
+from astropy.table import QTable
+
 
 @pytest.fixture(scope='session')
 def res_dir():
@@ -12,3 +16,90 @@ def res_dir():
 @pytest.fixture(scope='session')
 def config_file(res_dir):
     return os.path.join(res_dir, 'config.ini')
+
+
+@pytest.fixture
+def horizons(monkeypatch, res_dir):
+    """Serves the vectors.txt resource in place of the Jpl Horizons service,
+    recording the urls requested."""
+    import requests
+    from eph.interface import make_response
+
+    with open(os.path.join(res_dir, 'vectors.txt'), 'r') as f:
+        text = f.read()
+    urls = []
+
+    def get(url, **kwargs):
+        urls.append(url)
+        return make_response(text, url=url)
+
+    monkeypatch.setattr(requests, 'get', get)
+    return urls
+
+
+@pytest.fixture
+def horizons_server(monkeypatch, res_dir):
+    """Runs a local http server serving the vectors.txt resource and points
+    eph to it, yielding the list of paths requested."""
+    import threading
+    from six.moves import BaseHTTPServer, socketserver
+    import eph.interface
+
+    with open(os.path.join(res_dir, 'vectors.txt'), 'rb') as f:
+        content = f.read()
+    paths = []
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            paths.append(self.path)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.daemon = True
+    thread.start()
+    endpoint = 'http://127.0.0.1:{0}/horizons_batch.cgi?batch=1'.format(
+        server.server_address[1])
+    monkeypatch.setattr(eph.interface, 'JPL_ENDPOINT', endpoint)
+    yield paths
+    server.shutdown()
+    server.server_close()
+
+
+PERIOD = 200.
+
+
+def orbit(jd):
+    """Positions (km) and velocities (km/s) of a synthetic orbit."""
+    w = 2 * np.pi / PERIOD
+    t = jd - 2451544.5
+    pos = np.array([np.cos(w * t), np.sin(w * t), .1 * np.sin(2 * w * t)]).T
+    vel = np.array([
+        -w * np.sin(w * t), w * np.cos(w * t), .2 * w * np.cos(2 * w * t)
+    ]).T
+    return pos * 1e8, vel * 1e8 / 86400.
+
+
+def orbit_vectors(jd):
+    """A vector table sampling a synthetic orbit at the given epochs."""
+    pos, vel = orbit(jd)
+    data = [jd * u.day] + [pos[:, i] * u.km for i in range(3)] + \
+        [vel[:, i] * u.km / u.s for i in range(3)]
+    return QTable(data, names=('JDTDB', 'X', 'Y', 'Z', 'VX', 'VY', 'VZ'))
+
+
+@pytest.fixture
+def orbit_table():
+    """A vector table sampling a synthetic orbit every two days."""
+    return orbit_vectors(2451544.5 + np.arange(0., 400., 2.))
@@ -0,0 +1,57 @@
+import pytest
+import asyncio
+from six.moves.urllib.parse import unquote
+
+from eph import aio
+from eph.aio import *
+from eph.shortcuts import get as sync_get
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@pytest.fixture(params=[True, False])
+def native(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(aio, 'aiohttp', None)
+    elif aio.aiohttp is None:
+        pytest.skip('aiohttp is not installed')
+    return request.param
+
+
+def test_async_query(horizons_server, native):
+    req = AsyncJplReq(COMMAND='venus')
+    res = run(req.query())
+    assert res.http_response.status_code == 200
+    assert len(res.parse()) == 4
+    assert len(horizons_server) == 1
+
+
+def test_async_get(horizons_server, native):
+    objs = ['venus', 'earth', 'mars']
+    dates = ['2000-1-1', '2018-1-1']
+    e = run(get(objs, dates=dates, max_concurrency=2))
+    expected = sync_get(objs, dates=dates)
+    assert len(horizons_server) == 2 * len(objs)
+    assert e.colnames == expected.colnames
+    for col in e.colnames:
+        assert list(e[col]) == list(expected[col])
+
+
+def test_async_shortcuts(horizons_server):
+    e = run(pos('venus', dates=['2000-1-1', '2018-1-1']))
+    assert 'VEC_TABLE=\'1\'' in unquote(horizons_server[0])
+    assert len(e) == 4
+
+
+def test_async_connection_error(monkeypatch, native):
+    import eph.interface
+    monkeypatch.setattr(eph.interface, 'JPL_ENDPOINT',
+                        'http://127.0.0.1:1/horizons_batch.cgi?batch=1')
+    with pytest.raises(ConnectionError):
+        run(AsyncJplReq(COMMAND='venus').query())
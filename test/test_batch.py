@@ -0,0 +1,120 @@
+import pytest
+
+import json
+import os.path
+
+from eph.batch import *
+from eph.cache import load_table
+from eph.cli import batch_parser
+from eph.transports import MemoryTransport, make_response
+
+
+class FlakyTransport(MemoryTransport):
+    """Fails the requests of targets in `bad` and serves malformed responses
+    to the requests of targets in `malformed`."""
+
+    def __init__(self, text, bad=(), malformed=()):
+        super(FlakyTransport, self).__init__(default=text)
+        self.bad = set(bad)
+        self.malformed = set(malformed)
+
+    def get(self, url, **kwargs):
+        if any('COMMAND=%27{0}%27'.format(t) in url for t in self.bad):
+            raise ConnectionError('Unreachable.')
+        if any('COMMAND=%27{0}%27'.format(t) in url for t in self.malformed):
+            return make_response('header\n$$SOE\n1,2,\n$$EOE\n', url=url)
+        return super(FlakyTransport, self).get(url, **kwargs)
+
+
+@pytest.fixture(scope='module')
+def vectors(res_dir):
+    with open(os.path.join(res_dir, 'vectors.txt'), 'r') as f:
+        return f.read()
+
+
+@pytest.fixture
+def targets():
+    return ['2000001', '1P/Halley', 'C/2020 F3', 'bad']
+
+
+def test_read_targets(tmpdir):
+    filename = str(tmpdir.join('targets.txt'))
+    with open(filename, 'w') as f:
+        f.write('# asteroids\nCeres\n\n  433 \nCeres\n')
+    assert read_targets(filename) == ['Ceres', '433']
+
+
+def test_target_filename():
+    a = target_filename('1P/Halley', 'out')
+    b = target_filename('1P_Halley', 'out')
+    assert a != b
+    assert os.path.basename(a).startswith('1P_Halley-')
+    assert a.endswith('.tbl')
+    assert os.path.dirname(os.path.dirname(a)) == 'out'
+    assert target_filename('433', 'out', 'ecsv').endswith('.ecsv')
+
+
+def test_batch(tmpdir, vectors, targets):
+    output = str(tmpdir.join('out'))
+    transport = FlakyTransport(vectors, bad=['bad'])
+    results = list(
+        batch(targets,
+              output,
+              dates=['2000-01-01', '2018-01-01'],
+              session=transport,
+              max_workers=2))
+    assert sorted(r[0] for r in results) == sorted(targets)
+    errors = {r[0]: r[3] for r in results if r[3]}
+    assert list(errors) == ['bad'] and 'Unreachable' in errors['bad']
+    for target, rows, filename, error in results:
+        if not error:
+            assert filename == target_filename(target, output)
+            assert len(load_table(filename)) == rows == 4
+    with open(os.path.join(output, CHECKPOINT), 'r') as f:
+        entries = [json.loads(line) for line in f]
+    assert len(entries) == len(targets)
+
+    # resuming only retries failed targets
+    transport = FlakyTransport(vectors)
+    results = list(batch(targets, output, session=transport))
+    assert [r[0] for r in results] == ['bad'] and not results[0][3]
+    assert list(batch(targets, output, session=transport)) == []
+    assert len(list(batch(targets, output, session=transport,
+                          resume=False))) == len(targets)
+
+
+def test_batch_malformed(tmpdir, vectors):
+    output = str(tmpdir.join('out'))
+    transport = FlakyTransport(vectors, malformed=['bad'])
+    results = list(
+        batch(['433', 'bad', 'Ceres'],
+              output,
+              dates=['2000-01-01', '2018-01-01'],
+              session=transport,
+              max_workers=1))
+    errors = {r[0]: r[3] for r in results if r[3]}
+    assert list(errors) == ['bad']
+    assert sorted(Checkpoint(os.path.join(output, CHECKPOINT)).done) == \
+        ['433', 'Ceres']
+    for target in ['433', 'Ceres']:
+        assert len(load_table(target_filename(target, output))) == 4
+
+
+def test_checkpoint(tmpdir):
+    filename = str(tmpdir.join(CHECKPOINT))
+    checkpoint = Checkpoint(filename)
+    checkpoint.record('a', rows=1, filename='a.tbl')
+    checkpoint.record('b', error='failed')
+    checkpoint.record('c', rows=1, filename='c.tbl')
+    checkpoint.record('c', error='failed')
+    with open(filename, 'a') as f:
+        f.write('{"target": "d", "ro')
+    assert list(Checkpoint(filename).done) == ['a']
+
+
+def test_batch_parser():
+    args = batch_parser.parse_args(
+        ['--targets', 'targets.txt', '-o', 'out', '--rate', '2'])
+    assert args.targets == 'targets.txt'
+    assert args.rate == 2.
+    assert args.jobs == 8 and not args.no_resume
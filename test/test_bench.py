@@ -0,0 +1,45 @@
+import pytest
+
+from eph.bench import *
+
+
+@pytest.fixture(scope='module')
+def results():
+    return run(rows=(20, ), cases=['vectors3', 'observer_fixed'], repeat=1)
+
+
+def test_run(results):
+    stages = {r['stage'] for r in results if r['case'] == 'vectors3'}
+    assert {'get_sections', 'parse_data', 'numberify', 'transpose', 'parse',
+            'make_table'} <= stages
+    assert {r['stage'] for r in results if r['case'] == 'observer_fixed'
+            } == {'get_sections', 'parse'}
+    assert all(r['seconds'] > 0 and r['peak_mb'] >= 0 for r in results)
+
+
+def test_compare(results):
+    assert compare(results, results) == []
+    baseline = [dict(r, seconds=r['seconds'] / 2) for r in results]
+    assert len(compare(results, baseline, tolerance=.5)) == len(results)
+
+
+def test_save_load(tmpdir, results):
+    filename = str(tmpdir.join('bench.json'))
+    save(results, filename, label='test')
+    assert load(filename) == results
+
+
+def test_main(tmpdir, results):
+    filename = str(tmpdir.join('bench.json'))
+    save([dict(r, seconds=1e-12) for r in results], filename)
+    argv = ['--rows', '20', '--cases', 'vectors3', '--repeat', '1']
+    assert main(argv + ['--baseline', filename]) == 1
+
+
+def test_run_server():
+    results = run_server(concurrency=(1, 2), requests=4, rows=10)
+    assert [(r['mode'], r['concurrency']) for r in results] == [
+        ('query', 1), ('query', 2), ('get', 1), ('get', 2)]
+    for r in results:
+        assert r['requests_per_s'] > 0 and r['mb_per_s'] > 0
+        assert r['p50_ms'] <= r['p90_ms'] <= r['p99_ms']
@@ -0,0 +1,129 @@
+import pytest
+import os
+import time
+
+from eph.cache import *
+from eph.config import read_cache_config
+from eph.interface import JplReq
+from eph.parsers import parse
+from eph.transports import MemoryTransport
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return ResponseCache(str(tmpdir.join('cache')))
+
+
+def test_cache_get_set(cache):
+    key = cache.key('COMMAND=%27399%27')
+    assert cache.get(key) is None
+    cache.set(key, '$$SOE\n$$EOE')
+    assert cache.get(key) == '$$SOE\n$$EOE'
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
+
+
+def test_cache_key(cache):
+    assert cache.key('a') == cache.key('a')
+    assert cache.key('a') != cache.key('b')
+
+
+def test_cache_endpoint(cache, res_dir):
+    with open(os.path.join(res_dir, 'vectors.txt'), 'r') as f:
+        text = f.read()
+    horizons = MemoryTransport(default=text)
+    mirror = MemoryTransport(default=text)
+    mirror.endpoint = 'http://127.0.0.1:8000/horizons_batch.cgi?batch=1'
+    req = JplReq(COMMAND='earth')
+    for transport in (horizons, mirror, horizons, mirror):
+        req.query(cache=cache, session=transport)
+    assert len(horizons.urls) == len(mirror.urls) == 1
+
+
+def test_cache_ttl(tmpdir):
+    cache = ResponseCache(str(tmpdir), ttl=60)
+    cache.set('a', 'data')
+    old = time.time() - 120
+    os.utime(cache.filename('a'), (old, old))
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_cache_lru(tmpdir):
+    cache = ResponseCache(str(tmpdir), max_size=10)
+    cache.set('a', '12345')
+    os.utime(cache.filename('a'), (0, time.time()))
+    cache.set('b', '12345')
+    os.utime(cache.filename('b'), (1, time.time()))
+    assert cache.get('a') == '12345'
+    cache.set('c', '12345')
+    assert cache.get('b') is None
+    assert cache.get('a') == '12345'
+    assert cache.get('c') == '12345'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_running_size(tmpdir):
+    cache = ResponseCache(str(tmpdir), max_size=100)
+    cache.set('a', '12345')
+    scans = []
+    entries = cache.entries
+    cache.entries = lambda: scans.append(1) or entries()
+    for key in 'bcdefghijk':
+        cache.set(key, '12345')
+    cache.set('a', '1234567890')
+    assert scans == []
+    cache.set('l', 'x' * 50)
+    assert scans == [1]
+    assert cache.stats()['size'] <= 100
+    assert ResponseCache(str(tmpdir), max_size=100)._size == \
+        cache.stats()['size']
+
+
+def test_cache_clear(cache):
+    cache.set('a', 'data')
+    cache.clear()
+    assert cache.stats()['entries'] == 0
+
+
+def test_read_cache_config(tmpdir, config_file):
+    assert read_cache_config(config_file) is None
+    filename = str(tmpdir.join('ephrc'))
+    with open(filename, 'w') as f:
+        f.write('[DEFAULT]\nCENTER=@0\n[cache]\ndirectory=/tmp\nttl=10\n')
+    assert read_cache_config(filename) == {'directory': '/tmp', 'ttl': '10'}
+
+
+@pytest.fixture
+def vectors_table(res_dir):
+    with open(os.path.join(res_dir, 'vectors.txt'), 'r') as f:
+        return parse(f.read())
+
+
+def test_dump_load_table(tmpdir, vectors_table):
+    filename = str(tmpdir.join('vectors.tbl'))
+    dump_table(vectors_table, filename)
+    table = load_table(filename)
+    assert table.colnames == vectors_table.colnames
+    assert table.meta == vectors_table.meta
+    for col in table.colnames:
+        assert getattr(table[col], 'unit', None) == getattr(
+            vectors_table[col], 'unit', None)
+        assert list(table[col]) == list(vectors_table[col])
+    base = table['X']
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert base is not None
+
+
+def test_table_cache(tmpdir, vectors_table):
+    cache = ResponseCache(str(tmpdir))
+    key = cache.tables.table_key('a', QTable)
+    assert cache.tables.get(key) is None
+    cache.tables.set(key, vectors_table)
+    table = cache.tables.get(key)
+    assert list(table['JDTDB']) == list(vectors_table['JDTDB'])
+    assert cache.tables.stats()['entries'] == 1
+    assert cache.stats()['entries'] == 0
@@ -1,7 +1,24 @@
-from eph.cli import parser
+from eph.cli import parser, bench_parser
 
 
 def test_parser():
     args = parser.parse_args(['299', '--step', '100d'])
     assert args.objs[0] == '299'
     assert args.step == '100d'
+    assert args.layout == 'wide'
+    assert args.timeout is None and args.retries == 0
+
+
+def test_bench_parser():
+    args = bench_parser.parse_args(['--concurrency', '1', '8', '-n', '10'])
+    assert args.concurrency == [1, 8]
+    assert args.requests == 10
+    assert args.endpoint is None
+
+
+def test_parser_transport():
+    args = parser.parse_args(
+        ['299', '--transport', 'replay', '--replay-dir', 'responses'])
+    assert args.transport == 'replay'
+    assert args.replay_dir == 'responses'
+    assert args.endpoint is None
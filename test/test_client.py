@@ -0,0 +1,30 @@
+from eph.client import *
+from eph.interface import JplReq
+from eph.shortcuts import get
+
+
+def test_client_reuse(horizons_server):
+    with Client(pool_size=2) as client:
+        for obj in ('venus', 'earth', 'mars'):
+            res = JplReq(COMMAND=obj).query(session=client)
+            assert len(res.parse()) == 4
+        stats = client.stats()
+    assert len(horizons_server) == 3
+    assert stats == dict(requests=3, opened=1, reused=2)
+
+
+def test_client_shortcuts(horizons_server):
+    with Client(pool_size=4, timeout=10) as client:
+        e = get(['venus', 'mars'],
+                dates=['2000-1-1', '2018-1-1'],
+                max_workers=2,
+                session=client)
+        stats = client.stats()
+    assert len(e) == 4
+    assert stats['requests'] == 2
+    assert stats['opened'] <= 2
+
+
+def test_client_compress():
+    assert Client().session.headers['Accept-Encoding'] == 'gzip, deflate'
+    assert Client(compress=False).session.headers['Accept-Encoding'] == 'identity'
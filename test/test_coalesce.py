@@ -0,0 +1,114 @@
+import pytest
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from eph.coalesce import *
+from eph.interface import JplReq
+from eph.shortcuts import get
+from eph.transports import MemoryTransport
+
+
+@pytest.fixture(scope='module')
+def vectors(res_dir):
+    with open(res_dir + 'vectors.txt', 'r') as f:
+        return f.read()
+
+
+def test_single_flight():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return object()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flight.do, 'a', func)
+        started.wait()
+        followers = [executor.submit(flight.do, 'a', func) for i in range(3)]
+        while flight.stats('a')['calls'] < 4:
+            threading.Event().wait(.01)
+        assert flight.in_flight() == ['a']
+        release.set()
+        results = [f.result() for f in [leader] + followers]
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats('a') == dict(calls=4, executions=1, coalesced=3,
+                                     errors=0)
+    assert flight.in_flight() == []
+    flight.do('a', func)
+    assert flight.stats()['a']['executions'] == 2
+    flight.reset()
+    assert flight.stats() == {}
+
+
+def test_single_flight_error():
+    flight = SingleFlight()
+
+    def func():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        flight.do('a', func)
+    assert flight.stats('a')['errors'] == 1
+    assert flight.in_flight() == []
+
+
+def test_single_flight_max_keys():
+    flight = SingleFlight(max_keys=2)
+    for key in ('a', 'b', 'a', 'c'):
+        flight.do(key, lambda: None)
+    assert sorted(flight.stats()) == ['a', 'c']
+    assert flight.stats('a')['calls'] == 2
+    assert flight.stats('b')['calls'] == 0
+
+
+def test_query_flight(vectors):
+    flight = SingleFlight()
+    transport = MemoryTransport(default=vectors)
+    original = transport.get
+
+    def get_(url, **kwargs):
+        threading.Event().wait(.2)
+        return original(url, **kwargs)
+
+    transport.get = get_
+    req = JplReq(COMMAND='earth', transport=transport)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        tables = list(
+            executor.map(lambda i: req.query(flight=flight).parse(),
+                         range(4)))
+    assert len(transport.urls) == 1
+    assert all(table is tables[0] for table in tables)
+    stats = flight.stats(req.canonical())
+    assert stats['calls'] == 4 and stats['coalesced'] == 3
+
+
+def test_query_flight_endpoint(vectors):
+    flight = SingleFlight()
+    horizons = MemoryTransport(default=vectors)
+    mirror = MemoryTransport(default=vectors)
+    mirror.endpoint = 'http://127.0.0.1:8000/horizons_batch.cgi?batch=1'
+    req = JplReq(COMMAND='earth')
+    assert req.response_key() == req.response_key(horizons)
+    assert req.response_key(mirror).startswith(mirror.endpoint)
+    req.query(session=horizons, flight=flight)
+    req.query(session=mirror, flight=flight)
+    assert len(flight.stats()) == 2
+
+
+def test_get_flight(vectors):
+    flight = SingleFlight()
+    transport = MemoryTransport(default=vectors)
+    kwargs = dict(dates=['2000-01-01', '2000-01-05'],
+                  session=transport,
+                  flight=flight)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        e1, e2 = executor.map(lambda objs: get(objs, **kwargs),
+                              [['venus', 'earth'], ['venus', 'mars']])
+    assert 'venus_X' in e1.colnames and 'venus_X' in e2.colnames
+    assert 'venus_venus_X' not in e2.colnames
@@ -1,4 +1,5 @@
 import pytest
+from datetime import timedelta
 
 from eph.horizons import *
 
@@ -131,3 +132,38 @@ def is_jpl_param_data(request):
 def test_is_jpl_param(is_jpl_param_data):
     key, result = is_jpl_param_data
     assert is_jpl_param(key) == result
+
+
+@pytest.fixture(params=[
+    ('2017-04-22', datetime(2017, 4, 22)),
+    ('\'2017-4-22 10:30\'', datetime(2017, 4, 22, 10, 30)),
+    ('2017-Apr-22 10:30:15', datetime(2017, 4, 22, 10, 30, 15)),
+    (Time('2017-04-22'), datetime(2017, 4, 22)),
+    ('bla', None),
+])
+def parse_time_data(request):
+    return request.param
+
+
+def test_parse_time(parse_time_data):
+    t, result = parse_time_data
+    assert parse_time(t) == result
+
+
+@pytest.fixture(params=[
+    ('10m', timedelta(minutes=10)),
+    ('\'1 h\'', timedelta(hours=1)),
+    ('2d', timedelta(days=2)),
+    ('10 min', timedelta(minutes=10)),
+    ('3', 3),
+    ('1mo', None),
+    ('1y', None),
+    ('bla', None),
+])
+def parse_step_data(request):
+    return request.param
+
+
+def test_parse_step(parse_step_data):
+    step, result = parse_step_data
+    assert parse_step(step) == result
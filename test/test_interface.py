@@ -1,10 +1,15 @@
 import pytest
 import datetime
 import os
+import requests
 from six.moves.urllib.parse import quote
+from astropy.table import Table, vstack
 
 from eph import *
 from eph.horizons import *
+from eph.exceptions import JplBadReqError
+from eph.interface import make_response
+from eph.parsers import get_sections
 
 
 @pytest.fixture
@@ -78,3 +83,165 @@ def test_query(config_file, jplreq):
     jplreq.read(config_file)
     res = jplreq.query().http_response
     assert res.status_code == 200
+
+
+@pytest.fixture
+def vectors_file(res_dir):
+    return os.path.join(res_dir, 'vectors.txt')
+
+
+@pytest.fixture
+def vectors_res(vectors_file):
+    with open(vectors_file, 'r') as f:
+        return JplRes(make_response(f.read()))
+
+
+@pytest.mark.parametrize('rows', [1, 3, 4, 10])
+def test_iter_chunks(vectors_res, rows):
+    table = vectors_res.parse()
+    chunks = list(vectors_res.iter_chunks(rows=rows))
+    assert [len(chunk) for chunk in chunks][0] == min(rows, len(table))
+    assert sum(len(chunk) for chunk in chunks) == len(table)
+    assert all(chunk['X'].unit == table['X'].unit for chunk in chunks)
+    assert list(vstack(chunks)['JDTDB']) == list(table['JDTDB'])
+
+
+def test_sections(vectors_res):
+    spans = vectors_res.spans()
+    assert vectors_res.spans() is spans
+    header, data, footer = get_sections(vectors_res.raw())
+    assert vectors_res.get_header() == header
+    assert vectors_res.get_data() == data
+    assert vectors_res.get_footer() == footer
+    assert vectors_res.get_params()['CSV_FORMAT']
+
+
+def test_memoized(vectors_res):
+    assert vectors_res.raw() is vectors_res.raw()
+    assert vectors_res.get_params() is vectors_res.get_params()
+    assert vectors_res.get_meta() is vectors_res.get_meta()
+    table = vectors_res.parse()
+    assert vectors_res.parse() is table
+    assert vectors_res.parse(target=Table) is not table
+    reference = vectors_res.parse(engine='python')
+    assert reference is not table
+    assert vectors_res.parse(engine='python') is reference
+    dated = vectors_res.parse(parse_dates=True)
+    assert dated is not table
+    assert dated['Calendar Date (TDB)'].dtype.kind == 'M'
+
+
+def test_release(vectors_res):
+    table = vectors_res.parse()
+    meta = vectors_res.get_meta()
+    vectors_res.release()
+    assert vectors_res.parse() is table
+    assert vectors_res.get_meta() is meta
+    with pytest.raises(ValueError):
+        vectors_res.raw()
+    with pytest.raises(ValueError):
+        vectors_res.parse(target=Table)
+
+
+@pytest.mark.parametrize('rows', [1, 3])
+def test_iter_chunks_fixed(res_dir, rows):
+    with open(os.path.join(res_dir, 'vectors_fixed.txt'), 'r') as f:
+        res = JplRes(make_response(f.read()))
+    table = res.parse()
+    chunks = list(res.iter_chunks(rows=rows))
+    assert len(chunks[0]) == rows
+    assert list(vstack(chunks)['X']) == list(table['X'])
+
+
+def test_iter_chunks_bad_req():
+    res = JplRes(make_response('No ephemeris for target.\n!$$SOF\nCOMMAND = 0'))
+    with pytest.raises(JplBadReqError):
+        next(res.iter_chunks())
+
+
+def test_canonical():
+    req = JplReq({'COMMAND': '399', 'CENTER': '@0'})
+    assert req.canonical() == JplReq(CENTER='@0', COMMAND='earth').canonical()
+    assert req.canonical() != JplReq(COMMAND='399').canonical()
+
+
+def test_query_cache(monkeypatch, tmpdir, vectors_file):
+    from eph.cache import ResponseCache
+    with open(vectors_file, 'r') as f:
+        text = f.read()
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return make_response(text)
+
+    monkeypatch.setattr(requests, 'get', get)
+    cache = ResponseCache(str(tmpdir))
+    req = JplReq(COMMAND='venus')
+    first = req.query(cache=cache).parse()
+    second = req.query(cache=cache).parse()
+    assert len(calls) == 1
+    assert list(first['X']) == list(second['X'])
+    assert cache.stats()['hits'] == 1
+    assert cache.tables.stats()['hits'] == 1
+    assert first['X'].unit == second['X'].unit
+
+
+def test_query_table_cache_hit(monkeypatch, tmpdir, vectors_file):
+    from eph.cache import ResponseCache
+    with open(vectors_file, 'r') as f:
+        text = f.read()
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return make_response(text)
+
+    monkeypatch.setattr(requests, 'get', get)
+    cache = ResponseCache(str(tmpdir))
+    req = JplReq(COMMAND='venus')
+    req.query(cache=cache).parse()
+    loads = []
+    load = cache.load
+    cache.load = lambda filename: loads.append(filename) or load(filename)
+    assert len(req.query(cache=cache).parse()) == 4
+    # the raw response is not read on a table cache hit
+    assert loads == [] and len(calls) == 1
+    assert req.query(cache=cache).parse(target=Table) is not None
+    assert len(loads) == 1
+    # responses evicted after the lookup are fetched again
+    res = req.query(cache=cache)
+    cache.clear()
+    assert len(res.raw()) and len(calls) == 2
+
+
+@pytest.fixture(params=[
+    (dict(START_TIME='2000-1-1', STOP_TIME='2000-1-2', STEP_SIZE='1h'), 25),
+    (dict(START_TIME='2000-1-1', STOP_TIME='2000-1-2', STEP_SIZE='7h'), 4),
+    (dict(START_TIME='2000-1-1', STOP_TIME='2018-1-1', STEP_SIZE='3'), 4),
+    (dict(START_TIME='2000-1-1', STOP_TIME='2018-1-1', STEP_SIZE='1y'), None),
+    (dict(START_TIME='2000-1-1', STOP_TIME='2018-1-1'), None),
+])
+def estimate_rows_data(request):
+    return request.param
+
+
+def test_estimate_rows(estimate_rows_data):
+    params, rows = estimate_rows_data
+    assert JplReq(params).estimate_rows() == rows
+
+
+def test_split():
+    req = JplReq(COMMAND='venus',
+                 START_TIME='2000-1-1',
+                 STOP_TIME='2000-1-2',
+                 STEP_SIZE='1h')
+    assert req.split(max_rows=25) == [req]
+    windows = req.split(max_rows=10)
+    assert [(w['START_TIME'], w['STOP_TIME']) for w in windows] == [
+        ('2000-01-01 00:00:00', '2000-01-01 09:00:00'),
+        ('2000-01-01 09:00:00', '2000-01-01 18:00:00'),
+        ('2000-01-01 18:00:00', '2000-1-2'),
+    ]
+    assert all(w['COMMAND'] == '299' for w in windows)
+    assert sum(w.estimate_rows() for w in windows) == 25 + 2
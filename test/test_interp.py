@@ -0,0 +1,74 @@
+import pytest
+import os
+
+import numpy as np
+from astropy import units as u
+from astropy.time import Time
+
+from eph.interp import *
+from eph.parsers import parse
+
+from .conftest import orbit, orbit_vectors
+
+
+@pytest.fixture(params=[('hermite', {}), ('chebyshev', {}),
+                        ('chebyshev', {'degree': 4})])
+def method(request):
+    return request.param
+
+
+def test_interpolate(orbit_table, method):
+    name, kwargs = method
+    interp = interpolate(orbit_table, method=name, **kwargs)
+    jd = np.random.RandomState(0).uniform(2451544.5, 2451544.5 + 398., 10000)
+    pos, vel = orbit(jd)
+    error = np.abs(interp.position(jd).to(u.km).value - pos).max()
+    assert error <= interp.error_bound.to(u.km).value
+    assert error < 1e8 * 1e-3
+    vel_error = np.abs(interp.velocity(jd).to(u.km / u.s).value - vel).max()
+    assert vel_error < 1e8 / 86400. * 1e-2
+
+
+def test_interpolate_non_uniform(method):
+    # two days steps, then ten days steps
+    steps = np.concatenate([np.full(60, 2.), np.full(30, 10.)])
+    jd = 2451544.5 + np.concatenate([[0.], np.cumsum(steps)])
+    name, kwargs = method
+    interp = interpolate(orbit_vectors(jd), method=name, **kwargs)
+    t = np.random.RandomState(0).uniform(jd[0], jd[-1], 10000)
+    error = np.abs(interp.position(t).to(u.km).value - orbit(t)[0]).max()
+    bound = interp.error_bound.to(u.km).value
+    assert error <= bound < 10 * error
+
+
+def test_interpolate_samples(res_dir, method):
+    with open(os.path.join(res_dir, 'vectors.txt'), 'r') as f:
+        table = parse(f.read())
+    name, kwargs = method
+    interp = interpolate(table, method=name, **kwargs)
+    e = interp(Time(table['JDTDB'].value, format='jd', scale='tdb'))
+    for col in ('X', 'Y', 'Z'):
+        assert np.allclose(e[col].value, table[col].value)
+    assert e['VX'].unit == table['VX'].unit
+
+
+def test_interpolate_range(orbit_table, method):
+    name, kwargs = method
+    interp = interpolate(orbit_table, method=name, **kwargs)
+    with pytest.raises(ValueError):
+        interp.position([2451544.])
+
+
+def test_hermite_needs_velocity(orbit_table):
+    orbit_table.remove_columns(['VX', 'VY', 'VZ'])
+    with pytest.raises(ValueError):
+        interpolate(orbit_table, method='hermite')
+    interp = interpolate(orbit_table, method='chebyshev')
+    assert interp.velocity([2451600.]).unit == u.km / u.day
+
+
+def test_interpolate_obj(orbit_table):
+    for col in ('X', 'Y', 'Z', 'VX', 'VY', 'VZ'):
+        orbit_table.rename_column(col, 'venus_' + col)
+    interp = interpolate(orbit_table, obj='venus')
+    assert interp.position([2451600.]).shape == (1, 3)
@@ -0,0 +1,75 @@
+import pytest
+import pickle
+
+import numpy as np
+from astropy import units as u
+
+from eph.kernel import *
+
+from .conftest import orbit
+
+
+@pytest.fixture
+def kernel_file(tmpdir, orbit_table):
+    filename = str(tmpdir.join('orbit.bin'))
+    write_kernel(orbit_table, filename, interval=10., degree=11)
+    return filename
+
+
+def test_kernel(kernel_file, orbit_table):
+    kernel = Kernel(kernel_file)
+    assert isinstance(kernel.records, np.memmap)
+    assert len(kernel) == int(np.ceil(398. / 10.))
+    assert kernel.start == orbit_table['JDTDB'][0].value
+    assert np.isclose(kernel.stop, orbit_table['JDTDB'][-1].value)
+    jd = np.random.RandomState(0).uniform(kernel.start, kernel.stop, 100000)
+    pos, vel = orbit(jd)
+    assert np.abs(kernel.position(jd).to(u.km).value - pos).max() < 1.
+    assert np.abs(kernel.velocity(jd).to(u.km / u.s).value -
+                  vel).max() < 1e-3
+    assert kernel.velocity(jd[:1]).unit == u.km / u.s
+
+
+def test_kernel_error(kernel_file, orbit_table):
+    kernel = Kernel(kernel_file)
+    assert kernel.fit_error.unit == u.km
+    assert 0 < kernel.fit_error.value < 1.
+    jd = np.random.RandomState(0).uniform(kernel.start, kernel.stop, 10000)
+    error = np.abs(kernel.position(jd).to(u.km).value - orbit(jd)[0]).max()
+    assert error <= (kernel.fit_error + kernel.interp_error).to(u.km).value
+
+
+def test_clenshaw_index():
+    coeffs = np.random.RandomState(0).normal(size=(5, 4, 3))
+    index = np.array([4, 0, 0, 2])
+    x = np.linspace(-1, 1, 4)
+    assert np.allclose(clenshaw(x, coeffs, index=index),
+                       clenshaw(x, coeffs[index]))
+
+
+def test_kernel_table(kernel_file, orbit_table):
+    e = Kernel(kernel_file)(orbit_table['JDTDB'])
+    for col in ('X', 'Y', 'Z', 'VX', 'VY', 'VZ'):
+        scale = np.abs(orbit_table[col].value).max()
+        assert np.allclose(e[col].value, orbit_table[col].value,
+                           rtol=0, atol=1e-6 * scale)
+
+
+def test_kernel_range(kernel_file):
+    kernel = Kernel(kernel_file)
+    with pytest.raises(ValueError):
+        kernel.position([kernel.start - 1.])
+
+
+def test_kernel_pickle(kernel_file):
+    kernel = pickle.loads(pickle.dumps(Kernel(kernel_file)))
+    assert isinstance(kernel.records, np.memmap)
+    assert kernel.position([kernel.start]).shape == (1, 3)
+
+
+def test_kernel_bad_file(tmpdir):
+    filename = str(tmpdir.join('bad.bin'))
+    with open(filename, 'wb') as f:
+        f.write(b'bla')
+    with pytest.raises(ValueError):
+        Kernel(filename)
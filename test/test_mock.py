@@ -0,0 +1,58 @@
+import pytest
+
+from eph.client import Client
+from eph.interface import JplReq
+from eph.mock import *
+
+
+@pytest.fixture(scope='module')
+def mock():
+    with MockHorizons() as server:
+        yield server
+
+
+@pytest.fixture
+def client(mock):
+    with Client(endpoint=mock.url) as c:
+        yield c
+
+
+def test_mock_vectors(mock, client):
+    req = JplReq(COMMAND='399',
+                 START_TIME='2000-01-01',
+                 STOP_TIME='2000-01-11',
+                 STEP_SIZE='1d',
+                 TABLE_TYPE='V',
+                 VEC_TABLE=2,
+                 CSV_FORMAT=True)
+    table = req.query(session=client).parse()
+    assert len(table) == 11
+    assert table.colnames[2:] == ['X', 'Y', 'Z', 'VX', 'VY', 'VZ']
+    assert table['JDTDB'][0].value == 2451544.5
+    assert table['JDTDB'][1].value - table['JDTDB'][0].value == 1.
+
+
+def test_mock_observer(client):
+    req = JplReq(COMMAND='499',
+                 START_TIME='2000-01-01',
+                 STOP_TIME='2000-01-02',
+                 STEP_SIZE=4,
+                 TABLE_TYPE='O',
+                 QUANTITIES='1,20')
+    table = req.query(session=client).parse()
+    assert len(table) == 5
+    assert 'delta' in table.colnames
+
+
+def test_mock_rows(mock):
+    server = MockHorizons(rows=7)
+    assert server.options(dict(STEP_SIZE='1d'))['rows'] == 7
+    server.stop()
+    assert mock.options(dict(STEP_SIZE=10 * MAX_ROWS))['rows'] == MAX_ROWS
+
+
+def test_mock_count(mock, client):
+    requests, size = mock.requests, mock.bytes
+    res = JplReq(COMMAND='299', STEP_SIZE=3).query(session=client)
+    assert mock.requests == requests + 1
+    assert mock.bytes == size + len(res.raw().encode('utf-8'))
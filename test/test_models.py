@@ -34,3 +34,11 @@ def test_map_model():
     assert map['b'] == 1
     assert map.c == 0
     assert map['c'] == 0
+
+
+def test_map_private():
+    map = ConcreteMap(a=1)
+    map.__dict__['_private'] = 0
+    assert list(map) == ['a']
+    assert len(map) == 1
+    assert '_private' not in repr(map)
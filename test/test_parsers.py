@@ -1,5 +1,7 @@
 import pytest
 import os
+import re
+from string import whitespace as ws
 
 from eph.parsers import *
 
@@ -61,3 +63,124 @@ def test_parse_elements(elements_source):
     ecc, tp = [e[col] for col in ('EC', 'Tp')]
     assert all(map(lambda x: x < 1, ecc))
     assert tp.unit == u.day
+
+
+@pytest.fixture(params=['vectors', 'observer', 'elements'])
+def engines_source(request, res_dir):
+    with open(os.path.join(res_dir, request.param + '.txt'), 'r') as f:
+        return f.read()
+
+
+def test_parse_engines(engines_source):
+    reference = parse(engines_source, target=Table, engine='python')
+    table = parse(engines_source, target=Table, engine='numpy')
+    assert table.colnames == reference.colnames
+    for col in reference.colnames:
+        assert table[col].dtype == reference[col].dtype
+        assert list(table[col]) == list(reference[col])
+
+
+def test_parse_columns():
+    data = '1.5, A.D. 2000-Jan-01, n.a.,\n2.5, A.D. 2000-Jan-02, 3,'
+    jd, date, value = parse_columns(data)
+    assert jd.dtype == np.float64
+    assert list(jd) == [1.5, 2.5]
+    assert list(date) == ['A.D. 2000-Jan-01', 'A.D. 2000-Jan-02']
+    assert list(value) == ['n.a.', '3']
+    assert value.dtype == np.dtype('<U4')
+
+
+def test_parse_columns_ragged():
+    with pytest.raises(ParserError):
+        parse_columns('1, 2, 3,\n4, 5,')
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_parse_dates(vectors_source, engine):
+    e = parse(vectors_source, engine=engine, parse_dates=True)
+    assert e['Calendar Date (TDB)'].dtype.kind == 'M'
+    assert e['JDTDB'].unit == u.day
+    e = parse(vectors_source, engine=engine)
+    assert e['Calendar Date (TDB)'].dtype.kind == 'U'
+
+
+def test_parse_data_ragged():
+    with pytest.raises(ParserError):
+        parse_data('1, 2, 3,\n4, 5,')
+
+
+def test_parse_bad_engine(vectors_source):
+    with pytest.raises(ValueError):
+        parse(vectors_source, engine='bla')
+
+
+def test_get_sections(vectors_source):
+    header, data, footer = get_sections(vectors_source)
+    m = re.match(r'(.*?)\$\$SOE(.*?)\$\$EOE', vectors_source, flags=re.DOTALL)
+    assert header == m.group(1).strip(ws + '*')
+    assert data == m.group(2).strip(ws + '*')
+    assert footer and '$$EOE' not in footer and '!$$SOF' not in footer
+    spans = find_sections(vectors_source)
+    assert get_sections(vectors_source, spans) == (header, data, footer)
+
+
+def test_parse_params(vectors_source):
+    spans = find_sections(vectors_source)
+    params = parse_params(vectors_source)
+    assert params['CSV_FORMAT']
+    assert parse_params(vectors_source, spans) == params
+    assert check_csv(vectors_source, spans) == check_csv(vectors_source)
+
+
+def test_get_sections_bad_req():
+    with pytest.raises(JplBadReqError):
+        get_sections('No ephemeris for target.\n!$$SOF\nCOMMAND = 0')
+    with pytest.raises(JplBadReqError):
+        get_sections('No ephemeris for target.')
+
+
+@pytest.fixture(params=['vectors', 'elements'])
+def fixed_source(request, res_dir):
+    sources = []
+    for name in (request.param, request.param + '_fixed'):
+        with open(os.path.join(res_dir, name + '.txt'), 'r') as f:
+            sources.append(f.read())
+    return sources
+
+
+def test_parse_fixed(fixed_source):
+    csv, fixed = fixed_source
+    reference = parse(csv)
+    for source in (fixed, fixed.replace('=', '= ').replace('= = ', ' = ')):
+        table = parse(source)
+        assert table.colnames == reference.colnames
+        for col in reference.colnames:
+            assert table[col].dtype.kind == reference[col].dtype.kind
+            assert list(table[col]) == list(reference[col])
+
+
+def test_parse_fixed_unlabelled(fixed_source):
+    csv, fixed = fixed_source
+    unlabelled = re.sub(r'\s?[A-Za-z]+\s*=(?!\s*A\.D\.)', ' ', fixed)
+    table, reference = parse(unlabelled), parse(csv)
+    assert table.colnames == reference.colnames
+    for col in reference.colnames[2:]:
+        assert list(table[col]) == list(reference[col])
+
+
+def test_parse_fixed_width(res_dir):
+    with open(os.path.join(res_dir, 'observer_fixed.txt'), 'r') as f:
+        e = parse(f.read(), target=Table, parse_dates=True)
+    assert e.colnames == [
+        'Date__(UT)__HR:MN:SC.fff', 'R.A._(ICRF/J2000.0)_DEC', 'APmag',
+        'S-brt', 'delta', 'deldot'
+    ]
+    assert e['Date__(UT)__HR:MN:SC.fff'].dtype.kind == 'M'
+    assert e['R.A._(ICRF/J2000.0)_DEC'][0] == '15 57 07.37 -18 18 59.7'
+    assert list(e['APmag']) == [-4.07, -4.56, -3.95, -3.97]
+    assert e['deldot'][1] == -5.9353537
+
+
+def test_parse_records_bad():
+    with pytest.raises(ParserError):
+        parse_records(['JDTDB', 'X Y Z'], '2451544.5 = A.D. 2000-Jan-01\n1 2\n')
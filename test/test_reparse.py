@@ -0,0 +1,69 @@
+import pytest
+import os
+import shutil
+import tarfile
+
+from astropy.table import QTable
+
+from eph.cache import load_table
+from eph.cli import reparse_parser
+from eph.reparse import *
+
+NAMES = ('vectors', 'elements', 'observer', 'vectors_fixed')
+
+
+@pytest.fixture
+def archive(tmpdir, res_dir):
+    directory = tmpdir.mkdir('archive')
+    for name in NAMES:
+        sub = directory.ensure_dir(name.split('_')[0])
+        shutil.copy(os.path.join(res_dir, name + '.txt'), str(sub))
+    directory.join('bad.txt').write('No ephemeris for target.\n!$$SOF\n')
+    directory.join('malformed.txt').write('header\n$$SOE\n1,2,\n$$EOE\n')
+    directory.join('notes.md').write('not a response')
+    return str(directory)
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_reparse(tmpdir, archive, processes):
+    output = str(tmpdir.join('out'))
+    results = list(
+        reparse(archive, output, processes=processes, chunksize=2))
+    assert len(results) == len(NAMES) + 2
+    errors = {name: error for name, rows, error in results if error}
+    assert sorted(errors) == ['bad.txt', 'malformed.txt']
+    assert errors['bad.txt'].startswith('JplBadReqError')
+    assert errors['malformed.txt'].startswith('KeyError')
+    table = load_table(os.path.join(output, 'vectors', 'vectors.tbl'))
+    assert isinstance(table, QTable)
+    assert len(table) == 4
+
+
+def test_reparse_tarball(tmpdir, archive):
+    tarball = str(tmpdir.join('archive.tar.gz'))
+    with tarfile.open(tarball, 'w:gz') as tar:
+        tar.add(archive, arcname='archive')
+    output = str(tmpdir.join('out'))
+    results = list(reparse(tarball, output, fmt='ecsv', processes=2))
+    assert sum(1 for name, rows, error in results if not error) == len(NAMES)
+    assert len(results) == len(NAMES) + 2
+    assert os.path.isfile(
+        os.path.join(output, 'archive', 'elements', 'elements.ecsv'))
+
+
+def test_reparse_bad_source(tmpdir):
+    with pytest.raises(ValueError):
+        list(reparse(str(tmpdir.join('missing')), str(tmpdir)))
+
+
+def test_output_filename():
+    assert output_filename('a/b.txt', '/out') == '/out/a/b.tbl'
+    with pytest.raises(ValueError):
+        output_filename('../b.txt', '/out')
+
+
+def test_reparse_parser():
+    args = reparse_parser.parse_args(['archive', '-o', 'out', '-j', '4'])
+    assert args.source == 'archive'
+    assert args.jobs == 4
+    assert args.chunksize == CHUNKSIZE
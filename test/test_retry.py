@@ -0,0 +1,170 @@
+import pytest
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from eph.interface import JplReq, make_response
+from eph.retry import *
+from eph.throttle import Throttle, set_throttle
+from eph.transports import MemoryTransport
+
+
+def response(status=200, text='', **headers):
+    res = make_response(text)
+    res.status_code = status
+    res.headers.update(headers)
+    return res
+
+
+class Sequence(object):
+    """Returns (or raises) the given outcomes in order."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def test_retry():
+    retry = Retry(retries=3, backoff=.001, seed=0)
+    func = Sequence(requests.exceptions.ConnectionError(),
+                    response(503), response(200))
+    assert retry.call(func).status_code == 200
+    assert func.calls == 3
+    assert retry.stats() == dict(attempts=3, retries=2)
+
+
+def test_retry_exhausted():
+    retry = Retry(retries=2, backoff=.001)
+    assert retry.call(Sequence(response(500))).status_code == 500
+    func = Sequence(requests.exceptions.ReadTimeout())
+    with pytest.raises(requests.exceptions.Timeout):
+        retry.call(func)
+    assert func.calls == 3
+    # other errors and statuses are not retried
+    func = Sequence(ValueError())
+    with pytest.raises(ValueError):
+        retry.call(func)
+    func = Sequence(response(400))
+    assert retry.call(func).status_code == 400 and func.calls == 1
+
+
+def test_retry_delay():
+    retry = Retry(backoff=1., max_backoff=5., seed=0)
+    delays = [retry.delay(attempt) for attempt in range(10)]
+    assert all(0 <= d <= min(5., 2**i) for i, d in enumerate(delays))
+    assert retry.delay(0, response(429, **{'Retry-After': '2'})) == 2.
+    assert retry.delay(0, response(429, **{'Retry-After': '60'})) == 5.
+
+
+def test_hedge():
+    hedge = Hedge(delay=.05)
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(.5)
+            return response(text='slow')
+        return response(text='fast')
+
+    start = time.monotonic()
+    assert hedge.call(func).text == 'fast'
+    assert time.monotonic() - start < .4
+    assert hedge.stats()['hedged'] == 1 and hedge.stats()['won'] == 1
+    hedge.close()
+
+
+def test_hedge_delay():
+    hedge = Hedge(quantile=.5, min_samples=3)
+    assert hedge.delay() is None
+    for latency in (.01, .02, .03):
+        hedge.call(lambda: time.sleep(latency) or response())
+    assert .015 < hedge.delay() < .03
+    assert hedge.stats()['hedged'] == 0
+    hedge.close()
+
+
+def test_hedge_queued():
+    hedge = Hedge(delay=.05, max_workers=2)
+
+    def func():
+        time.sleep(.03)
+        return response()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: hedge.call(func), range(8)))
+    assert hedge.stats()['requests'] == 8
+    assert hedge.stats()['hedged'] == 0
+    hedge.close()
+
+
+def test_hedge_error():
+    hedge = Hedge(delay=.01)
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(.05)
+            raise requests.exceptions.ConnectionError
+        time.sleep(.1)
+        return response(text='ok')
+
+    assert hedge.call(func).text == 'ok'
+    with pytest.raises(ValueError):
+        hedge.call(Sequence(ValueError()))
+    hedge.close()
+
+
+def test_query_hedge_throttled(res_dir):
+    with open(res_dir + 'vectors.txt', 'r') as f:
+        transport = MemoryTransport(default=f.read())
+    get = transport.get
+
+    def slow_get(url, **kwargs):
+        time.sleep(.05)
+        return get(url, **kwargs)
+
+    transport.get = slow_get
+    req = JplReq(COMMAND='earth', transport=transport)
+    hedge = Hedge(delay=.1)
+    previous = set_throttle(Throttle(limit=1, min_limit=1, max_limit=1))
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda i: req.query(hedge=hedge), range(4)))
+    finally:
+        set_throttle(previous)
+        hedge.close()
+    # requests queued behind the throttle are not hedged
+    assert hedge.stats()['hedged'] == 0
+    assert len(transport.urls) == 4
+
+
+def test_query_retry(res_dir):
+    with open(res_dir + 'vectors.txt', 'r') as f:
+        transport = MemoryTransport(default=f.read())
+    get = transport.get
+    failures = [requests.exceptions.ReadTimeout()]
+
+    def flaky_get(url, **kwargs):
+        assert kwargs['timeout'] == 5
+        if failures:
+            raise failures.pop()
+        return get(url, **kwargs)
+
+    transport.get = flaky_get
+    req = JplReq(COMMAND='earth', transport=transport)
+    assert len(
+        req.query(timeout=5, retry=Retry(backoff=.001)).parse()) == 4
+    failures.append(requests.exceptions.ReadTimeout())
+    with pytest.raises(ConnectionError):
+        req.query(timeout=5)
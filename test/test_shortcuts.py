@@ -0,0 +1,160 @@
+import pytest
+
+import numpy as np
+from astropy.table import QTable
+from astropy.time import Time
+from six.moves.urllib.parse import unquote_plus
+
+from eph.shortcuts import *
+from eph.shortcuts import _concat, _jd, _tlists, _merge
+
+
+@pytest.fixture(params=[None, 1, 4])
+def max_workers(request):
+    return request.param
+
+
+def test_get(horizons, max_workers):
+    objs = ['venus', 'earth', 'mars']
+    e = get(objs, dates=['2000-1-1', '2018-1-1'], max_workers=max_workers)
+    assert len(horizons) == len(objs)
+    assert e.colnames[:2] == ['JDTDB', 'Calendar Date (TDB)']
+    assert [col for col in e.colnames if col.endswith('_X')] == [
+        'venus_X', 'earth_X', 'mars_X'
+    ]
+    assert len(e) == 4
+
+
+def test_get_concurrent(horizons):
+    objs = ['venus', 'earth', 'mars']
+    serial = get(objs, dates=['2000-1-1', '2018-1-1'])
+    concurrent = get(objs, dates=['2000-1-1', '2018-1-1'], max_workers=3)
+    assert serial.colnames == concurrent.colnames
+    assert serial.meta == concurrent.meta
+    for col in serial.colnames:
+        assert list(serial[col]) == list(concurrent[col])
+
+
+def test_get_split(horizons):
+    e = get('venus',
+            dates=['2000-1-1', '2000-1-2'],
+            step='1h',
+            max_rows=10,
+            max_workers=3)
+    assert len(horizons) == 3
+    assert len(e) == 4
+
+
+def test_concat():
+    chunks = [
+        QTable([[1., 2., 3.]], names=['JDTDB'], meta={'Stop  time': 'a'}),
+        QTable([[3., 4., 5.]], names=['JDTDB'], meta={'Stop  time': 'b'}),
+        QTable([[5., 6.]], names=['JDTDB'], meta={'Stop  time': 'c'}),
+    ]
+    data, = _concat(chunks, [3])
+    assert list(data['JDTDB']) == [1., 2., 3., 4., 5., 6.]
+    assert data.meta['Stop  time'] == 'c'
+
+
+def _table(jd, x, center):
+    return QTable([jd, ['d{0}'.format(t) for t in jd], x],
+                  names=['JDTDB', 'Calendar Date (TDB)', 'X'],
+                  meta={'Center': center, 'Units': 'AU'})
+
+
+def test_merge_aligned():
+    tables = [_table([1., 2.], [1., 2.], 'a'), _table([1., 2.], [3., 4.], 'b')]
+    data = _merge(['venus', 'earth'], tables, ['start', 'stop'])
+    assert data.colnames == ['JDTDB', 'Calendar Date (TDB)', 'venus_X',
+                             'earth_X']
+    assert list(data['earth_X']) == [3., 4.]
+    assert data.meta == {'Center': ['a', 'b'], 'Units': 'AU'}
+    assert tables[0].colnames == ['JDTDB', 'Calendar Date (TDB)', 'X']
+    assert tables[0].meta['Center'] == 'a'
+
+
+def test_merge_misaligned():
+    tables = [
+        _table([1., 2., 3.], [1., 2., 3.], 'a'),
+        _table([2., 3.], [5., 6.], 'a')
+    ]
+    data = _merge(['venus', 'earth'], tables, ['start', 'stop'])
+    assert list(data['JDTDB']) == [2., 3.]
+    assert list(data['venus_X']) == [2., 3.]
+    assert list(data['earth_X']) == [5., 6.]
+    assert data.meta['Center'] == 'a'
+    tables[1].rename_column('JDTDB', 'JD')
+    tables[1].rename_column('Calendar Date (TDB)', 'Date')
+    with pytest.raises(ParserError):
+        _merge(['venus', 'earth'], tables, ['start', 'stop'])
+
+
+def test_get_long(horizons):
+    objs = ['venus', 'earth', 'mars']
+    e = get(objs, dates=['2000-1-1', '2018-1-1'], layout='long')
+    assert e.colnames[:3] == ['target', 'JDTDB', 'Calendar Date (TDB)']
+    assert list(e['target']) == [obj for obj in objs for i in range(4)]
+    assert list(e.meta['targets']) == objs
+    assert 'targets' not in e.meta['targets']['venus']
+    e = get(objs, dates='2000-1-1', layout='long')
+    assert list(e['target']) == objs
+    with pytest.raises(ValueError):
+        get(objs, layout='tall')
+
+
+def test_merge_long():
+    tables = [_table([1., 2.], [1., 2.], 'a'), _table([1.], [3.], 'b')]
+    data = _merge(['venus', 'earth'], tables, ['start', 'stop'], 'long')
+    assert list(data['target']) == ['venus', 'venus', 'earth']
+    assert list(data['X']) == [1., 2., 3.]
+    assert data.meta['Units'] == 'AU' and 'Center' not in data.meta
+    assert data.meta['targets']['earth']['Center'] == 'b'
+
+
+@pytest.fixture
+def epochs():
+    return np.array([2451544.5, 2453736.166666667, 2455927.833333333, 2458119.5])
+
+
+def test_at_times(horizons, epochs):
+    times = epochs[[3, 0, 0, 2, 1]]
+    e = at_times(['venus', 'mars'], times, table_type='V', max_workers=2)
+    assert len(horizons) == 2
+    assert 'TLIST' in horizons[0]
+    assert np.allclose(e['JDTDB'].value, times)
+    assert list(e['venus_X']) == list(e['mars_X'])
+
+
+def test_at_times_time(horizons, epochs):
+    e = at_times('venus', Time(epochs[::-1], format='jd'))
+    assert np.allclose(e['JDTDB'].value, epochs[::-1])
+
+
+def test_at_times_scale(horizons, epochs):
+    times = Time(epochs, format='jd', scale='utc')
+    at_times('venus', times, table_type='V')
+    at_times('venus', times)
+    tlists = [[float(jd) for jd in unquote_plus(url).split("TLIST='")[1].split(
+        "'")[0].split()] for url in horizons]
+    assert np.allclose(tlists[0], times.tdb.jd, rtol=0, atol=1e-8)
+    assert not np.allclose(tlists[0], epochs, rtol=0, atol=1e-8)
+    assert np.allclose(tlists[1], epochs, rtol=0, atol=1e-8)
+
+
+def test_jd(epochs):
+    times = Time(epochs, format='jd', scale='tdb')
+    assert np.allclose(_jd(times, 'VECTORS'), epochs, rtol=0, atol=1e-8)
+    assert np.allclose(_jd(times, 'O'), times.utc.jd, rtol=0, atol=1e-8)
+    assert (_jd(list(epochs), 'O') == epochs).all()
+
+
+def test_tlists(epochs):
+    assert _tlists(epochs, 0, 8000, 10000) == [
+        '2451544.500000000 2453736.166666667 2455927.833333333 2458119.500000000'
+    ]
+    assert len(_tlists(epochs, 0, 8000, 2)) == 2
+    assert len(_tlists(epochs, 0, 13 + 18 * 3, 10000)) == 2
+    many = 2451544.5 + np.arange(50000) * 1e-3
+    tlists = _tlists(many, 100, 8000, 10000)
+    assert len(tlists) == int(np.ceil(50000. / ((8000 - 100 - 13) // 18)))
+    assert sum(len(tlist.split()) for tlist in tlists) == 50000
@@ -0,0 +1,39 @@
+import pytest
+
+from eph.bench import CASES
+from eph.parsers import parse
+from eph.synth import *
+
+
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_generate(case):
+    source = generate(rows=7, **CASES[case])
+    assert source == generate(rows=7, **CASES[case])
+    e = parse(source)
+    assert len(e) == 7
+    assert e.meta['Target body name'] == 'venus'
+
+
+@pytest.mark.parametrize('vec_table', sorted(VEC_TABLES))
+def test_generate_vectors(vec_table):
+    e = parse(generate(rows=3, vec_table=vec_table))
+    assert e.colnames[2:] == list(VEC_TABLES[vec_table])
+
+
+def test_generate_layouts():
+    csv = parse(generate(rows=5))
+    for vec_labels in (True, False):
+        fixed = parse(generate(rows=5, csv=False, vec_labels=vec_labels))
+        for col in csv.colnames:
+            assert list(fixed[col]) == list(csv[col])
+
+
+def test_generate_bad_type():
+    with pytest.raises(ValueError):
+        generate(table_type='BLA')
+
+
+def test_calendar():
+    assert calendar([2451544.5, 2451545.25]) == [
+        '2000-Jan-01 00:00:00.0000', '2000-Jan-01 18:00:00.0000'
+    ]
@@ -0,0 +1,144 @@
+import pytest
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from eph.aio import AsyncJplReq
+from eph.interface import JplReq, make_response
+from eph.throttle import *
+from eph.transports import MemoryTransport
+
+
+@pytest.fixture
+def throttle():
+    throttle = Throttle(rate=1000., burst=10, limit=2, max_limit=8)
+    previous = set_throttle(throttle)
+    yield throttle
+    set_throttle(previous)
+
+
+def response(status=200, **headers):
+    res = make_response('')
+    res.status_code = status
+    res.headers.update(headers)
+    return res
+
+
+def test_token_bucket():
+    bucket = TokenBucket(50., burst=2)
+    start = time.monotonic()
+    for i in range(7):
+        bucket.acquire()
+    assert time.monotonic() - start >= 5 / 50. - 1e-3
+    assert bucket.stats()['waiting'] == 0
+    bucket.pause(.05)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= .04
+
+
+def test_adaptive_limit():
+    limit = AdaptiveLimit(limit=4, max_limit=5)
+    tokens = [limit.acquire() for i in range(4)]
+    assert limit.stats()['in_flight'] == 4
+    for token in tokens:
+        limit.release(token, ok=False)
+    # a single decrease for the calls in flight when congestion was met
+    assert limit.stats()['limit'] == 2 and limit.decreases == 1
+    for i in range(100):
+        limit.release(limit.acquire())
+    assert limit.stats()['limit'] == 5
+    limit = AdaptiveLimit(limit=4, latency=.1)
+    limit.release(limit.acquire(), latency=.5)
+    assert limit.stats()['limit'] == 2
+
+
+def test_adaptive_limit_waiting():
+    limit = AdaptiveLimit(limit=1)
+    token = limit.acquire()
+    thread = threading.Thread(target=lambda: limit.release(limit.acquire()))
+    thread.start()
+    while limit.stats()['waiting'] == 0:
+        time.sleep(.001)
+    limit.release(token)
+    thread.join()
+    assert limit.stats() == dict(limit=2, in_flight=0, waiting=0,
+                                 decreases=0)
+
+
+def test_throttle(throttle):
+    assert throttle.call(response).status_code == 200
+    res = throttle.call(lambda: response(429, **{'Retry-After': '0'}))
+    assert res.status_code == 429
+    with pytest.raises(requests.exceptions.ConnectionError):
+
+        def fail():
+            raise requests.exceptions.ConnectionError
+
+        throttle.call(fail)
+    stats = throttle.stats()
+    assert stats['requests'] == 3
+    assert stats['throttled'] == 1 and stats['errors'] == 1
+    assert stats['limit'] == 1 and stats['in_flight'] == 0
+    assert stats['waiting'] == 0 and stats['rate'] == 1000.
+
+
+def test_throttle_query(throttle, res_dir):
+    with open(res_dir + 'vectors.txt', 'r') as f:
+        transport = MemoryTransport(default=f.read())
+    in_flight = []
+    get = transport.get
+
+    def slow_get(url, **kwargs):
+        in_flight.append(throttle.stats()['in_flight'])
+        time.sleep(.01)
+        return get(url, **kwargs)
+
+    transport.get = slow_get
+    req = JplReq(COMMAND='earth', transport=transport)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: req.query(), range(16)))
+    assert throttle.stats()['requests'] == 16
+    assert max(in_flight) <= 8
+    assert throttle.stats()['limit'] > 2
+
+
+def test_throttle_async_query(throttle, res_dir):
+    with open(res_dir + 'vectors.txt', 'r') as f:
+        transport = MemoryTransport(default=f.read())
+    in_flight = []
+
+    async def aget(url, **kwargs):
+        in_flight.append(throttle.stats()['in_flight'])
+        await asyncio.sleep(.01)
+        return transport.get(url, **kwargs)
+
+    transport.aget = aget
+    req = AsyncJplReq(COMMAND='earth', transport=transport)
+
+    async def main():
+        return await asyncio.gather(*[req.query() for i in range(16)])
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert len(loop.run_until_complete(main())) == 16
+    finally:
+        loop.close()
+    assert throttle.stats()['requests'] == 16
+    assert max(in_flight) <= 8 and min(in_flight) >= 1
+    assert throttle.stats()['in_flight'] == 0
+
+
+def test_set_throttle():
+    throttle = Throttle()
+    previous = set_throttle(throttle)
+    try:
+        assert get_throttle() is throttle
+        assert throttle.stats()['limit'] is None
+    finally:
+        set_throttle(previous)
+    assert get_throttle() is previous
@@ -0,0 +1,104 @@
+import pytest
+
+import asyncio
+import os.path
+
+from eph.aio import AsyncJplReq
+from eph.client import Client
+from eph.config import read_transport_config
+from eph.interface import JplReq
+from eph.mock import MockHorizons
+from eph.transports import *
+
+
+@pytest.fixture(scope='module')
+def vectors(res_dir):
+    with open(os.path.join(res_dir, 'vectors.txt'), 'r') as f:
+        return f.read()
+
+
+@pytest.fixture(scope='module')
+def mock():
+    with MockHorizons() as server:
+        yield server
+
+
+def test_url_key():
+    req = JplReq(COMMAND=399, CENTER='@0')
+    assert url_key(req.url()) == url_key(JplReq(CENTER='@0',
+                                                COMMAND=399).url())
+    assert url_key(req.url()) == url_key(
+        req.url().replace('https://ssd.jpl.nasa.gov', 'http://mirror'))
+    assert url_key(req.url()) != url_key(JplReq(COMMAND=499).url())
+
+
+def test_memory_transport(vectors):
+    transport = MemoryTransport([(dict(COMMAND='earth'), vectors)])
+    req = JplReq(COMMAND='earth', transport=transport)
+    assert len(req.query().parse()) == 4
+    assert transport.urls == [req.url()]
+    with pytest.raises(ConnectionError):
+        JplReq(COMMAND='mars').query(session=transport)
+
+
+def test_transport_inherited(vectors):
+    transport = MemoryTransport(default=vectors)
+    req = JplReq(COMMAND='earth', transport=transport)
+    assert dict(req) == {'COMMAND': '399'}
+    assert JplReq(req, CENTER='@0').transport is transport
+    assert JplReq(dict(req)).transport is None
+    req.transport = None
+    assert req.transport is None
+
+
+def test_http_transport(mock):
+    with HttpTransport(endpoint=mock.url) as transport:
+        res = JplReq(COMMAND='399', STEP_SIZE=2).query(session=transport)
+        assert len(res.parse()) == 3
+
+
+def test_async_transport(mock):
+    transport = AsyncTransport(endpoint=mock.url)
+    assert len(JplReq(COMMAND='399',
+                      STEP_SIZE=2).query(session=transport).parse()) == 3
+    req = AsyncJplReq(COMMAND='399', STEP_SIZE=4, transport=transport)
+    res = asyncio.run(req.query())
+    assert len(res.parse()) == 5
+
+
+def test_replay_transport(tmpdir, mock):
+    directory = str(tmpdir.join('replay'))
+    req = JplReq(COMMAND='499', STEP_SIZE=3)
+    with ReplayTransport(directory) as replay:
+        with pytest.raises(ConnectionError):
+            req.query(session=replay)
+    requests = mock.requests
+    with ReplayTransport(directory,
+                         fallback=Client(endpoint=mock.url)) as replay:
+        expected = req.query(session=replay).raw()
+        assert os.path.isfile(replay.filename(req.url()))
+        assert req.query(session=replay).raw() == expected
+    assert mock.requests == requests + 1
+    with ReplayTransport(directory) as replay:
+        assert req.query(session=replay).raw() == expected
+
+
+def test_make_transport(tmpdir):
+    assert isinstance(make_transport(), HttpTransport)
+    client = make_transport('session', pool_size=2, endpoint='http://mirror')
+    assert isinstance(client, Client) and client.endpoint == 'http://mirror'
+    replay = make_transport('replay', directory=str(tmpdir), record=False)
+    assert isinstance(replay.fallback, Client) and not replay.record
+    with pytest.raises(ValueError):
+        make_transport('carrier-pigeon')
+
+
+def test_read_transport_config(tmpdir, config_file):
+    assert read_transport_config(config_file) is None
+    filename = str(tmpdir.join('ephrc'))
+    with open(filename, 'w') as f:
+        f.write('[DEFAULT]\nCENTER=@0\n[transport]\ntransport=session\n'
+                'pool_size=4\ntimeout=30\n')
+    assert read_transport_config(filename) == dict(transport='session',
+                                                   pool_size=4,
+                                                   timeout=30.)
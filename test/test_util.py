@@ -1,5 +1,7 @@
 import pytest
 
+import numpy as np
+
 from eph.util import *
 
 
@@ -71,6 +73,55 @@ def test_numberify(numberify_data):
     assert numberify(data) == result
 
 
+@pytest.fixture(params=[
+    (['1', '-2', '+3'], np.int64),
+    (['1.5', '2', '-3.E+02', '.5'], np.float64),
+    (['1.5', 'n.a.'], str),
+    ([], str),
+])
+def infer_dtype_data(request):
+    return request.param
+
+
+def test_infer_dtype(infer_dtype_data):
+    data, result = infer_dtype_data
+    assert infer_dtype(data) is result
+
+
+@pytest.fixture(params=[
+    (['1', '2'], 'i', [1, 2]),
+    (['1.5', '2'], 'f', [1.5, 2.]),
+    (['1', '2.5'], 'f', [1., 2.5]),
+    (['1', 'n.a.'], 'U', ['1', 'n.a.']),
+])
+def convert_column_data(request):
+    return request.param
+
+
+def test_convert_column(convert_column_data):
+    data, kind, result = convert_column_data
+    column = convert_column(data, sample=1)
+    assert column.dtype.kind == kind
+    assert list(column) == result
+
+
+def test_to_datetime():
+    dates = to_datetime(['A.D. 2000-Jan-01 00:00:00.0000',
+                         'A.D. 2005-Dec-31 16:00:00.5000'])
+    assert dates.dtype == np.dtype('datetime64[ms]')
+    assert dates[1] == np.datetime64('2005-12-31T16:00:00.500')
+    assert to_datetime(['B.C. 0100-Jan-01 00:00']) is None
+    assert to_datetime(['bla']) is None
+
+
+def test_columnize():
+    rows = [['A.D. 2000-Jan-01', '1', 'a'], ['A.D. 2000-Feb-01', '2', 'b']]
+    dates, ints, strs = columnize(rows, dates=(0, ))
+    assert dates.dtype.kind == 'M'
+    assert ints.dtype.kind == 'i'
+    assert list(strs) == ['a', 'b']
+
+
 @pytest.fixture(params=[
     ([['a', 'b'], ['1', '2']], [['a', '1'], ['b', '2']]),
 ])